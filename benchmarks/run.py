@@ -0,0 +1,304 @@
+"""
+End-to-end benchmark of the cataloging pipeline.
+
+Usage:
+    python -m benchmarks.run [--rows 1000 100000] [--columns 20] [--formats csv txt xlsx]
+                             [--repeat 3] [--baseline benchmarks/baseline.json] [--save-baseline]
+
+Synthetic files are generated for every format and size, then each file is
+cataloged in a fresh process with the mock LLM (see data_catalog.mock_llm),
+timing every stage: load, profile, prompt assembly, each crew task and the
+catalog save and export. The report gives the throughput, the peak RSS and the
+tokens of every file, with the median timings over the repetitions of a file,
+and the results are compared with a baseline JSON file; the exit code is 1
+when a metric regressed beyond the tolerance and 2 when there is no baseline. benchmarks/baseline.json holds the results of the
+default run with CrewAI installed; without it the crew stages are skipped.
+"""
+import argparse
+import importlib.util
+import json
+import os
+import resource
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+from benchmarks.synthetic import COLUMN_TYPES, write_synthetic_file, open_upload
+
+# Baseline used when none is given
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+# Mock LLM settings of the benchmark, unless set in the environment: a short
+# fixed latency and no errors, so the timings are stable from run to run
+BENCHMARK_ENV = {
+    'DUKE_LLM_PROVIDER': 'mock',
+    'DUKE_LLM_CACHE': '0',
+    'DUKE_MOCK_LATENCY': 'fixed:0.05',
+    'DUKE_MOCK_TOKENS_PER_SECOND': '2000',
+    'DUKE_MOCK_ERROR_RATE': '0',
+    # The CrewAI telemetry retries its exports in the background, which adds noise
+    'CREWAI_DISABLE_TELEMETRY': 'true',
+    'OTEL_SDK_DISABLED': 'true',
+}
+
+# Allowed increase of a metric on top of the tolerance: the stage timings get a
+# share of the baseline duration of the stage, never under STAGE_SLACK_MIN_SECONDS,
+# the peak RSS and the tokens an absolute amount
+STAGE_SLACK = 0.1
+STAGE_SLACK_MIN_SECONDS = 0.02
+SLACK = {'peak_rss_mb': 20.0, 'tokens': 0}
+
+# Runs of each file by default, the median of the timings is compared
+DEFAULT_REPEAT = 3
+
+
+def _peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def _timed(stages, name, func, *args, **kwargs):
+    started = time.perf_counter()
+    result = func(*args, **kwargs)
+    stages[name] = time.perf_counter() - started
+    return result
+
+
+def run_case(path, workdir):
+    """
+    Catalog a file and time each stage. Meant to run in a fresh process, the
+    caches of the app and the peak RSS are those of this file only.
+
+    Args:
+        path: The path of the file
+        workdir: The directory where the catalog store and the exports are written
+
+    Returns:
+        dict: The file, rows, size_mb, stages (seconds per stage), total_seconds,
+        peak_rss_mb, tokens ({'prompt', 'completion'}) and notes
+    """
+    os.chdir(workdir)
+    for key, value in BENCHMARK_ENV.items():
+        os.environ.setdefault(key, value)
+    os.environ.setdefault('DUKE_CACHE_DIR', os.path.join(workdir, 'cache'))
+    os.environ.setdefault('DUKE_CATALOG_DB', os.path.join(workdir, 'catalog.sqlite'))
+
+    # The app reads its settings when imported, after the environment above is set
+    from file_loader.dataset import get_datasets, get_file_profiles, get_file_sample_text, get_file_profile_text
+    from data_catalog.mock_llm import get_mock_llm
+    from data_catalog.prompt_budget import assemble_prompt
+    from data_catalog.utils import build_catalog_entry, save_catalog_entry, export_catalog_to_markdown
+    from data_catalog.fingerprints import CATALOG_TASKS
+
+    file = open_upload(path)
+    stages, notes = {}, []
+
+    def load():
+        return [dataset.data for dataset in get_datasets(file)]
+
+    data = _timed(stages, 'load', load)
+    rows = sum(len(item) if hasattr(item, 'columns') else item.count("\n") + 1 for item in data if item is not None)
+    profiles = _timed(stages, 'profile', get_file_profiles, file)
+
+    prompt_tokens, documentation = 0, ""
+    if importlib.util.find_spec('crewai') is not None:
+        from data_catalog.crewai_catalog import create_catalog_crew, lease_catalog_agents
+        from data_catalog.dag import run_crew_dag
+
+        prompt_usage = {}
+        with lease_catalog_agents() as agents:
+            crew = _timed(stages, 'prompt', create_catalog_crew, file, prompt_usage=prompt_usage, agents=agents)
+            result = _timed(stages, 'crew', run_crew_dag, crew)
+        for key, duration in zip(CATALOG_TASKS, result.durations):
+            stages[f"task:{key}"] = duration
+        prompt_tokens = sum(usage['tokens'] for usage in prompt_usage.values())
+        documentation = str(result)
+    else:
+        # Without CrewAI, only the assembly of the sample and profile sections is timed
+        notes.append("crew stages skipped: crewai is not installed")
+
+        def assemble():
+            sections = {'sample': [get_file_sample_text(file), get_file_sample_text(file, n_rows=3)]}
+            profile_text = get_file_profile_text(file)
+            if profile_text is not None:
+                sections['profile'] = [profile_text, get_file_profile_text(file, compact=True)]
+            template = "Catalog the file {file_name}\n" + "\n".join(f"{{{name}}}" for name in sections)
+            return assemble_prompt(template, sections, fixed={'file_name': file.name}, task_name="benchmark")
+
+        _, usage = _timed(stages, 'prompt', assemble)
+        prompt_tokens = usage['tokens']
+
+    entry = build_catalog_entry(file.name, documentation, profiles)
+    _timed(stages, 'save', save_catalog_entry, entry, file.name)
+    _timed(stages, 'export', export_catalog_to_markdown, entry)
+
+    total = sum(duration for name, duration in stages.items() if not name.startswith('task:'))
+    size_mb = file.size / (1024 * 1024)
+    return {
+        'file': file.name,
+        'rows': rows,
+        'size_mb': round(size_mb, 3),
+        'stages': stages,
+        'total_seconds': total,
+        'rows_per_second': rows / total if total else None,
+        'mb_per_second': size_mb / total if total else None,
+        'peak_rss_mb': _peak_rss_mb(),
+        'tokens': {'prompt': prompt_tokens, 'completion': get_mock_llm().stats['completion_tokens']},
+        'notes': notes,
+    }
+
+
+def _median_result(results):
+    # Median of each timing and of the peak RSS over the repetitions of a case
+    merged = dict(results[0])
+    merged['stages'] = {name: statistics.median(result['stages'][name] for result in results)
+                        for name in results[0]['stages']}
+    for key in ('total_seconds', 'rows_per_second', 'mb_per_second', 'peak_rss_mb'):
+        values = [result[key] for result in results if result[key] is not None]
+        merged[key] = statistics.median(values) if values else None
+    merged['repeat'] = len(results)
+    return merged
+
+
+def run_benchmarks(formats, rows_list, columns, types=None, null_rate=0.05, repeat=DEFAULT_REPEAT, seed=0):
+    """
+    Generate the synthetic files and benchmark each of them.
+
+    Args:
+        formats: The file formats, see benchmarks.synthetic.write_synthetic_file
+        rows_list: The numbers of rows
+        columns: The number of columns of tabular files
+        types: The column types
+        null_rate: The share of missing values
+        repeat: The number of runs of each file, the median is kept
+        seed: The random seed of the data
+
+    Returns:
+        dict: The results of run_case keyed by case name (format-rowsxcolumns)
+    """
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="duke-benchmark-") as directory:
+        for file_format in formats:
+            for rows in rows_list:
+                path = write_synthetic_file(directory, file_format, rows, columns, types, null_rate, seed)
+                case = f"{file_format}-{rows}x{columns}"
+                runs = []
+                for run in range(repeat):
+                    workdir = tempfile.mkdtemp(dir=directory)
+                    # A new process per run, so no cache or memory is shared between runs
+                    with ProcessPoolExecutor(max_workers=1, mp_context=get_context('spawn')) as executor:
+                        runs.append(executor.submit(run_case, path, workdir).result())
+                results[case] = _median_result(runs)
+                print(f"{case}: {results[case]['total_seconds']:.2f} s", file=sys.stderr)
+    return results
+
+
+def compare_with_baseline(results, baseline, tolerance=0.25):
+    """
+    Find the metrics that got worse than in the baseline.
+    A metric regresses when it exceeds the baseline increased by the tolerance
+    plus its slack, see STAGE_SLACK and SLACK.
+
+    Args:
+        results: The results of run_benchmarks
+        baseline: Results of a previous run_benchmarks
+        tolerance: The allowed relative increase
+
+    Returns:
+        list: A description of every regression
+    """
+    regressions = []
+    for case, result in results.items():
+        reference = baseline.get(case)
+        if reference is None:
+            continue
+        metrics = []
+        for name, value in result['stages'].items():
+            reference_value = reference['stages'].get(name)
+            slack = max(STAGE_SLACK * (reference_value or 0), STAGE_SLACK_MIN_SECONDS)
+            metrics.append((f"{name} seconds", value, reference_value, slack))
+        metrics.append(("peak RSS MB", result['peak_rss_mb'], reference.get('peak_rss_mb'), SLACK['peak_rss_mb']))
+        metrics += [(f"{name} tokens", value, reference.get('tokens', {}).get(name), SLACK['tokens'])
+                    for name, value in result['tokens'].items()]
+
+        for name, value, reference_value, slack in metrics:
+            if value is None or reference_value is None:
+                continue
+            if value > reference_value * (1 + tolerance) + slack:
+                change = (value / reference_value - 1) * 100 if reference_value else float('inf')
+                regressions.append(f"{case}: {name} {reference_value:.3f} -> {value:.3f} (+{change:.0f}%)")
+    return regressions
+
+
+def format_results(results):
+    """
+    Format the results as a text report.
+
+    Args:
+        results: The results of run_benchmarks
+
+    Returns:
+        str: The report
+    """
+    lines = []
+    for case, result in results.items():
+        lines.append(f"{case} ({result['rows']} rows, {result['size_mb']:.2f} MB)")
+        for name, duration in result['stages'].items():
+            lines.append(f"  {name:<20} {duration * 1000:10.1f} ms")
+        rows_per_second = f"{result['rows_per_second']:.0f}" if result['rows_per_second'] else "-"
+        mb_per_second = f"{result['mb_per_second']:.2f}" if result['mb_per_second'] else "-"
+        lines.append(f"  {'total':<20} {result['total_seconds'] * 1000:10.1f} ms | "
+                     f"{rows_per_second} rows/s | {mb_per_second} MB/s")
+        lines.append(f"  peak RSS {result['peak_rss_mb']:.0f} MB | tokens prompt {result['tokens']['prompt']}, "
+                     f"completion {result['tokens']['completion']}")
+        lines += [f"  note: {note}" for note in result['notes']]
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the cataloging pipeline on synthetic files")
+    parser.add_argument("--formats", nargs="+", default=['csv', 'txt', 'xlsx'], choices=['csv', 'txt', 'xlsx'])
+    parser.add_argument("--rows", nargs="+", type=int, default=[1000, 100000], help="Rows of each generated file")
+    parser.add_argument("--columns", type=int, default=20, help="Columns of the tabular files")
+    parser.add_argument("--types", nargs="+", choices=COLUMN_TYPES, help="Column types, cycled over the columns")
+    parser.add_argument("--null-rate", type=float, default=0.05, help="Share of missing values")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="Runs of each file, the median is reported")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed of the data")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Baseline JSON to compare with")
+    parser.add_argument("--save-baseline", action="store_true", help="Store the results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed relative increase of a metric")
+    parser.add_argument("--json", help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.formats, args.rows, args.columns, args.types, args.null_rate,
+                             args.repeat, args.seed)
+    print(format_results(results))
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump(results, file, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as file:
+            json.dump(results, file, indent=2)
+        print(f"\nBaseline saved to {args.baseline}")
+        return 0
+
+    # Without a baseline nothing is checked, which must not pass for a success
+    if not os.path.exists(args.baseline):
+        print(f"\nNo baseline at {args.baseline}, run with --save-baseline to create one")
+        return 2
+    with open(args.baseline) as file:
+        regressions = compare_with_baseline(results, json.load(file), args.tolerance)
+    if regressions:
+        print("\nRegressions:\n" + "\n".join(f"  {regression}" for regression in regressions))
+        return 1
+    print("\nNo regression against the baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,138 @@
+import io
+import os
+
+import numpy as np
+import pandas as pd
+
+# Column types the generator can produce
+COLUMN_TYPES = ['int', 'float', 'category', 'text', 'date', 'bool', 'email']
+
+# MIME types of the generated files, as reported by Streamlit uploads
+MIME_TYPES = {
+    'csv': 'text/csv',
+    'txt': 'text/plain',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+_WORDS = ['data', 'customer', 'order', 'invoice', 'region', 'product', 'amount', 'status', 'delivery',
+          'payment', 'account', 'contract', 'supplier', 'warehouse', 'forecast', 'quarter']
+
+
+class SyntheticUpload(io.BytesIO):
+    """
+    In-memory file with the name, size and type attributes of a Streamlit upload.
+    """
+
+    def __init__(self, content, name, mime_type):
+        super().__init__(content)
+        self.name = name
+        self.size = len(content)
+        self.type = mime_type
+
+
+def generate_table(rows, columns, types=None, null_rate=0.05, seed=0):
+    """
+    Generate a table of random values.
+
+    Args:
+        rows: The number of rows
+        columns: The number of columns, the first one is a unique integer id
+        types: The column types, cycled over the columns, see COLUMN_TYPES
+        null_rate: The share of missing values in every column but the id
+        seed: The random seed
+
+    Returns:
+        DataFrame: The table
+    """
+    rng = np.random.default_rng(seed)
+    types = types or COLUMN_TYPES
+    data = {'id': np.arange(1, rows + 1)}
+    for index in range(1, columns):
+        column_type = types[(index - 1) % len(types)]
+        name = f"{column_type}_{index}"
+        if column_type == 'int':
+            values = pd.array(rng.integers(0, 10000, rows), dtype='Int64')
+        elif column_type == 'float':
+            values = rng.lognormal(3, 1, rows).round(2)
+        elif column_type == 'category':
+            values = rng.choice(['north', 'south', 'east', 'west', 'center'], rows).astype(object)
+        elif column_type == 'text':
+            values = np.array([" ".join(words) for words in rng.choice(_WORDS, (rows, 4))], dtype=object)
+        elif column_type == 'date':
+            values = (pd.Timestamp('2020-01-01') + pd.to_timedelta(rng.integers(0, 1500, rows), unit='D'))
+            values = values.strftime('%Y-%m-%d').to_numpy(dtype=object)
+        elif column_type == 'bool':
+            values = rng.random(rows) < 0.5
+        elif column_type == 'email':
+            values = np.array([f"user{number}@example.com" for number in rng.integers(0, rows * 10, rows)],
+                              dtype=object)
+        else:
+            raise ValueError(f"Unknown column type: {column_type}")
+
+        series = pd.Series(values)
+        if null_rate:
+            series = series.astype(object) if column_type == 'bool' else series
+            series[rng.random(rows) < null_rate] = None
+        data[name] = series
+    return pd.DataFrame(data)
+
+
+def generate_text(rows, seed=0):
+    """
+    Generate free text, one sentence per line.
+
+    Args:
+        rows: The number of lines
+        seed: The random seed
+
+    Returns:
+        str: The text
+    """
+    rng = np.random.default_rng(seed)
+    lengths = rng.integers(5, 20, rows)
+    return "\n".join(" ".join(rng.choice(_WORDS, length)).capitalize() + "." for length in lengths)
+
+
+def write_synthetic_file(directory, file_format, rows, columns, types=None, null_rate=0.05, seed=0):
+    """
+    Generate a synthetic file and write it to a directory.
+
+    Args:
+        directory: The output directory
+        file_format: csv, txt or xlsx
+        rows: The number of rows, or of lines for text files
+        columns: The number of columns of tabular files
+        types: The column types, see generate_table
+        null_rate: The share of missing values
+        seed: The random seed
+
+    Returns:
+        str: The path of the file
+    """
+    path = os.path.join(directory, f"synthetic_{rows}x{columns}.{file_format}")
+    if file_format == 'txt':
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(generate_text(rows, seed))
+    elif file_format == 'csv':
+        generate_table(rows, columns, types, null_rate, seed).to_csv(path, index=False)
+    elif file_format == 'xlsx':
+        generate_table(rows, columns, types, null_rate, seed).to_excel(path, index=False)
+    else:
+        raise ValueError(f"Unknown file format: {file_format}")
+    return path
+
+
+def open_upload(path):
+    """
+    Read a file as a Streamlit-like upload.
+
+    Args:
+        path: The path of the file
+
+    Returns:
+        SyntheticUpload: The upload
+    """
+    with open(path, 'rb') as file:
+        content = file.read()
+    name = os.path.basename(path)
+    return SyntheticUpload(content, name, MIME_TYPES.get(name.rsplit('.', 1)[-1], 'application/octet-stream'))
@@ -1,5 +1,5 @@
 import streamlit as st
-from file_loader.utils import is_valid_file_type
+from file_loader.utils import is_valid_file_type, get_content_hash
 from file_processor.utils import get_file_stats
 import os
 
@@ -28,6 +28,10 @@ def initialize_chat():
     if "processed_files" not in st.session_state:
         st.session_state.processed_files = set()
 
+    # Initialize session state for the content hashes of the uploads, by file ID
+    if "upload_hashes" not in st.session_state:
+        st.session_state.upload_hashes = {}
+
 
 def display_chat():
     """
@@ -39,6 +43,25 @@ def display_chat():
             st.markdown(message["content"])
 
 
+def release_removed_uploads(uploaded_files):
+    """
+    Drop the shared datasets of the uploads that are no longer in the uploader.
+    Args:
+        uploaded_files: The files currently in the uploader
+    """
+    upload_hashes = {file.file_id: get_content_hash(file) for file in uploaded_files}
+    removed_hashes = set(st.session_state.upload_hashes.values()) - set(upload_hashes.values())
+    st.session_state.upload_hashes = upload_hashes
+    if not removed_hashes:
+        return
+
+    # Import here to keep pandas out of the startup path
+    from file_loader.dataset import release_dataset
+
+    for content_hash in removed_hashes:
+        release_dataset(content_hash)
+
+
 def handle_file_upload():
     """
     Handle file upload through the chat interface.
@@ -51,6 +74,9 @@ def handle_file_upload():
         label_visibility="collapsed"
     )
 
+    # Free the parsed datasets of the files removed from the uploader
+    release_removed_uploads(uploaded_files or [])
+
     # Check if new files have been uploaded
     if uploaded_files and set(f.name for f in uploaded_files) != set(f.name for f in st.session_state.uploaded_files):
         # Store new uploaded files in session state
@@ -82,26 +108,27 @@ def handle_file_upload():
         st.rerun()
 
     # Check if we need to start the workflow
-    if (st.session_state.workflow_stage == "files_uploaded" and
-            uploaded_files and
-            any(file.name not in st.session_state.processed_files for file in uploaded_files)):
+    if st.session_state.workflow_stage == "files_uploaded" and uploaded_files:
 
-        # Get only new files that haven't been processed
-        new_files = [file for file in uploaded_files if file.name not in st.session_state.processed_files]
+        # Get only new files that haven't been processed, keyed by content so that
+        # a re-uploaded file with the same name but new rows is cataloged again
+        file_hashes = {file.name: get_content_hash(file) for file in uploaded_files}
+        new_files = [file for file in uploaded_files
+                     if file_hashes[file.name] not in st.session_state.processed_files]
 
         if new_files:
             # Mark all files as processed
             for file in new_files:
-                st.session_state.processed_files.add(file.name)
+                st.session_state.processed_files.add(file_hashes[file.name])
 
             # Start the cataloging workflow using CrewAI
             st.session_state.workflow_stage = "analysis_started"
 
             # Import here to avoid circular imports
-            from data_catalog.crewai_catalog import run_catalog_crew
+            from data_catalog.crewai_catalog import start_catalog_jobs
 
-            # Start CrewAI workflow for the first file
-            run_catalog_crew(new_files[0])
+            # Start one background CrewAI workflow per new file
+            start_catalog_jobs(new_files)
 
             # Force a rerun to update the UI
             st.rerun()
@@ -164,9 +191,17 @@ def process_user_input(prompt):
         elif st.session_state.workflow_stage == "awaiting_feedback":
             # Get feedback from user and provide it to CrewAI
             from data_catalog.crewai_feedback import provide_feedback
+            from data_catalog.llm_processor import process_feedback_message
+
+            # Revise the reviewed content while answering the user, the answer
+            # is shown token by token as it is generated
+            current_content = st.session_state.get("current_feedback_prompt", "validation")
+            stage = st.session_state.get("feedback_stage", "validation")
+            updated_content, response = process_feedback_message(current_content, prompt, stage,
+                                                                 message_placeholder.write_stream)
 
-            # Provide the feedback to CrewAI
-            provide_feedback(prompt)
+            # Provide the feedback and the revised content to CrewAI
+            provide_feedback(prompt, response, updated_content)
 
             # The response will be added in the provide_feedback function
             return
@@ -0,0 +1,110 @@
+import os
+import queue
+import threading
+from contextlib import contextmanager
+from dotenv import load_dotenv
+
+from data_catalog.batch import MAX_CONCURRENT_CREWS
+
+# Load environment variables
+load_dotenv()
+
+# Maximum number of idle agent sets kept by a pool, one per crew running at once by default
+AGENT_POOL_SIZE = int(os.getenv("DUKE_AGENT_POOL_SIZE", str(MAX_CONCURRENT_CREWS)))
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def reset_agent(agent):
+    """
+    Clear what a crew run leaves on an agent, so the next crew starts from a clean agent.
+    The agent executor is rebuilt for every run by data_catalog.dag.run_crew_dag.
+
+    Args:
+        agent: The CrewAI agent
+    """
+    agent.crew = None
+    agent.step_callback = None
+    if getattr(agent, 'tools_results', None):
+        agent.tools_results = []
+
+
+class AgentPool:
+    """
+    Pool of warm agent sets, built once and reused by the following crews.
+    A set is checked out for one crew run and checked back in afterwards, so
+    agents are never shared by two crews running at the same time. Sets are
+    only built when every existing one is in use.
+    """
+
+    def __init__(self, factory, max_idle=AGENT_POOL_SIZE):
+        self.factory = factory
+        self.max_idle = max_idle
+        # Last in, first out: the most recently used set is handed out first
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self.stats = {'created': 0, 'reused': 0}
+
+    def checkout(self):
+        """
+        Take an idle agent set, or build one if there is none.
+
+        Returns:
+            The agent set built by the factory
+        """
+        try:
+            agents = self._idle.get_nowait()
+            counter = 'reused'
+        except queue.Empty:
+            agents = self.factory()
+            counter = 'created'
+        with self._lock:
+            self.stats[counter] += 1
+        return agents
+
+    def checkin(self, agents):
+        """
+        Give an agent set back to the pool. Sets beyond max_idle are dropped.
+
+        Args:
+            agents: The agent set, a dict or a list of agents
+        """
+        for agent in (agents.values() if isinstance(agents, dict) else agents):
+            reset_agent(agent)
+        with self._lock:
+            if self._idle.qsize() < self.max_idle:
+                self._idle.put(agents)
+
+    @contextmanager
+    def lease(self):
+        """
+        Check out an agent set for the duration of a with block.
+
+        Returns:
+            context manager: Gives the agent set, and checks it back in on exit
+        """
+        agents = self.checkout()
+        try:
+            yield agents
+        finally:
+            self.checkin(agents)
+
+
+def get_agent_pool(name, factory):
+    """
+    Get a pool of the process by name, creating it on first use.
+
+    Args:
+        name: The name of the pool
+        factory: The function building an agent set, used when the pool is created
+
+    Returns:
+        AgentPool: The pool
+    """
+    with _pools_lock:
+        pool = _pools.get(name)
+        if pool is None:
+            pool = AgentPool(factory)
+            _pools[name] = pool
+        return pool
@@ -2,17 +2,36 @@ from crewai import Agent
 from langchain_community.llms import OpenAI
 from dotenv import load_dotenv
 import os
+import threading
+from data_catalog.mock_llm import is_mock_provider
+from data_catalog.cached_llm import create_cached_llm, MockCrewLLM, DEFAULT_CREW_MODEL
 
 # Load environment variables
 load_dotenv()
 
+_llm = None
+_llm_lock = threading.Lock()
+
 
 def get_llm():
     """
     Get the language model to use with the agents.
+    It is built once and shared by every agent of the process.
     Returns:
         LLM: The language model
     """
+    global _llm
+    with _llm_lock:
+        if _llm is None:
+            _llm = _create_llm()
+        return _llm
+
+
+def _create_llm():
+    # Local mock LLM for load testing, see data_catalog.mock_llm
+    if is_mock_provider():
+        return create_cached_llm()
+
     # Use OpenAI's model
     try:
         api_key = os.getenv("OPENAI_API_KEY")
@@ -23,9 +42,8 @@ def get_llm():
     except Exception as e:
         # Fallback to a local model or dummy implementation
         print(f"Error loading OpenAI model: {e}")
-        # Return a dummy model for development
-        from langchain.llms.fake import FakeListLLM
-        return FakeListLLM(responses=["This is a dummy response."])
+        # Return the mock LLM for development, its answers have the shape of real ones
+        return MockCrewLLM(model=DEFAULT_CREW_MODEL)
 
 
 def create_data_analyzer_agent():
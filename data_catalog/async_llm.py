@@ -0,0 +1,399 @@
+import asyncio
+import contextvars
+import json
+import os
+import queue
+import random
+import threading
+import time
+from dotenv import load_dotenv
+
+from data_catalog.llm_cache import LLM_CACHE_ENABLED, get_llm_cache, make_cache_key
+from data_catalog.prompt_budget import count_tokens, count_message_tokens
+from tracing.spans import span, start_span, current_span
+
+# Load environment variables
+load_dotenv()
+
+# Maximum number of LLM requests in flight for the whole process
+LLM_MAX_CONCURRENCY = int(os.getenv("DUKE_LLM_MAX_CONCURRENCY", "8"))
+
+# Requests per minute allowed for each model
+LLM_REQUESTS_PER_MINUTE = float(os.getenv("DUKE_LLM_RPM", "500"))
+
+# Number of retries of a failed request
+LLM_MAX_RETRIES = int(os.getenv("DUKE_LLM_MAX_RETRIES", "4"))
+
+# Seconds before a request times out
+LLM_TIMEOUT = float(os.getenv("DUKE_LLM_TIMEOUT", "60"))
+
+# HTTP statuses worth retrying: rate limiting and server errors
+RETRY_STATUSES = {408, 409, 429, 500, 502, 503, 504}
+
+_client = None
+_loop = None
+_loop_lock = threading.Lock()
+_client_lock = threading.Lock()
+
+
+class LLMRequestError(Exception):
+    """
+    Raised when an LLM request fails after its retries.
+    """
+
+
+class TokenBucket:
+    """
+    Token bucket rate limiter: tokens are refilled continuously at a fixed
+    rate up to a capacity, and each request waits until it can take one.
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or max(rate, 1.0)
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        """
+        Wait until a token is available and take it.
+        """
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+def backoff_delay(attempt, base=0.5, cap=30.0):
+    """
+    Compute the delay before a retry, exponential with full jitter.
+
+    Args:
+        attempt: The number of the retry, starting at 0
+        base: The delay of the first retry, in seconds
+        cap: The maximum delay, in seconds
+
+    Returns:
+        float: The delay in seconds
+    """
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+class AsyncLLMClient:
+    """
+    Asynchronous client of the OpenAI chat completions API.
+    Requests share a pooled HTTP connection, the number of requests in flight
+    is capped by a semaphore, each model is rate limited by a token bucket,
+    and failed requests are retried with jittered exponential backoff.
+    """
+
+    def __init__(self, api_key=None, base_url=None, max_concurrency=LLM_MAX_CONCURRENCY,
+                 requests_per_minute=LLM_REQUESTS_PER_MINUTE, max_retries=LLM_MAX_RETRIES,
+                 timeout=LLM_TIMEOUT, transport=None):
+        import httpx
+
+        self.api_key = api_key or os.getenv("OPENAI_API_KEY")
+        self.base_url = (base_url or os.getenv("OPENAI_BASE_URL") or os.getenv("OPENAI_API_BASE")
+                         or "https://api.openai.com/v1").rstrip("/")
+        self.max_retries = max_retries
+        self.requests_per_minute = requests_per_minute
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._buckets = {}
+        self._http = httpx.AsyncClient(
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=max_concurrency, max_keepalive_connections=max_concurrency),
+            transport=transport,
+        )
+
+    def _bucket(self, model):
+        bucket = self._buckets.get(model)
+        if bucket is None:
+            bucket = TokenBucket(self.requests_per_minute / 60.0)
+            self._buckets[model] = bucket
+        return bucket
+
+    async def chat(self, model, messages, **params):
+        """
+        Send a chat completion request.
+
+        Args:
+            model: The model name
+            messages: The chat messages
+            **params: The generation parameters (temperature, max_tokens, ...)
+
+        Returns:
+            str: The response text
+        """
+        import httpx
+
+        payload = {'model': model, 'messages': messages, **params}
+        headers = {'Authorization': f"Bearer {self.api_key}"}
+        for attempt in range(self.max_retries + 1):
+            await self._bucket(model).acquire()
+            current_span().add(attempts=1)
+            try:
+                async with self._semaphore:
+                    response = await self._http.post(f"{self.base_url}/chat/completions",
+                                                     json=payload, headers=headers)
+            except httpx.TransportError as e:
+                error, retry_after = e, None
+            else:
+                if response.status_code < 400:
+                    return response.json()['choices'][0]['message']['content'].strip()
+                if response.status_code not in RETRY_STATUSES:
+                    raise LLMRequestError(f"LLM request failed with status {response.status_code}: {response.text}")
+                error = LLMRequestError(f"LLM request failed with status {response.status_code}")
+                retry_after = response.headers.get('retry-after')
+
+            await self._wait_before_retry(attempt, error, retry_after)
+
+    async def stream_chat(self, model, messages, **params):
+        """
+        Send a chat completion request and yield the response as it is generated.
+        The request is only retried while nothing has been yielded yet.
+
+        Args:
+            model: The model name
+            messages: The chat messages
+            **params: The generation parameters (temperature, max_tokens, ...)
+
+        Returns:
+            async iterator: The fragments of the response text
+        """
+        import httpx
+
+        payload = {'model': model, 'messages': messages, **params, 'stream': True}
+        headers = {'Authorization': f"Bearer {self.api_key}"}
+        for attempt in range(self.max_retries + 1):
+            await self._bucket(model).acquire()
+            started = False
+            try:
+                async with self._semaphore:
+                    async with self._http.stream("POST", f"{self.base_url}/chat/completions",
+                                                 json=payload, headers=headers) as response:
+                        if response.status_code < 400:
+                            # Server-sent events, one JSON chunk per data line
+                            async for line in response.aiter_lines():
+                                if not line.startswith("data:"):
+                                    continue
+                                data = line[len("data:"):].strip()
+                                if data == "[DONE]":
+                                    break
+                                choices = json.loads(data).get('choices') or [{}]
+                                fragment = (choices[0].get('delta') or {}).get('content')
+                                if fragment:
+                                    started = True
+                                    yield fragment
+                            return
+
+                        await response.aread()
+                        if response.status_code not in RETRY_STATUSES:
+                            raise LLMRequestError(
+                                f"LLM request failed with status {response.status_code}: {response.text}")
+                        error = LLMRequestError(f"LLM request failed with status {response.status_code}")
+                        retry_after = response.headers.get('retry-after')
+            except httpx.TransportError as e:
+                if started:
+                    raise LLMRequestError(f"LLM stream interrupted: {e}")
+                error, retry_after = e, None
+
+            await self._wait_before_retry(attempt, error, retry_after)
+
+    async def _wait_before_retry(self, attempt, error, retry_after):
+        # Raise the error of the last attempt, or sleep with backoff before the next one
+        if attempt == self.max_retries:
+            raise LLMRequestError(f"LLM request failed after {attempt + 1} attempts: {error}")
+        delay = backoff_delay(attempt)
+        if retry_after is not None:
+            try:
+                delay = max(delay, float(retry_after))
+            except ValueError:
+                pass
+        await asyncio.sleep(delay)
+
+    async def cached_chat(self, model, messages, **params):
+        """
+        Send a chat completion request, served from the LLM response cache when possible.
+
+        Args:
+            model: The model name
+            messages: The chat messages
+            **params: The generation parameters
+
+        Returns:
+            str: The response text
+        """
+        with span("llm.chat", model=model, prompt_tokens=count_message_tokens(messages, model)) as current:
+            cache = get_llm_cache() if LLM_CACHE_ENABLED else None
+            key = make_cache_key(model, messages, **params)
+            # SQLite calls block, they run in a worker thread to keep the loop free
+            response = await asyncio.to_thread(cache.get, key) if cache is not None else None
+            current.set(cache_hits=int(response is not None))
+            if response is None:
+                response = await self.chat(model, messages, **params)
+                if cache is not None:
+                    await asyncio.to_thread(cache.set, key, response)
+            current.set(completion_tokens=count_tokens(response, model))
+            return response
+
+    async def cached_stream_chat(self, model, messages, **params):
+        """
+        Stream a chat completion, a cached response is yielded at once.
+        The response is cached once it has been received in full.
+
+        Args:
+            model: The model name
+            messages: The chat messages
+            **params: The generation parameters
+
+        Returns:
+            async iterator: The fragments of the response text
+        """
+        # Not made current: the generator may be closed from another context
+        current = start_span("llm.stream_chat", model=model, prompt_tokens=count_message_tokens(messages, model))
+        fragments, error = [], None
+        try:
+            cache = get_llm_cache() if LLM_CACHE_ENABLED else None
+            key = make_cache_key(model, messages, **params)
+            response = await asyncio.to_thread(cache.get, key) if cache is not None else None
+            current.set(cache_hits=int(response is not None))
+            if response is not None:
+                fragments.append(response)
+                yield response
+                return
+
+            async for fragment in self.stream_chat(model, messages, **params):
+                fragments.append(fragment)
+                yield fragment
+            if cache is not None:
+                # Same text as a response of chat
+                await asyncio.to_thread(cache.set, key, "".join(fragments).strip())
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            current.set(completion_tokens=count_tokens("".join(fragments), model))
+            current.end(error=error)
+
+    async def close(self):
+        """
+        Close the pooled HTTP connections.
+        """
+        await self._http.aclose()
+
+
+def _in_caller_context(coroutine):
+    # Run the coroutine with the context variables of the calling thread, such
+    # as the current span, the tasks of the loop having a context of their own
+    context = contextvars.copy_context()
+
+    async def run():
+        for variable, value in context.items():
+            variable.set(value)
+        return await coroutine
+
+    return run()
+
+
+def _get_loop():
+    # Event loop running in a daemon thread for the whole process, so that the
+    # HTTP connection pool survives between the Streamlit reruns
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="llm-client", daemon=True).start()
+        return _loop
+
+
+def submit_async(coroutine):
+    """
+    Start a coroutine on the event loop of the LLM client without waiting for it.
+
+    Args:
+        coroutine: The coroutine
+
+    Returns:
+        concurrent.futures.Future: The future of the result of the coroutine
+    """
+    return asyncio.run_coroutine_threadsafe(_in_caller_context(coroutine), _get_loop())
+
+
+def run_async(coroutine):
+    """
+    Run a coroutine on the event loop of the LLM client and wait for its result.
+    Can be called from any thread that is not running the loop itself.
+
+    Args:
+        coroutine: The coroutine
+
+    Returns:
+        The result of the coroutine
+    """
+    return submit_async(coroutine).result()
+
+
+def iter_async(iterator):
+    """
+    Consume an async iterator on the event loop of the LLM client from a
+    synchronous caller, such as st.write_stream. Items are handed over as soon
+    as they are produced; closing the generator early cancels the iterator.
+
+    Args:
+        iterator: The async iterator
+
+    Returns:
+        iterator: The items of the async iterator
+    """
+    items = queue.Queue()
+    done = object()
+
+    async def consume():
+        try:
+            async for item in iterator:
+                items.put((item, None))
+        except Exception as e:
+            items.put((done, e))
+        else:
+            items.put((done, None))
+
+    future = asyncio.run_coroutine_threadsafe(_in_caller_context(consume()), _get_loop())
+    try:
+        while True:
+            item, error = items.get()
+            if error is not None:
+                raise error
+            if item is done:
+                return
+            yield item
+    finally:
+        future.cancel()
+
+
+def get_llm_client():
+    """
+    Get the asynchronous LLM client of the process.
+
+    Returns:
+        AsyncLLMClient: The client, bound to the event loop of run_async; it
+        talks to the mock LLM when DUKE_LLM_PROVIDER is mock
+    """
+    global _client
+    # Created directly, so it can be called from the loop thread as well: the
+    # asyncio primitives of the client bind to the loop on their first use
+    with _client_lock:
+        if _client is None:
+            from data_catalog.mock_llm import is_mock_provider, create_mock_transport, MOCK_BASE_URL
+
+            if is_mock_provider():
+                # Same client over a local transport, so pooling and retries are exercised too
+                _client = AsyncLLMClient(api_key="mock", base_url=MOCK_BASE_URL, transport=create_mock_transport())
+            else:
+                _client = AsyncLLMClient()
+        return _client
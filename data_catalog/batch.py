@@ -0,0 +1,28 @@
+import os
+import threading
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Maximum number of crews running at the same time in the whole process,
+# shared by every catalog job so that concurrent sessions stay within the LLM rate limits
+MAX_CONCURRENT_CREWS = int(os.getenv("DUKE_MAX_CONCURRENT_CREWS", "3"))
+
+_crew_slots = threading.BoundedSemaphore(MAX_CONCURRENT_CREWS)
+
+
+def run_with_crew_slot(func, *args, **kwargs):
+    """
+    Run a function once one of the process-wide crew slots is available.
+
+    Args:
+        func: The function running a crew
+        *args, **kwargs: Arguments to pass to func
+
+    Returns:
+        The result of func
+    """
+    with _crew_slots:
+        return func(*args, **kwargs)
+
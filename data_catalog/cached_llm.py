@@ -0,0 +1,89 @@
+import os
+import threading
+from crewai import LLM
+from dotenv import load_dotenv
+
+from data_catalog.llm_cache import cached_completion
+from data_catalog.mock_llm import is_mock_provider, get_mock_llm
+from data_catalog.prompt_budget import count_tokens, count_message_tokens
+from tracing.spans import span
+
+# Load environment variables
+load_dotenv()
+
+# Model used by the crew agents, same default as CrewAI
+DEFAULT_CREW_MODEL = os.getenv("OPENAI_MODEL_NAME", "gpt-4o-mini")
+
+_crew_llm = None
+_crew_llm_lock = threading.Lock()
+
+
+class CachedLLM(LLM):
+    """
+    CrewAI LLM whose plain completions go through the shared LLM response cache.
+    Calls that offer tools to the model are not cached, since their answer can
+    trigger side effects.
+    """
+
+    def call(self, messages, tools=None, callbacks=None, available_functions=None, **kwargs):
+        with span("llm.crew_call", model=self.model, prompt_tokens=count_message_tokens(messages)) as current:
+            if tools or available_functions:
+                response = self._call_llm(messages, tools=tools, callbacks=callbacks,
+                                          available_functions=available_functions, **kwargs)
+            else:
+                misses = []
+
+                def request(model, messages, **params):
+                    misses.append(model)
+                    return self._call_llm(messages, callbacks=callbacks, **kwargs)
+
+                response = cached_completion(request, model=self.model, messages=messages,
+                                             temperature=self.temperature, max_tokens=self.max_tokens, stop=self.stop)
+                current.set(cache_hits=int(not misses))
+            if isinstance(response, str):
+                current.set(completion_tokens=count_tokens(response))
+            return response
+
+    def _call_llm(self, messages, **kwargs):
+        # The uncached call to the provider
+        return super().call(messages, **kwargs)
+
+
+class MockCrewLLM(CachedLLM):
+    """
+    CrewAI LLM answered by the local mock LLM, see data_catalog.mock_llm.
+    Responses are still cached, set DUKE_LLM_CACHE=0 to time every call.
+    """
+
+    def _call_llm(self, messages, **kwargs):
+        return get_mock_llm().complete(messages, max_tokens=self.max_tokens)
+
+
+def create_cached_llm(model=None, **kwargs):
+    """
+    Create a CrewAI LLM backed by the LLM response cache.
+
+    Args:
+        model: The model name, defaults to DEFAULT_CREW_MODEL
+        **kwargs: Other arguments of crewai.LLM
+
+    Returns:
+        CachedLLM: The LLM, answered by the mock LLM when DUKE_LLM_PROVIDER is mock
+    """
+    llm_class = MockCrewLLM if is_mock_provider() else CachedLLM
+    return llm_class(model=model or DEFAULT_CREW_MODEL, **kwargs)
+
+
+def get_crew_llm():
+    """
+    Get the LLM shared by the agents of every crew of the process.
+    The LLM only holds its settings, so concurrent crews can use it.
+
+    Returns:
+        CachedLLM: The LLM, see create_cached_llm
+    """
+    global _crew_llm
+    with _crew_llm_lock:
+        if _crew_llm is None:
+            _crew_llm = create_cached_llm()
+        return _crew_llm
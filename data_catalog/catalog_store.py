@@ -0,0 +1,357 @@
+import glob
+import json
+import re
+import os
+import sqlite3
+import threading
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Path of the catalog database, in the working directory like the former catalog_*.json files
+CATALOG_DB_PATH = os.getenv("DUKE_CATALOG_DB", "catalog.sqlite")
+
+# Columns of the catalog summary
+SUMMARY_COLUMNS = ['id', 'file_name', 'title', 'domain', 'created_at', 'quality_score']
+
+# Columns the entries can be sorted by
+SORT_COLUMNS = {'id', 'file_name', 'domain', 'created_at', 'quality_score'}
+
+# Full-text fields of an entry and their BM25 weight
+SEARCH_FIELDS = {'title': 10.0, 'description': 5.0, 'columns': 4.0, 'glossary': 3.0, 'documentation': 1.0}
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def _summary_fields(catalog_entry):
+    quality_score = catalog_entry.get('quality_assessment', {}).get('overall_score')
+    try:
+        quality_score = float(quality_score) if quality_score is not None else None
+    except (TypeError, ValueError):
+        quality_score = None
+    return {
+        'id': catalog_entry['id'],
+        'file_name': catalog_entry.get('file_name'),
+        'title': catalog_entry.get('metadata', {}).get('title'),
+        'domain': catalog_entry.get('metadata', {}).get('domain'),
+        'created_at': catalog_entry.get('created_at'),
+        'quality_score': quality_score
+    }
+
+
+def _flatten_text(value):
+    if isinstance(value, dict):
+        return " ".join(f"{key} {_flatten_text(item)}" for key, item in value.items())
+    if isinstance(value, (list, tuple)):
+        return " ".join(_flatten_text(item) for item in value)
+    return "" if value is None else str(value)
+
+
+def _search_fields(catalog_entry):
+    metadata = catalog_entry.get('metadata', {})
+    columns = catalog_entry.get('schema', {}).get('columns', [])
+    return {
+        'title': _flatten_text(metadata.get('title')),
+        'description': _flatten_text(metadata.get('description')),
+        'columns': " ".join(f"{column.get('name', '')} {column.get('description', '')}" for column in columns
+                            if isinstance(column, dict)),
+        'glossary': _flatten_text(catalog_entry.get('business_glossary')),
+        'documentation': _flatten_text(catalog_entry.get('documentation'))
+    }
+
+
+def _entry_tags(catalog_entry):
+    tags = catalog_entry.get('metadata', {}).get('tags', [])
+    if isinstance(tags, str):
+        tags = tags.split(',')
+    return sorted({str(tag).strip().lower() for tag in tags if str(tag).strip()})
+
+
+def _match_query(query):
+    # Every word must match, as a prefix; quoting keeps FTS5 operators out of user input
+    words = re.findall(r"\w+", query)
+    return " ".join(f'"{word}"*' for word in words)
+
+
+def _where(file_name=None, domain=None):
+    conditions, params = [], []
+    if file_name is not None:
+        conditions.append("file_name = ?")
+        params.append(file_name)
+    if domain is not None:
+        conditions.append("domain = ?")
+        params.append(domain)
+    return (" WHERE " + " AND ".join(conditions) if conditions else ""), params
+
+
+class CatalogStore:
+    """
+    SQLite store of the catalog entries.
+    The summary fields live in indexed columns so the catalog can be listed,
+    filtered and paginated without parsing the entries, which are kept as JSON.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS catalog_entries ("
+            "pk INTEGER PRIMARY KEY, id TEXT NOT NULL UNIQUE, file_name TEXT, title TEXT, domain TEXT, "
+            "created_at TEXT, quality_score REAL, entry TEXT NOT NULL)"
+        )
+        for column in ('file_name', 'domain', 'created_at', 'quality_score'):
+            self._connection.execute(
+                f"CREATE INDEX IF NOT EXISTS catalog_entries_{column} ON catalog_entries ({column})"
+            )
+
+        # Full-text index, its rowid is the pk of the entry in catalog_entries
+        self._connection.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS catalog_search USING fts5({', '.join(SEARCH_FIELDS)})"
+        )
+        self._connection.execute("CREATE TABLE IF NOT EXISTS catalog_tags (entry_id TEXT NOT NULL, tag TEXT NOT NULL)")
+        self._connection.execute("CREATE INDEX IF NOT EXISTS catalog_tags_tag ON catalog_tags (tag)")
+        self._connection.execute("CREATE INDEX IF NOT EXISTS catalog_tags_entry_id ON catalog_tags (entry_id)")
+        self._connection.commit()
+
+        # Index the entries saved before the search index existed
+        indexed = self._connection.execute("SELECT COUNT(*) FROM catalog_search").fetchone()[0]
+        if indexed != self.count():
+            self.rebuild_search_index()
+
+    def save(self, catalog_entry):
+        """
+        Insert or replace a catalog entry.
+
+        Args:
+            catalog_entry: The catalog entry, with an 'id' key
+        """
+        fields = _summary_fields(catalog_entry)
+        fields['entry'] = json.dumps(catalog_entry)
+        with self._lock:
+            # Update the search index in the same transaction as the entry
+            self._unindex(catalog_entry['id'])
+            cursor = self._connection.execute(
+                "INSERT OR REPLACE INTO catalog_entries "
+                "(id, file_name, title, domain, created_at, quality_score, entry) "
+                "VALUES (:id, :file_name, :title, :domain, :created_at, :quality_score, :entry)", fields
+            )
+            self._index(cursor.lastrowid, catalog_entry)
+            self._connection.commit()
+
+    def _index(self, pk, catalog_entry):
+        search_fields = _search_fields(catalog_entry)
+        self._connection.execute(
+            f"INSERT INTO catalog_search (rowid, {', '.join(SEARCH_FIELDS)}) "
+            f"VALUES (?, {', '.join('?' for _ in SEARCH_FIELDS)})",
+            [pk] + [search_fields[field] for field in SEARCH_FIELDS]
+        )
+        self._connection.executemany(
+            "INSERT INTO catalog_tags (entry_id, tag) VALUES (?, ?)",
+            [(catalog_entry['id'], tag) for tag in _entry_tags(catalog_entry)]
+        )
+
+    def _unindex(self, catalog_id):
+        row = self._connection.execute("SELECT pk FROM catalog_entries WHERE id = ?", (catalog_id,)).fetchone()
+        if row is not None:
+            self._connection.execute("DELETE FROM catalog_search WHERE rowid = ?", (row[0],))
+        self._connection.execute("DELETE FROM catalog_tags WHERE entry_id = ?", (catalog_id,))
+
+    def rebuild_search_index(self):
+        """
+        Rebuild the full-text and tag indexes from the stored entries.
+        """
+        with self._lock:
+            self._connection.execute("DELETE FROM catalog_search")
+            self._connection.execute("DELETE FROM catalog_tags")
+            rows = self._connection.execute("SELECT pk, entry FROM catalog_entries").fetchall()
+            for pk, entry in rows:
+                self._index(pk, json.loads(entry))
+            self._connection.commit()
+
+    def get(self, catalog_id):
+        """
+        Get a catalog entry by ID.
+
+        Args:
+            catalog_id: The catalog ID
+
+        Returns:
+            dict: The catalog entry, or None if it does not exist
+        """
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT entry FROM catalog_entries WHERE id = ?", (catalog_id,)
+            ).fetchone()
+        return json.loads(row[0]) if row is not None else None
+
+    def delete(self, catalog_id):
+        """
+        Delete a catalog entry.
+
+        Args:
+            catalog_id: The catalog ID
+        """
+        with self._lock:
+            self._unindex(catalog_id)
+            self._connection.execute("DELETE FROM catalog_entries WHERE id = ?", (catalog_id,))
+            self._connection.commit()
+
+    def _query(self, select, file_name=None, domain=None, order_by='created_at', descending=True,
+               offset=0, limit=None):
+        if order_by not in SORT_COLUMNS:
+            raise ValueError(f"Cannot sort catalog entries by {order_by}")
+
+        where, params = _where(file_name, domain)
+        sql = f"SELECT {select} FROM catalog_entries{where}"
+        sql += f" ORDER BY {order_by} {'DESC' if descending else 'ASC'}, id"
+        sql += " LIMIT ? OFFSET ?"
+        params = params + [-1 if limit is None else limit, offset]
+
+        with self._lock:
+            return self._connection.execute(sql, params).fetchall()
+
+    def list_entries(self, **query):
+        """
+        List catalog entries.
+
+        Args:
+            **query: file_name and domain filters, order_by, descending, offset and limit
+
+        Returns:
+            list: The catalog entries
+        """
+        return [json.loads(row[0]) for row in self._query("entry", **query)]
+
+    def list_summaries(self, **query):
+        """
+        List the summary fields of catalog entries, without loading the entries.
+
+        Args:
+            **query: file_name and domain filters, order_by, descending, offset and limit
+
+        Returns:
+            list: One dict per entry with the keys of SUMMARY_COLUMNS
+        """
+        rows = self._query(", ".join(SUMMARY_COLUMNS), **query)
+        return [dict(zip(SUMMARY_COLUMNS, row)) for row in rows]
+
+    def count(self, file_name=None, domain=None):
+        """
+        Count catalog entries.
+
+        Args:
+            file_name: Only count the entries of this file
+            domain: Only count the entries of this domain
+
+        Returns:
+            int: The number of entries
+        """
+        where, params = _where(file_name, domain)
+        sql = f"SELECT COUNT(*) FROM catalog_entries{where}"
+        with self._lock:
+            return self._connection.execute(sql, params).fetchone()[0]
+
+    def search(self, query, domain=None, tag=None, offset=0, limit=20):
+        """
+        Search the catalog entries, ranked by BM25 over the title, description,
+        columns, business glossary and documentation of the entries.
+
+        Args:
+            query: The words to look for, each one must match as a prefix
+            domain: Only return the entries of this domain
+            tag: Only return the entries with this tag
+            offset: The number of results to skip
+            limit: The maximum number of results
+
+        Returns:
+            dict: 'total' number of matches, 'results' (summary fields and score,
+            best first) and 'facets' (match counts per domain and per tag)
+        """
+        match = _match_query(query)
+        conditions, params = [], []
+        if match:
+            conditions.append("catalog_search MATCH ?")
+            params.append(match)
+        if domain is not None:
+            conditions.append("e.domain = ?")
+            params.append(domain)
+        if tag is not None:
+            conditions.append("e.id IN (SELECT entry_id FROM catalog_tags WHERE tag = ?)")
+            params.append(tag.strip().lower())
+
+        source = "catalog_entries e"
+        score = "0.0"
+        if match:
+            source = "catalog_search JOIN catalog_entries e ON e.pk = catalog_search.rowid"
+            score = f"-bm25(catalog_search, {', '.join(str(weight) for weight in SEARCH_FIELDS.values())})"
+        where = " WHERE " + " AND ".join(conditions) if conditions else ""
+        matches = f"SELECT e.id FROM {source}{where}"
+
+        summary_columns = ", ".join(f"e.{column}" for column in SUMMARY_COLUMNS)
+        with self._lock:
+            rows = self._connection.execute(
+                f"SELECT {summary_columns}, {score} AS score FROM {source}{where} "
+                f"ORDER BY score DESC, e.created_at DESC LIMIT ? OFFSET ?", params + [limit, offset]
+            ).fetchall()
+            total = self._connection.execute(f"SELECT COUNT(*) FROM ({matches})", params).fetchone()[0]
+            domains = self._connection.execute(
+                f"SELECT domain, COUNT(*) FROM catalog_entries WHERE id IN ({matches}) "
+                f"GROUP BY domain ORDER BY COUNT(*) DESC", params
+            ).fetchall()
+            tags = self._connection.execute(
+                f"SELECT tag, COUNT(*) FROM catalog_tags WHERE entry_id IN ({matches}) "
+                f"GROUP BY tag ORDER BY COUNT(*) DESC", params
+            ).fetchall()
+
+        return {
+            'total': total,
+            'results': [dict(zip(SUMMARY_COLUMNS + ['score'], row)) for row in rows],
+            'facets': {
+                'domain': {name or 'unknown': count for name, count in domains},
+                'tags': dict(tags)
+            }
+        }
+
+    def import_json_files(self, pattern="catalog_*.json"):
+        """
+        Import catalog entries saved as JSON files by previous versions.
+        Entries already in the store are left untouched.
+
+        Args:
+            pattern: The glob pattern of the JSON files
+
+        Returns:
+            int: The number of imported entries
+        """
+        imported = 0
+        for catalog_file in sorted(glob.glob(pattern)):
+            try:
+                with open(catalog_file, 'r') as file:
+                    catalog_entry = json.load(file)
+            except Exception as e:
+                print(f"Error loading catalog entry {catalog_file}: {e}")
+                continue
+            if 'id' not in catalog_entry or self.get(catalog_entry['id']) is not None:
+                continue
+            self.save(catalog_entry)
+            imported += 1
+        return imported
+
+
+def get_catalog_store():
+    """
+    Get the catalog store of the process.
+    Catalog entries left as JSON files in the working directory are imported on first use.
+
+    Returns:
+        CatalogStore: The store, at DUKE_CATALOG_DB
+    """
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = CatalogStore(CATALOG_DB_PATH)
+            _store.import_json_files()
+        return _store
@@ -1,46 +1,46 @@
-import os
 from dotenv import load_dotenv
-from crewai import Agent, Task, Crew, Process
-from crewai_tools import CodeInterpreterTool
-import pandas as pd
 import streamlit as st
-from file_loader.load_file import load_excel_file, load_csv_file, load_txt_file
-from file_loader.utils import get_file_extension
-import time
-import agentops
+from file_loader.dataset import get_content_hash, get_file_sample_text, get_file_profile_text, get_file_profiles
+from data_catalog.utils import build_catalog_entry, save_catalog_entry
+from data_catalog.fingerprints import CATALOG_TASKS, load_snapshot, save_snapshot, plan_recatalog
+from data_catalog.jobs import submit_job, check_cancelled
+from data_catalog.dag import run_crew_dag
+from data_catalog.crewai_feedback import install_human_input_hook
+from data_catalog.prompt_budget import assemble_prompt, fit_sections, record_prompt_usage, CONTEXT_TOKEN_BUDGET
+from data_catalog.telemetry import init_agentops
+from data_catalog.agent_pool import get_agent_pool
+from tracing.spans import span
 
 # Load environment variables
 load_dotenv()
 
-# init agentops
-agentops.init(api_key="7c70392b-f574-456d-aa56-1196d9d1c5b8",
-              default_tags=['crewai'])
 
-
-def create_catalog_crew(file):
+def create_catalog_agents():
     """
-    Create a real CrewAI crew for data cataloging.
-
-    Args:
-        file: The file to catalog
+    Create the agents of the catalog crew.
 
     Returns:
-        Crew: The catalog crew
+        dict: The agents keyed by the task key they work on, see data_catalog.fingerprints.CATALOG_TASKS
     """
-    # Initialize the tool
-    code_interpreter = CodeInterpreterTool(unsafe_mode=True)
+    from crewai import Agent
+    from data_catalog.cached_llm import get_crew_llm
+
+    # Shared LLM of the agents, identical prompts are answered from the cache
+    crew_llm = get_crew_llm()
 
-    # Create the agents
+    # Create the agents. None of them delegates: the tasks run as a dependency
+    # graph (see run_crew_dag) where an agent only runs under its own lock, and a
+    # delegation would run another agent outside of it, maybe during its own task
     data_analyzer = Agent(
         role="Data Analyst",
         goal="Analyze data files to identify structure, patterns, and quality issues",
         backstory="""You are an expert data analyst with years of experience in 
         understanding various data formats and structures. You excel at identifying 
         patterns, data quality issues, and extracting meaningful insights from raw data.
-        You can run code to already provide high level data analysis at the data catalogue creation""",
+        You are given a precomputed profile of the data and interpret its facts""",
         verbose=True,
-        allow_delegation=True,
-        allow_code_execution=True  # This automatically adds the CodeInterpreterTool
+        llm=crew_llm,
+        allow_delegation=False
     )
 
     schema_extractor = Agent(
@@ -51,7 +51,8 @@ def create_catalog_crew(file):
         types, relationships, and constraints. You are meticulous and thorough in 
         your analysis.""",
         verbose=True,
-        allow_delegation=True
+        llm=crew_llm,
+        allow_delegation=False
     )
 
     metadata_curator = Agent(
@@ -62,7 +63,8 @@ def create_catalog_crew(file):
         tag it appropriately, and provide context that makes it easily discoverable 
         and usable by others.""",
         verbose=True,
-        allow_delegation=True
+        llm=crew_llm,
+        allow_delegation=False
     )
 
     data_quality_agent = Agent(
@@ -71,10 +73,11 @@ def create_catalog_crew(file):
         backstory="""You are a data quality expert who has helped many organizations 
         improve their data. You can quickly spot inconsistencies, missing values, 
         outliers, and other quality issues. You provide clear assessments and 
-        actionable recommendations. You run comprehensive code to document precisely the data quality issues""",
+        actionable recommendations. You document the data quality issues precisely from the
+        measured completeness, outliers, types and value patterns of the data""",
         verbose=True,
-        allow_delegation=False,
-        allow_code_execution=True  # This automatically adds the CodeInterpreterTool
+        llm=crew_llm,
+        allow_delegation=False
     )
 
     business_glossary_agent = Agent(
@@ -85,7 +88,8 @@ def create_catalog_crew(file):
         terms and concepts that are understandable to all stakeholders. You ensure 
         consistency in terminology across the organization.""",
         verbose=True,
-        allow_delegation=True
+        llm=crew_llm,
+        allow_delegation=False
     )
 
     documentation_agent = Agent(
@@ -96,49 +100,113 @@ def create_catalog_crew(file):
         documentation that is accessible to both technical and non-technical users. 
         Your documentation is always complete, accurate, and user-friendly.""",
         verbose=True,
-        allow_delegation=True
+        llm=crew_llm,
+        allow_delegation=False
     )
 
+    return {
+        'analysis': data_analyzer,
+        'schema': schema_extractor,
+        'metadata': metadata_curator,
+        'quality': data_quality_agent,
+        'glossary': business_glossary_agent,
+        'documentation': documentation_agent
+    }
+
+
+def lease_catalog_agents():
+    """
+    Lease a set of catalog agents from the warm pool of the process for one crew run.
+
+    Returns:
+        context manager: Gives the agents keyed by task key, and returns them to the pool on exit
+    """
+    return get_agent_pool('catalog', create_catalog_agents).lease()
+
+
+def create_catalog_crew(file, previous_outputs=None, schema_changes=None, prompt_usage=None, agents=None,
+                        previous_schema=None):
+    """
+    Create a real CrewAI crew for data cataloging.
+
+    Args:
+        file: The file to catalog
+        previous_outputs: The stored outputs of the tasks that do not need to run
+            again, keyed by task key (see data_catalog.fingerprints.CATALOG_TASKS)
+        schema_changes: The column changes since the previous catalog, if any
+        prompt_usage: Optional dict filled with the token usage report of each
+            task description, keyed by task key
+        agents: The agents keyed by task key, see lease_catalog_agents; new
+            agents are created when not given
+        previous_schema: The schema of the previous catalog, updated by the
+            schema task from schema_changes
+
+    Returns:
+        Crew: The catalog crew
+    """
+    # CrewAI is only loaded by the first cataloging job
+    from crewai import Task, Crew, Process
+
+    # New agents are created when the caller did not lease them from the pool
+    if agents is None:
+        agents = create_catalog_agents()
+    data_analyzer = agents['analysis']
+    schema_extractor = agents['schema']
+    metadata_curator = agents['metadata']
+    data_quality_agent = agents['quality']
+    business_glossary_agent = agents['glossary']
+    documentation_agent = agents['documentation']
+
     # Create tasks with human_input=True for validation at each step
     file_name = file.name
-    file_extension = get_file_extension(file_name)
 
-    # Load a small sample of the file for analysis
+    # Load a small sample of the file for analysis, the parsed file is shared
+    # with any other task builder working on the same upload
     file_content = None
     try:
-        if file_extension in ['.xls', '.xlsx']:
-            df = load_excel_file(file)
-            if df is not None:
-                file_content = df.head(10).to_string()
-        elif file_extension == '.csv':
-            df = load_csv_file(file)
-            if df is not None:
-                file_content = df.head(10).to_string()
-        elif file_extension == '.txt':
-            file_content = load_txt_file(file)
-            if isinstance(file_content, pd.DataFrame):
-                file_content = file_content.head(10).to_string()
-            elif file_content is not None:
-                file_content = file_content[:1000]  # First 1000 characters
+        file_content = [get_file_sample_text(file), get_file_sample_text(file, n_rows=3)]
     except Exception as e:
         file_content = f"Error loading file: {str(e)}"
 
+    # Column profile computed natively (completeness, types, patterns, outliers,
+    # distributions), shared by the analysis, schema and quality tasks
+    column_profile = None
+    try:
+        column_profile = [get_file_profile_text(file), get_file_profile_text(file, compact=True)]
+    except Exception as e:
+        column_profile = f"Error profiling file: {str(e)}"
+
+    # The sample and the profile are shrunk to fit the token budget of each
+    # task, the detailed renderings are replaced by the short ones first
+    if prompt_usage is None:
+        prompt_usage = {}
+
+    def budgeted(task_key, template, **sections):
+        with span(f"task_builder.{task_key}"):
+            description, prompt_usage[task_key] = assemble_prompt(template, sections, fixed={'file_name': file_name},
+                                                                   task_name=task_key)
+            record_prompt_usage(prompt_usage[task_key])
+        return description
+
     # Task 1: File Analysis
     file_analysis_task = Task(
-        description=f"""
+        description=budgeted('analysis', """
         Analyze the structure and content of the file: {file_name}
 
         Sample content:
         {file_content}
 
+        Column profile:
+        {column_profile}
+
         Your task is to:
         1. Identify the overall structure of the file
         2. Determine what kind of data it contains
         3. Identify any patterns or notable features
         4. Provide a summary of what this file appears to be used for
 
-        Be detailed but concise in your analysis. Run code to create high level input already on the data catalogue curation
-        """,
+        Be detailed but concise in your analysis. The column profile is computed on the whole file, rely on its facts rather than recomputing them
+        """, file_content=file_content, column_profile=column_profile),
         agent=data_analyzer,
         expected_output="A comprehensive analysis of the file structure and content in markdown format"
         # human_input=True
@@ -146,11 +214,14 @@ def create_catalog_crew(file):
 
     # Task 2: Schema Extraction
     schema_extraction_task = Task(
-        description=f"""
+        description=budgeted('schema', """
         Extract the schema from the file: {file_name}
 
         Based on the previous analysis and the sample data, create a formal schema definition.
 
+        Column profile:
+        {column_profile}
+
         Your task is to:
         0. Identify if the table in tabular shape or in other style. Provide guidelines to clean the dataset into a tabular format fit for analysis. 
         1. Define a formal schema for this data
@@ -161,7 +232,7 @@ def create_catalog_crew(file):
         6. Include any business rules or calculations that apply (e.g., cost = sales - profit)
 
         Provide the schema in a structured, clear format using markdown.
-        """,
+        """, column_profile=column_profile),
         agent=schema_extractor,
         expected_output="A formal schema definition for the data file in markdown format",
         context=[file_analysis_task]
@@ -170,7 +241,7 @@ def create_catalog_crew(file):
 
     # Task 3: Metadata Curation
     metadata_curation_task = Task(
-        description=f"""
+        description=budgeted('metadata', """
         Create comprehensive metadata for the file: {file_name}
 
         Using the schema information and analysis already provided, create detailed metadata.
@@ -185,9 +256,14 @@ def create_catalog_crew(file):
         7. Note all fields that can fall under GDPR considerations
 
         Create metadata that would help users discover and understand this data asset.
+        Start with these lines, they are indexed by the catalog search:
+        - **Title**: the title
+        - **Description**: a one sentence description
+        - **Tags**: the tags, separated by commas
+        - **Domain**: the data domain
 
         IMPORTANT: Check with the human user if your metadata is appropriate and if they want to add any additional information.
-        """,
+        """),
         agent=metadata_curator,
         expected_output="Comprehensive metadata for the data file in markdown format",
         context=[schema_extraction_task]
@@ -196,10 +272,14 @@ def create_catalog_crew(file):
 
     # Task 4: Data Quality Assessment
     data_quality_task = Task(
-        description=f"""
+        description=budgeted('quality', """
         Assess the quality of data in the file: {file_name}
 
-        Using the schema information and analysis already provided, evaluate the data quality by running dedicated python code to ensure real data output.
+        Using the schema information and analysis already provided, evaluate the data quality from the column profile below.
+        It is computed on the whole file: completeness, inferred types, value patterns, IQR and z-score outliers and distributions.
+
+        Column profile:
+        {column_profile}
 
         Your task is to:
         1. Evaluate the completeness of the data (missing values, empty fields)
@@ -209,10 +289,11 @@ def create_catalog_crew(file):
         5. Suggest specific improvements to enhance data quality
 
         Provide a detailed data quality assessment in markdown format.
+        Start with the line: Overall quality score: <0 to 100>/100
 
 
         IMPORTANT: Check with the human user if your quality assessment is thorough enough and if they have additional quality concerns.
-        """,
+        """, column_profile=column_profile),
         agent=data_quality_agent,
         expected_output="A comprehensive data quality assessment in markdown format",
         context=[file_analysis_task, schema_extraction_task, metadata_curation_task]
@@ -221,7 +302,7 @@ def create_catalog_crew(file):
 
     # Task 5: Business Glossary
     business_glossary_task = Task(
-        description=f"""
+        description=budgeted('glossary', """
         Create a business glossary based on the data in {file_name}
 
         Using all the information collected so far (analysis, schema, metadata, quality assessment),
@@ -235,10 +316,10 @@ def create_catalog_crew(file):
         5. Ensure consistency with any existing business terminology
 
         Create a business glossary that would help users understand the business context of this data.
-        Format your response in markdown.
+        Format your response in markdown, with one line per term: - **Term**: definition
 
         IMPORTANT: Check with the human user if your business glossary is accurate and if they want to add or modify any definitions.
-        """,
+        """),
         agent=business_glossary_agent,
         expected_output="A business glossary for the data file in markdown format",
         context=[metadata_curation_task]
@@ -247,7 +328,7 @@ def create_catalog_crew(file):
 
     # Task 6: Documentation
     documentation_task = Task(
-        description=f"""
+        description=budgeted('documentation', """
         Create comprehensive documentation for the data catalog entry for: {file_name}
 
         Compile all the information collected so far into a well-structured documentation.
@@ -263,7 +344,7 @@ def create_catalog_crew(file):
         Format your response in markdown.
 
 
-        """,
+        """),
         agent=documentation_agent,
         expected_output="Comprehensive documentation for the data catalog entry in markdown format",
         context=[file_analysis_task, schema_extraction_task, data_quality_task, metadata_curation_task,
@@ -298,16 +379,20 @@ def create_catalog_crew(file):
         # human_input=True
     )
 
-    manager = Agent(
-        role="Senior Data Stewart",
-        goal="Efficiently manage the crew and ensure high-quality data gouvernance and definition by all team members",
-        backstory="You're an experienced  Data Stewart, skilled in overseeing complex data gouverance and documentation projects and guiding teams to success. Your role is to coordinate the efforts of the crew members, ensuring that each task is completed on time and to the highest standard.",
-        allow_delegation=True,
-    )
-    # Create the crew
+    # Reuse the stored outputs of the tasks whose inputs did not change
+    tasks = {
+        'analysis': file_analysis_task,
+        'schema': schema_extraction_task,
+        'metadata': metadata_curation_task,
+        'quality': data_quality_task,
+        'glossary': business_glossary_task,
+        'documentation': documentation_task
+    }
+    if previous_outputs or schema_changes:
+        _reuse_task_outputs(tasks, previous_outputs or {}, schema_changes, previous_schema)
+
+    # Create the crew, run as a task graph by data_catalog.dag.run_crew_dag
     crew = Crew(
-        manager_llm='o3-mini',
-        # manager_agent=manager,
         agents=[
             data_analyzer,
             schema_extractor,
@@ -316,22 +401,120 @@ def create_catalog_crew(file):
             business_glossary_agent,
             documentation_agent
         ],
-        tasks=[
-            file_analysis_task,
-            schema_extraction_task,
-            metadata_curation_task,
-            data_quality_task,
-            business_glossary_task,
-            documentation_task
-            #            yaml_catalog_task
-        ],
-        process=Process.hierarchical,
+        tasks=[task for key, task in tasks.items() if key not in (previous_outputs or {})],
+        process=Process.sequential,
+        # Stop between steps when the background job is cancelled
+        step_callback=check_cancelled,
+        task_callback=check_cancelled,
         verbose=True
     )
 
     return crew
 
 
+def _reuse_task_outputs(tasks, previous_outputs, schema_changes=None, previous_schema=None):
+    """
+    Replace the tasks that do not need to run again by their stored output.
+    The reused tasks are removed from the context of the remaining tasks and
+    their output is added to the description instead.
+
+    Args:
+        tasks: The crew tasks keyed by task key
+        previous_outputs: The stored outputs keyed by task key
+        schema_changes: The column changes since the previous catalog, if any
+        previous_schema: The schema of the previous catalog
+    """
+    reused = {id(tasks[key]): key for key in previous_outputs if key in tasks}
+    for key, task in tasks.items():
+        if key in previous_outputs:
+            continue
+
+        context = task.context if isinstance(task.context, list) else []
+        reused_context = [reused[id(context_task)] for context_task in context if id(context_task) in reused]
+        task.context = [context_task for context_task in context if id(context_task) not in reused]
+
+        # The reused outputs share the token budget of the task context
+        reused_outputs, _ = fit_sections({context_key: previous_outputs[context_key] for context_key in reused_context},
+                                         CONTEXT_TOKEN_BUDGET)
+        for context_key in reused_context:
+            task.description += f"""
+
+        Result of the previous {context_key} task (unchanged, reused from the last catalog):
+        {reused_outputs[context_key]}
+        """
+
+        if schema_changes and key == 'schema':
+            changes = "\n        ".join(f"- {change}" for change in schema_changes)
+            task.description += f"""
+
+        The file was cataloged before. Changes since the previous catalog:
+        {changes}
+
+        Previous schema, update it with the changes above:
+        {previous_schema or 'Not available'}
+        """
+
+
+def catalog_file(file):
+    """
+    Run the CrewAI catalog process for a file and save the catalog entry.
+    Only the tasks whose inputs changed since the last catalog of the file are
+    run again; an unchanged file returns the stored catalog at once.
+    Does not touch the Streamlit session, so it can run in a worker thread.
+
+    Args:
+        file: The file to catalog
+
+    Returns:
+        str: The final catalog documentation
+    """
+    init_agentops()
+    # Tasks asking for human input wait for the answer of the session
+    install_human_input_hook()
+
+    # Compare the file with the snapshot of its last catalog
+    content_hash = get_content_hash(file)
+    profiles = get_file_profiles(file)
+    snapshot = load_snapshot(file.name, profiles)
+    tasks_to_run, schema_changes = plan_recatalog(snapshot, content_hash, profiles)
+
+    if not tasks_to_run:
+        return snapshot['task_outputs']['documentation']
+
+    # The snapshot describes an earlier version of this file unless it is cataloged from scratch
+    previous_outputs, previous_schema, catalog_id = None, None, None
+    if snapshot is not None and (tasks_to_run != set(CATALOG_TASKS) or schema_changes):
+        previous_outputs = {key: output for key, output in snapshot['task_outputs'].items()
+                            if key not in tasks_to_run}
+        previous_schema = snapshot['task_outputs'].get('schema')
+        catalog_id = snapshot.get('catalog_entry', {}).get('id')
+
+    # Create the crew with warm agents, this parses and profiles the file
+    prompt_usage = {}
+    with lease_catalog_agents() as agents:
+        crew = create_catalog_crew(file, previous_outputs, schema_changes, prompt_usage, agents, previous_schema)
+
+        # Independent tasks run concurrently, following their context
+        result = run_crew_dag(crew)
+
+    # Keep the output of every task for the next incremental run
+    task_outputs = dict(previous_outputs or {})
+    run_keys = [key for key in CATALOG_TASKS if key not in task_outputs]
+    for key, task_output in zip(run_keys, result.tasks_output):
+        task_outputs[key] = task_output.raw
+
+    # Save the catalog entry along with the column profile of the file
+    catalog_entry = build_catalog_entry(file.name, str(result), profiles, task_outputs)
+    if catalog_id is not None:
+        # A new version of the file keeps the ID of its catalog entry
+        catalog_entry['id'] = catalog_id
+    catalog_entry['prompt_tokens'] = {key: usage['tokens'] for key, usage in prompt_usage.items()}
+    save_catalog_entry(catalog_entry, file.name)
+    save_snapshot(file.name, content_hash, profiles, task_outputs, catalog_entry)
+
+    return result
+
+
 def run_catalog_crew(file):
     """
     Run the CrewAI catalog process for a file.
@@ -348,9 +531,7 @@ def run_catalog_crew(file):
         "content": f"Je commence l'analyse du fichier {file.name} avec CrewAI. Vous serez consulté à chaque étape du processus."
     })
 
-    # Create and run the crew
-    crew = create_catalog_crew(file)
-    result = crew.kickoff()
+    result = catalog_file(file)
 
     # Update with final result
     st.session_state.messages.append({
@@ -358,4 +539,27 @@ def run_catalog_crew(file):
         "content": f"Le catalogue de données pour {file.name} est maintenant complet:\n\n{result}"
     })
 
-    return result
\ No newline at end of file
+    return result
+
+
+def start_catalog_jobs(files):
+    """
+    Start the CrewAI catalog process for several files in the background.
+    Returns immediately; the results are delivered to the chat by
+    data_catalog.crewai_feedback.deliver_job_results.
+
+    Args:
+        files: The files to catalog
+
+    Returns:
+        list: The job IDs, one per file
+    """
+    file_names = ", ".join(file.name for file in files)
+    st.session_state.messages.append({
+        "role": "assistant",
+        "content": f"Je commence l'analyse de {len(files)} fichier(s) avec CrewAI: {file_names}"
+    })
+
+    job_ids = [submit_job(catalog_file, file, label=file.name) for file in files]
+    st.session_state.setdefault("catalog_jobs", []).extend(job_ids)
+    return job_ids
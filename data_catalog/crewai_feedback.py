@@ -1,22 +1,26 @@
 import os
 import streamlit as st
-from crewai import Agent, Task, Crew, Process
 from dotenv import load_dotenv
 import threading
-import queue
+from data_catalog.jobs import (submit_job, get_job, is_job_finished, cancel_job, forget_job, current_job_id,
+                               get_job_progress)
+from data_catalog.feedback_broker import get_channel, find_channel, close_channel, DEFAULT_FEEDBACK
+from data_catalog.dag import run_crew_dag
+from data_catalog.telemetry import init_agentops
 
 # Load environment variables
 load_dotenv()
 
-# Global feedback queue system
-feedback_queue = queue.Queue()
-next_step_event = threading.Event()
+_hook_lock = threading.Lock()
+_hook_installed = False
 
 
 def get_human_input(prompt):
     """
     Custom function for getting human input in Streamlit context.
     This is the function that will be used by CrewAI when a task has human_input=True.
+    It runs in the crew thread and only talks to the feedback channel of its own job,
+    the session state is updated by collect_feedback_requests in the script thread.
 
     Args:
         prompt: The prompt from CrewAI requesting human feedback
@@ -30,40 +34,145 @@ def get_human_input(prompt):
         if len(parts) >= 2:
             prompt = parts[1].strip()
 
-    # Update the chat with the feedback request
-    st.session_state.messages.append({
-        "role": "assistant",
-        "content": f"## Validation requise\n\n{prompt}\n\nVeuillez valider ou fournir des corrections."
-    })
+    job_id = current_job_id()
+    if job_id is None:
+        # Not running inside a background job, nobody can answer
+        return DEFAULT_FEEDBACK
 
-    # Update the workflow stage to indicate waiting for feedback
-    st.session_state.workflow_stage = "awaiting_feedback"
+    # Wait for feedback to be provided
+    # This is a blocking call in the CrewAI thread, woken up by provide_feedback
+    return get_channel(job_id).request_feedback(prompt)
 
-    # Set the prompt in session state for reference
-    st.session_state.current_feedback_prompt = prompt
 
-    # Signal need to rerun to update UI
-    st.session_state.need_rerun = True
+def install_human_input_hook():
+    """
+    Route the human input requests of CrewAI to the feedback channel of the
+    running job, see get_human_input. Installed once for the process.
+    """
+    # Override the CrewAI human_input function with our Streamlit-compatible version
+    # This is a bit of a hack, but necessary to integrate with Streamlit. The hook
+    # dispatches on the current job.
+    global _hook_installed
+    with _hook_lock:
+        if not _hook_installed:
+            import crewai.agents.cache
+            crewai.agents.cache.get_human_input = get_human_input
+            _hook_installed = True
 
-    # Wait for feedback to be provided
-    # This is a blocking call in the CrewAI thread
-    feedback = feedback_queue.get()
 
-    # Signal that we can proceed to the next step
-    next_step_event.set()
+def collect_feedback_requests():
+    """
+    Show the feedback requests of the CrewAI jobs of the session in the chat.
+    Must be called from the Streamlit script thread.
 
-    return feedback
+    Returns:
+        bool: True if at least one new request was added to the chat
+    """
+    pending = st.session_state.setdefault("pending_feedback", [])
+    added = False
+    for job_id in st.session_state.get("catalog_jobs", []):
+        # The channel of a finished job is closed, do not open it again
+        channel = find_channel(job_id)
+        if channel is None:
+            continue
+        for prompt in channel.pending_requests():
+            pending.append({"job_id": job_id, "prompt": prompt})
+            added = True
+
+    # Only show the next request once the previous one has been answered
+    if pending and st.session_state.workflow_stage != "awaiting_feedback":
+        request = pending[0]
+
+        # Update the chat with the feedback request
+        st.session_state.messages.append({
+            "role": "assistant",
+            "content": f"## Validation requise\n\n{request['prompt']}\n\nVeuillez valider ou fournir des corrections."
+        })
+
+        # Update the workflow stage to indicate waiting for feedback
+        st.session_state.workflow_stage = "awaiting_feedback"
+
+        # Set the prompt in session state for reference, with the agent that
+        # asked for it as the step label when its progress is known
+        st.session_state.current_feedback_prompt = request['prompt']
+        live_step = st.session_state.get("job_live_steps", {}).get(request['job_id'])
+        st.session_state.feedback_stage = live_step['title'] if live_step else "validation"
+        added = True
+
+    return added
+
+
+def collect_job_progress():
+    """
+    Show the outputs of the finished tasks of the running CrewAI jobs in the
+    chat, and keep the last agent step of each job for the status panel.
+    Must be called from the Streamlit script thread.
 
+    Returns:
+        bool: True if at least one task output was added to the chat
+    """
+    seen = st.session_state.setdefault("job_progress_seen", {})
+    live_steps = st.session_state.setdefault("job_live_steps", {})
+    added = False
+    for job_id in st.session_state.get("catalog_jobs", []):
+        job = get_job(job_id)
+        if job is None:
+            continue
+        finished = is_job_finished(job_id)
+        events = get_job_progress(job_id, seen.get(job_id, 0))
+        seen[job_id] = seen.get(job_id, 0) + len(events)
+        for event in events:
+            if event['kind'] == 'step':
+                live_steps[job_id] = event
+                continue
+            # The output of the last task is delivered with the job result
+            if finished:
+                continue
+            st.session_state.messages.append({
+                "role": "assistant",
+                "content": f"**Étape terminée ({job['label']}):** {event['title']}\n\n{event['content']}"
+            })
+            added = True
+    return added
+
+
+def get_live_steps():
+    """
+    Get the last agent step of each running CrewAI job of the session.
 
-def provide_feedback(feedback):
+    Returns:
+        dict: The step as a dict with title and content, keyed by job label
+    """
+    live_steps = {}
+    for job_id, event in st.session_state.get("job_live_steps", {}).items():
+        job = get_job(job_id)
+        if job is not None and job['status'] == 'running':
+            live_steps[job['label']] = event
+    return live_steps
+
+
+def provide_feedback(feedback, response=None, updated_content=None):
     """
     Function to be called from the UI when the user provides feedback.
 
     Args:
         feedback: The feedback provided by the user
+        response: The answer shown to the user, if already generated
+        updated_content: The reviewed content revised from the feedback, if any,
+            see data_catalog.llm_processor.process_feedback_message
     """
-    # Put the feedback in the queue
-    feedback_queue.put(feedback)
+    # Send the feedback to the job that asked for it, along with the revised
+    # content unless the feedback left it unchanged
+    pending = st.session_state.get("pending_feedback", [])
+    if pending:
+        request = pending.pop(0)
+        crew_feedback = feedback
+        if updated_content and updated_content.strip() != request['prompt'].strip():
+            crew_feedback = f"{feedback}\n\nRevised version following this feedback:\n{updated_content}"
+        # Nobody waits on the channel of a job that finished meanwhile
+        channel = find_channel(request['job_id'])
+        if channel is not None:
+            channel.provide_feedback(crew_feedback)
 
     # Update workflow stage
     st.session_state.workflow_stage = "processing_feedback"
@@ -77,7 +186,7 @@ def provide_feedback(feedback):
     # Add a response indicating feedback received
     st.session_state.messages.append({
         "role": "assistant",
-        "content": "Merci pour votre feedback. Je continue avec l'analyse."
+        "content": response or "Merci pour votre feedback. Je continue avec l'analyse."
     })
 
 
@@ -90,54 +199,93 @@ def run_crewai_with_feedback(create_crew_func, *args, **kwargs):
         *args, **kwargs: Arguments to pass to the create_crew_func
 
     Returns:
-        The result from the CrewAI crew
+        str: The ID of the background job running the crew
     """
-    # Override the CrewAI human_input function with our Streamlit-compatible version
-    # This is a bit of a hack, but necessary to integrate with Streamlit
-    import crewai.agents.cache
-    original_func = crewai.agents.cache.get_human_input
-    crewai.agents.cache.get_human_input = get_human_input
-
-    # Create crew
-    crew = create_crew_func(*args, **kwargs)
+    install_human_input_hook()
 
-    # Create and start thread
     def run_crew():
-        try:
-            result = crew.kickoff()
-            # Store result in session state
-            st.session_state.crewai_result = result
-        except Exception as e:
-            # Store error in session state
-            st.session_state.crewai_error = str(e)
-        finally:
-            # Restore original function
-            crewai.agents.cache.get_human_input = original_func
-
-    crew_thread = threading.Thread(target=run_crew)
-    crew_thread.daemon = True
-    crew_thread.start()
+        init_agentops()
+        crew = create_crew_func(*args, **kwargs)
+        return run_crew_dag(crew)
 
-    # Store thread in session state
-    st.session_state.crew_thread = crew_thread
-
-    # Return immediately, actual result will be available later in session state
-    return "Processing started. You will be prompted for feedback as needed."
+    # Return immediately, the result is delivered by deliver_job_results
+    job_id = submit_job(run_crew, label=getattr(args[0], "name", None) if args else None)
+    st.session_state.setdefault("catalog_jobs", []).append(job_id)
+    return job_id
 
 
 def check_crewai_status():
     """
-    Check if the CrewAI thread is still running and if there are results.
+    Check if the CrewAI jobs of the session are still running and if there are results.
 
     Returns:
         tuple: (is_running, result, error)
     """
-    if "crew_thread" not in st.session_state:
-        return False, None, None
-
-    thread = st.session_state.crew_thread
-    is_running = thread.is_alive()
-    result = st.session_state.get("crewai_result", None)
-    error = st.session_state.get("crewai_error", None)
+    is_running, result, error = False, None, None
+    for job_id in st.session_state.get("catalog_jobs", []):
+        job = get_job(job_id)
+        if job is None:
+            continue
+        if job['status'] in ('queued', 'running'):
+            is_running = True
+        elif job['status'] == 'completed':
+            result = job['result']
+        elif job['status'] == 'failed':
+            error = job['error']
+
+    # Results already delivered to the chat
+    result = st.session_state.get("crewai_result", result)
+    error = error or st.session_state.get("crewai_error", None)
+
+    return is_running, result, error
+
+
+def deliver_job_results():
+    """
+    Move the results of the finished CrewAI jobs of the session into the chat.
+    Must be called from the Streamlit script thread.
 
-    return is_running, result, error
\ No newline at end of file
+    Returns:
+        bool: True if at least one result was delivered
+    """
+    delivered = False
+    pending = []
+    for job_id in st.session_state.get("catalog_jobs", []):
+        job = get_job(job_id)
+        if job is None:
+            continue
+        if not is_job_finished(job_id):
+            pending.append(job_id)
+            continue
+
+        if job['status'] == 'completed':
+            content = f"Le catalogue de données pour {job['label']} est maintenant complet:\n\n{job['result']}"
+            st.session_state.crewai_result = job['result']
+        elif job['status'] == 'failed':
+            content = f"L'analyse de {job['label']} a échoué: {job['error']}"
+            st.session_state.crewai_error = job['error']
+        else:
+            content = f"L'analyse de {job['label']} a été annulée."
+        st.session_state.messages.append({"role": "assistant", "content": content})
+
+        # Drop the requests the job will never get an answer for
+        st.session_state.pending_feedback = [request for request in st.session_state.get("pending_feedback", [])
+                                             if request['job_id'] != job_id]
+        close_channel(job_id)
+        forget_job(job_id)
+        st.session_state.get("job_progress_seen", {}).pop(job_id, None)
+        st.session_state.get("job_live_steps", {}).pop(job_id, None)
+        delivered = True
+
+    st.session_state.catalog_jobs = pending
+    return delivered
+
+
+def cancel_crewai_jobs():
+    """
+    Cancel all the queued or running CrewAI jobs of the session.
+    """
+    for job_id in st.session_state.get("catalog_jobs", []):
+        cancel_job(job_id)
+        # Wake up the crew if it is waiting for feedback so it can stop
+        close_channel(job_id)
@@ -0,0 +1,152 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from dotenv import load_dotenv
+
+from data_catalog.jobs import bind_current_job, publish_progress
+from data_catalog.prompt_budget import fit_sections, count_tokens, CONTEXT_TOKEN_BUDGET
+from tracing.spans import span, traced
+
+# Load environment variables
+load_dotenv()
+
+# Maximum number of tasks of one crew running at the same time
+MAX_PARALLEL_TASKS = int(os.getenv("DUKE_MAX_PARALLEL_TASKS", "4"))
+
+# Separator between the outputs of the context tasks, same as CrewAI
+CONTEXT_SEPARATOR = "\n\n----------\n\n"
+
+
+class DAGResult:
+    """
+    Result of a crew run by run_crew_dag, with the same raw and tasks_output
+    attributes as a CrewAI CrewOutput.
+    """
+
+    def __init__(self, tasks_output, durations=None):
+        self.tasks_output = tasks_output
+        self.raw = tasks_output[-1].raw if tasks_output else ""
+        # Seconds spent running each task, in the same order
+        self.durations = durations or [None] * len(tasks_output)
+
+    def __str__(self):
+        return self.raw
+
+
+def get_task_dependencies(tasks):
+    """
+    Derive the dependencies of each task from its context.
+
+    Args:
+        tasks: The tasks, in their declaration order
+
+    Returns:
+        list: The indexes of the tasks each task waits for, in task order. Context
+        tasks that are not part of the run are ignored, their output is already known.
+    """
+    positions = {id(task): index for index, task in enumerate(tasks)}
+    dependencies = []
+    for task in tasks:
+        context = task.context if isinstance(task.context, list) else []
+        dependencies.append([positions[id(context_task)] for context_task in context
+                             if id(context_task) in positions])
+    return dependencies
+
+
+def _step_text(step):
+    # Agent steps are actions with a thought and a tool call, or a final answer
+    for attribute in ('output', 'thought', 'text', 'log'):
+        text = getattr(step, attribute, None)
+        if isinstance(text, str) and text.strip():
+            return text.strip()
+    return str(step)
+
+
+def _publishing_step_callback(agent, step_callback):
+    # Publish each agent step to the job before the callback of the crew
+    def callback(step):
+        publish_progress('step', agent.role, _step_text(step))
+        if step_callback:
+            return step_callback(step)
+
+    return callback
+
+
+def _prepare_crew(crew):
+    # Same agent setup as Crew.kickoff, without the manager agent and the
+    # delegation tools, the agents of the catalog crew do not delegate
+    for agent in crew.agents:
+        agent.crew = crew
+        agent.step_callback = _publishing_step_callback(agent, agent.step_callback or crew.step_callback)
+        agent.create_agent_executor()
+    for task in crew.tasks:
+        if not task.callback and crew.task_callback:
+            task.callback = crew.task_callback
+
+
+def _execute_task(task, context_outputs, agent_lock):
+    # The outputs of the context tasks share a token budget, the longest ones are trimmed first
+    fitted, _ = fit_sections({index: output.raw for index, output in enumerate(context_outputs)},
+                             CONTEXT_TOKEN_BUDGET)
+    context = CONTEXT_SEPARATOR.join(fitted[index] for index in range(len(context_outputs)))
+    with agent_lock, span(f"crew_task.{task.agent.role}", context_tokens=count_tokens(context)) as current:
+        started = time.perf_counter()
+        output = task.execute_sync(agent=task.agent, context=context or None, tools=task.tools)
+        duration = time.perf_counter() - started
+        current.set(completion_tokens=count_tokens(output.raw))
+    publish_progress('task', task.agent.role, output.raw)
+    return output, duration
+
+
+@traced("crew")
+def run_crew_dag(crew, max_workers=None):
+    """
+    Run the tasks of a crew as a dependency graph instead of Crew.kickoff.
+    A task starts as soon as every task of its context is done, so independent
+    tasks run concurrently, and there is no manager LLM call between tasks.
+    Tasks sharing an agent never run at the same time. The agent steps and the
+    task outputs are published to the running job as they are produced.
+
+    Args:
+        crew: The crew, its process is ignored
+        max_workers: Maximum number of tasks running at once, defaults to MAX_PARALLEL_TASKS
+
+    Returns:
+        DAGResult: The output and duration of every task in the crew order; raw is the output of the last task
+    """
+    tasks = list(crew.tasks)
+    dependencies = get_task_dependencies(tasks)
+    agent_locks = {id(task.agent): threading.Lock() for task in tasks}
+    _prepare_crew(crew)
+
+    outputs, durations, running = {}, {}, {}
+    pending = list(range(len(tasks)))
+    with ThreadPoolExecutor(max_workers=max_workers or MAX_PARALLEL_TASKS, thread_name_prefix="crew-task") as executor:
+        while pending or running:
+            # Start every task whose dependencies are done
+            ready = [index for index in pending if all(dependency in outputs for dependency in dependencies[index])]
+            for index in ready:
+                pending.remove(index)
+                task = tasks[index]
+                context_outputs = [outputs[dependency] for dependency in dependencies[index]]
+                future = executor.submit(bind_current_job(_execute_task), task, context_outputs,
+                                         agent_locks[id(task.agent)])
+                running[future] = index
+
+            if not running:
+                raise ValueError("The task context graph has a cycle")
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                index = running.pop(future)
+                try:
+                    outputs[index], durations[index] = future.result()
+                except Exception:
+                    # Do not start anything else, the pool waits for the running tasks
+                    for other in running:
+                        other.cancel()
+                    raise
+
+    return DAGResult([outputs[index] for index in range(len(tasks))],
+                     [durations[index] for index in range(len(tasks))])
@@ -0,0 +1,118 @@
+import os
+import queue
+import threading
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Seconds a crew waits for human feedback before continuing with DEFAULT_FEEDBACK
+FEEDBACK_TIMEOUT = float(os.getenv("DUKE_FEEDBACK_TIMEOUT", "1800"))
+
+# Feedback used when the user does not answer in time
+DEFAULT_FEEDBACK = "ok"
+
+_channels = {}
+_channels_lock = threading.Lock()
+
+
+class FeedbackChannel:
+    """
+    Two-way feedback channel between one crew job and the session that owns it.
+    The crew thread blocks on its own response queue, so it is woken up as soon
+    as the user answers and never sees the answers meant for another job.
+    """
+
+    def __init__(self, channel_id):
+        self.channel_id = channel_id
+        self.requests = queue.Queue()
+        self.responses = queue.Queue()
+        self.waiting = threading.Event()
+
+    def request_feedback(self, prompt, timeout=None):
+        """
+        Ask the user for feedback and wait for the answer. Called from the crew thread.
+
+        Args:
+            prompt: The feedback request shown to the user
+            timeout: Seconds to wait for the answer, defaults to FEEDBACK_TIMEOUT
+
+        Returns:
+            str: The feedback of the user, or DEFAULT_FEEDBACK on timeout
+        """
+        self.requests.put(prompt)
+        self.waiting.set()
+        try:
+            return self.responses.get(timeout=FEEDBACK_TIMEOUT if timeout is None else timeout)
+        except queue.Empty:
+            return DEFAULT_FEEDBACK
+        finally:
+            self.waiting.clear()
+
+    def pending_requests(self):
+        """
+        Take the feedback requests not yet shown to the user. Called from the UI thread.
+
+        Returns:
+            list: The feedback prompts, oldest first
+        """
+        prompts = []
+        while True:
+            try:
+                prompts.append(self.requests.get_nowait())
+            except queue.Empty:
+                return prompts
+
+    def provide_feedback(self, feedback):
+        """
+        Send the user's answer to the waiting crew. Called from the UI thread.
+
+        Args:
+            feedback: The feedback of the user
+        """
+        self.responses.put(feedback)
+
+
+def get_channel(channel_id):
+    """
+    Get the feedback channel of a job, creating it if needed.
+
+    Args:
+        channel_id: The job ID
+
+    Returns:
+        FeedbackChannel: The feedback channel
+    """
+    with _channels_lock:
+        channel = _channels.get(channel_id)
+        if channel is None:
+            channel = FeedbackChannel(channel_id)
+            _channels[channel_id] = channel
+        return channel
+
+
+def find_channel(channel_id):
+    """
+    Get the feedback channel of a job without creating it.
+
+    Args:
+        channel_id: The job ID
+
+    Returns:
+        FeedbackChannel: The feedback channel, or None if it was never opened or is closed
+    """
+    with _channels_lock:
+        return _channels.get(channel_id)
+
+
+def close_channel(channel_id):
+    """
+    Close the feedback channel of a job, waking up the crew if it is still waiting.
+
+    Args:
+        channel_id: The job ID
+    """
+    with _channels_lock:
+        channel = _channels.pop(channel_id, None)
+    if channel is not None and channel.waiting.is_set():
+        channel.provide_feedback(DEFAULT_FEEDBACK)
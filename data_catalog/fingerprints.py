@@ -0,0 +1,203 @@
+import hashlib
+import json
+import os
+from datetime import datetime
+
+from file_loader.utils import get_cache_dir
+
+# Keys of the catalog crew tasks, in execution order
+CATALOG_TASKS = ['analysis', 'schema', 'metadata', 'quality', 'glossary', 'documentation']
+
+# Tasks to re-run when the columns of the file changed; the file analysis is
+# redone from the new sample and profile, and the schema task is told which
+# columns changed. The metadata and glossary of the previous catalog are kept
+SCHEMA_CHANGE_TASKS = {'analysis', 'schema', 'quality', 'documentation'}
+
+# Share of changed columns above which the file is cataloged from scratch,
+# as another file uploaded under the same name
+MAX_SCHEMA_CHANGE_RATIO = 0.5
+
+# Tasks to re-run when only the rows of the file changed
+CONTENT_CHANGE_TASKS = {'quality', 'documentation'}
+
+
+def get_schema_signature(profiles):
+    """
+    Extract the columns and their types from the profiles of a file.
+
+    Args:
+        profiles: The profiles keyed by table name, see file_loader.dataset.get_file_profiles
+
+    Returns:
+        dict: The [column, dtype] pairs of each table
+    """
+    return {table_name: [[column['name'], column['dtype']] for column in profile['columns']]
+            for table_name, profile in profiles.items()}
+
+
+def get_schema_key(profiles):
+    """
+    Get a short hash of the columns and types of a file.
+
+    Args:
+        profiles: The profiles keyed by table name, see file_loader.dataset.get_file_profiles
+
+    Returns:
+        str: The schema key
+    """
+    signature = json.dumps(get_schema_signature(profiles), sort_keys=True)
+    return hashlib.md5(signature.encode()).hexdigest()[:12]
+
+
+def get_schema_change_ratio(previous, current):
+    """
+    Measure how much of a schema changed.
+
+    Args:
+        previous: The previous schema signature, see get_schema_signature
+        current: The current schema signature
+
+    Returns:
+        float: The share of the columns of both schemas that were added, removed
+        or changed type, from 0 (same schema) to 1 (no column in common)
+    """
+    old_columns = {(table_name, name): dtype for table_name, columns in previous.items() for name, dtype in columns}
+    new_columns = {(table_name, name): dtype for table_name, columns in current.items() for name, dtype in columns}
+    all_columns = set(old_columns) | set(new_columns)
+    if not all_columns:
+        return 0.0
+    changed = [column for column in all_columns if old_columns.get(column) != new_columns.get(column)]
+    return len(changed) / len(all_columns)
+
+
+def diff_schemas(previous, current):
+    """
+    Compare two schema signatures.
+
+    Args:
+        previous: The previous schema signature, see get_schema_signature
+        current: The current schema signature
+
+    Returns:
+        list: Readable descriptions of the changes, empty if the schemas match
+    """
+    changes = []
+    for table_name in previous:
+        if table_name not in current:
+            changes.append(f"Table removed: {table_name}")
+    for table_name, columns in current.items():
+        if table_name not in previous:
+            changes.append(f"Table added: {table_name}")
+            continue
+        old_types, new_types = dict(map(tuple, previous[table_name])), dict(map(tuple, columns))
+        for name, dtype in new_types.items():
+            if name not in old_types:
+                changes.append(f"Column added: {table_name}.{name} ({dtype})")
+            elif old_types[name] != dtype:
+                changes.append(f"Column type changed: {table_name}.{name} ({old_types[name]} -> {dtype})")
+        for name in old_types:
+            if name not in new_types:
+                changes.append(f"Column removed: {table_name}.{name}")
+    return changes
+
+
+def _snapshot_path(file_name, schema_key):
+    # Keyed by file name and schema, so two files uploaded under the same name
+    # only share a snapshot when they have the same columns
+    file_key = hashlib.md5(file_name.encode()).hexdigest()
+    return os.path.join(get_cache_dir("snapshots"), f"{file_key}-{schema_key}.json")
+
+
+def _read_snapshot(path, file_name):
+    try:
+        with open(path, 'r') as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        print(f"Error loading catalog snapshot for {file_name}: {e}")
+        return None
+
+
+def load_snapshot(file_name, profiles):
+    """
+    Load the snapshot of the last catalog of a file.
+    The snapshot of the same file name and schema is preferred; otherwise the
+    latest snapshot of the file name is returned, and plan_recatalog decides
+    whether it describes the same file.
+
+    Args:
+        file_name: The name of the file
+        profiles: The profiles of the uploaded file keyed by table name
+
+    Returns:
+        dict: The snapshot, or None if the file was never cataloged
+    """
+    snapshot = _read_snapshot(_snapshot_path(file_name, get_schema_key(profiles)), file_name)
+    if snapshot is not None:
+        return snapshot
+
+    # Latest catalog of a file with the same name and other columns
+    file_key = hashlib.md5(file_name.encode()).hexdigest()
+    directory = get_cache_dir("snapshots")
+    paths = [os.path.join(directory, name) for name in os.listdir(directory)
+             if name.startswith(f"{file_key}-") and name.endswith(".json")]
+    if not paths:
+        return None
+    return _read_snapshot(max(paths, key=os.path.getmtime), file_name)
+
+
+def save_snapshot(file_name, content_hash, profiles, task_outputs, catalog_entry):
+    """
+    Save the snapshot of the catalog of a file.
+
+    Args:
+        file_name: The name of the file
+        content_hash: The content hash of the file
+        profiles: The profiles keyed by table name
+        task_outputs: The raw output of each crew task keyed by task key
+        catalog_entry: The saved catalog entry
+    """
+    snapshot = {
+        'file_name': file_name,
+        'content_hash': content_hash,
+        'schema': get_schema_signature(profiles),
+        'task_outputs': task_outputs,
+        'catalog_entry': catalog_entry,
+        'updated_at': datetime.now().isoformat()
+    }
+    try:
+        with open(_snapshot_path(file_name, get_schema_key(profiles)), 'w') as file:
+            json.dump(snapshot, file, indent=2)
+    except Exception as e:
+        print(f"Error saving catalog snapshot for {file_name}: {e}")
+
+
+def plan_recatalog(snapshot, content_hash, profiles):
+    """
+    Decide which crew tasks must run for a file given its previous snapshot.
+
+    Args:
+        snapshot: The previous snapshot of the file, or None
+        content_hash: The content hash of the uploaded file
+        profiles: The profiles keyed by table name
+
+    Returns:
+        tuple: (tasks to run, list of schema changes). The set of tasks is empty
+        when the file is unchanged, and contains every task with no schema
+        change for a new file, including one replacing most columns of the snapshot.
+    """
+    if snapshot is None or set(snapshot.get('task_outputs', {})) != set(CATALOG_TASKS):
+        return set(CATALOG_TASKS), []
+    if snapshot['content_hash'] == content_hash:
+        return set(), []
+
+    # Compared as stored in the snapshot, where the None table name of single
+    # table files became 'null'
+    schema = json.loads(json.dumps(get_schema_signature(profiles)))
+    if get_schema_change_ratio(snapshot['schema'], schema) > MAX_SCHEMA_CHANGE_RATIO:
+        return set(CATALOG_TASKS), []
+    changes = diff_schemas(snapshot['schema'], schema)
+    if changes:
+        return set(SCHEMA_CHANGE_TASKS), changes
+    return set(CONTENT_CHANGE_TASKS), []
@@ -0,0 +1,236 @@
+import contextvars
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+
+from data_catalog.batch import run_with_crew_slot
+from tracing.spans import span, set_trace, reset_trace
+
+# Load environment variables
+load_dotenv()
+
+# Maximum number of queued or running jobs handled by the worker threads; how
+# many crews actually run at once is capped by DUKE_MAX_CONCURRENT_CREWS
+MAX_JOB_WORKERS = int(os.getenv("DUKE_MAX_JOB_WORKERS", "16"))
+
+_jobs = {}
+_jobs_lock = threading.Lock()
+_executor = None
+_current = threading.local()
+
+
+class JobCancelled(Exception):
+    """
+    Raised inside a job when it has been cancelled.
+    """
+
+
+def _get_executor():
+    global _executor
+    with _jobs_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=MAX_JOB_WORKERS, thread_name_prefix="catalog-job")
+        return _executor
+
+
+def submit_job(func, *args, label=None, **kwargs):
+    """
+    Run a function in the background job pool.
+
+    Args:
+        func: The function to run
+        *args, **kwargs: Arguments to pass to func
+        label: A readable name of the job, shown in the UI
+
+    Returns:
+        str: The job ID
+    """
+    job_id = uuid.uuid4().hex[:12]
+    job = {
+        'id': job_id,
+        'label': label or job_id,
+        'status': 'queued',
+        'result': None,
+        'error': None,
+        'submitted_at': time.time(),
+        'finished_at': None,
+        'cancel_event': threading.Event(),
+        'future': None,
+        # Intermediate outputs published while the job runs, see publish_progress
+        'progress': [],
+    }
+    with _jobs_lock:
+        _jobs[job_id] = job
+
+    job['future'] = _get_executor().submit(_run_job, job, func, args, kwargs)
+    return job_id
+
+
+def _run_job(job, func, args, kwargs):
+    _current.job = job
+    # Every span of the job is part of its trace, see tracing.spans
+    trace_token = set_trace(job['id'], label=job['label'])
+    try:
+        check_cancelled()
+        job['status'] = 'running'
+        with span("job", label=job['label']):
+            job['result'] = run_with_crew_slot(func, *args, **kwargs)
+        job['status'] = 'completed'
+    except JobCancelled:
+        job['status'] = 'cancelled'
+    except Exception as e:
+        job['error'] = str(e)
+        job['status'] = 'failed'
+    finally:
+        job['finished_at'] = time.time()
+        _current.job = None
+        reset_trace(trace_token)
+
+
+def get_job(job_id):
+    """
+    Get a snapshot of the state of a job.
+
+    Args:
+        job_id: The job ID
+
+    Returns:
+        dict: The id, label, status, result, error, submitted_at and finished_at
+        of the job, or None if the job is unknown
+    """
+    with _jobs_lock:
+        job = _jobs.get(job_id)
+    if job is None:
+        return None
+    return {key: value for key, value in job.items() if key not in ('cancel_event', 'future', 'progress')}
+
+
+def publish_progress(kind, title, content):
+    """
+    Publish an intermediate output of the job running in the current thread,
+    so the UI can show it before the job is done. Does nothing outside of a job.
+
+    Args:
+        kind: 'step' for an agent step, 'task' for a finished task
+        title: A readable name of the agent or task
+        content: The text of the output
+    """
+    job = getattr(_current, 'job', None)
+    if job is not None:
+        # Appending to a list is atomic, readers only take slices of it
+        job['progress'].append({'kind': kind, 'title': title, 'content': content, 'time': time.time()})
+
+
+def get_job_progress(job_id, since=0):
+    """
+    Get the intermediate outputs published by a job.
+
+    Args:
+        job_id: The job ID
+        since: The number of outputs already read
+
+    Returns:
+        list: The outputs published after the first since ones, oldest first,
+        as dicts with kind, title, content and time
+    """
+    with _jobs_lock:
+        job = _jobs.get(job_id)
+    if job is None:
+        return []
+    return job['progress'][since:]
+
+
+def is_job_finished(job_id):
+    """
+    Check if a job is done, whatever its outcome.
+
+    Args:
+        job_id: The job ID
+
+    Returns:
+        bool: True if the job completed, failed, was cancelled or is unknown
+    """
+    job = get_job(job_id)
+    return job is None or job['status'] in ('completed', 'failed', 'cancelled')
+
+
+def cancel_job(job_id):
+    """
+    Request the cancellation of a job.
+    Queued jobs never start; running jobs stop at their next call to check_cancelled.
+
+    Args:
+        job_id: The job ID
+    """
+    with _jobs_lock:
+        job = _jobs.get(job_id)
+    if job is None:
+        return
+    job['cancel_event'].set()
+    if job['future'] is not None and job['future'].cancel():
+        job['status'] = 'cancelled'
+        job['finished_at'] = time.time()
+
+
+def forget_job(job_id):
+    """
+    Remove a finished job from the registry once its result has been delivered.
+
+    Args:
+        job_id: The job ID
+    """
+    with _jobs_lock:
+        _jobs.pop(job_id, None)
+
+
+def current_job_id():
+    """
+    Get the ID of the job running in the current thread.
+
+    Returns:
+        str: The job ID, or None outside of a job
+    """
+    job = getattr(_current, 'job', None)
+    return job['id'] if job is not None else None
+
+
+def bind_current_job(func):
+    """
+    Wrap a function so that it runs as part of the job of the calling thread.
+    Used to hand work to another thread while keeping the cancellation and
+    the feedback channel of the job, and the current trace span.
+
+    Args:
+        func: The function to wrap
+
+    Returns:
+        callable: The wrapped function
+    """
+    job = getattr(_current, 'job', None)
+    context = contextvars.copy_context()
+
+    def run_in_job(*args, **kwargs):
+        previous = getattr(_current, 'job', None)
+        _current.job = job
+        try:
+            check_cancelled()
+            # A copy per call, a context cannot be entered by two threads at once
+            return context.copy().run(func, *args, **kwargs)
+        finally:
+            _current.job = previous
+
+    return run_in_job
+
+
+def check_cancelled(*args, **kwargs):
+    """
+    Raise JobCancelled if the job running in the current thread was cancelled.
+    Accepts and ignores any argument so it can be used directly as a CrewAI
+    step or task callback.
+    """
+    job = getattr(_current, 'job', None)
+    if job is not None and job['cancel_event'].is_set():
+        raise JobCancelled(f"Job {job['id']} was cancelled")
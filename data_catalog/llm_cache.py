@@ -0,0 +1,200 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dotenv import load_dotenv
+
+from file_loader.utils import get_cache_dir
+
+# Load environment variables
+load_dotenv()
+
+# Set DUKE_LLM_CACHE=0 to always call the LLM
+LLM_CACHE_ENABLED = os.getenv("DUKE_LLM_CACHE", "1") != "0"
+
+# Seconds before a cached response expires, 30 days by default
+LLM_CACHE_TTL = float(os.getenv("DUKE_LLM_CACHE_TTL", str(30 * 24 * 3600)))
+
+# Maximum size, in megabytes, of the cached responses on disk
+LLM_CACHE_MAX_MB = float(os.getenv("DUKE_LLM_CACHE_MAX_MB", "256"))
+
+# Number of responses kept in memory in front of the disk store
+LLM_CACHE_MEMORY_ENTRIES = int(os.getenv("DUKE_LLM_CACHE_MEMORY_ENTRIES", "256"))
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def make_cache_key(model, messages, **params):
+    """
+    Build the cache key of an LLM request.
+
+    Args:
+        model: The model name
+        messages: The prompt, as a string or a list of chat messages
+        **params: The generation parameters (temperature, max_tokens, ...)
+
+    Returns:
+        str: The hexadecimal SHA-256 of the canonical request
+    """
+    request = json.dumps({'model': model, 'messages': messages, 'params': params},
+                         sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(request.encode('utf-8')).hexdigest()
+
+
+class LLMCache:
+    """
+    Two-level cache of LLM responses: an in-memory LRU in front of a SQLite store.
+    Entries expire after a TTL and the least recently used ones are evicted
+    once the store exceeds its maximum size.
+    """
+
+    def __init__(self, path, ttl=LLM_CACHE_TTL, max_bytes=LLM_CACHE_MAX_MB * 1024 * 1024,
+                 memory_entries=LLM_CACHE_MEMORY_ENTRIES):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.memory_entries = memory_entries
+        self.memory = OrderedDict()
+        self.stats = {'hits': 0, 'memory_hits': 0, 'disk_hits': 0, 'misses': 0, 'evictions': 0}
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, "
+            "expires_at REAL NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._connection.execute("CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access)")
+        self._connection.commit()
+
+    def get(self, key):
+        """
+        Get a cached response.
+
+        Args:
+            key: The cache key, see make_cache_key
+
+        Returns:
+            str: The cached response, or None on a miss
+        """
+        now = time.time()
+        with self._lock:
+            entry = self.memory.get(key)
+            if entry is not None and entry[1] > now:
+                self.memory.move_to_end(key)
+                self.stats['hits'] += 1
+                self.stats['memory_hits'] += 1
+                return entry[0]
+
+            row = self._connection.execute(
+                "SELECT value, expires_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or row[1] <= now:
+                if row is not None:
+                    self._connection.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    self._connection.commit()
+                self.memory.pop(key, None)
+                self.stats['misses'] += 1
+                return None
+
+            self._connection.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+            self._connection.commit()
+            self._remember(key, row[0], row[1])
+            self.stats['hits'] += 1
+            self.stats['disk_hits'] += 1
+            return row[0]
+
+    def set(self, key, value):
+        """
+        Store a response.
+
+        Args:
+            key: The cache key, see make_cache_key
+            value: The response text
+        """
+        now = time.time()
+        expires_at = now + self.ttl
+        size = len(value.encode('utf-8'))
+        with self._lock:
+            self._remember(key, value, expires_at)
+            self._connection.execute(
+                "INSERT OR REPLACE INTO responses (key, value, size, expires_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?)", (key, value, size, expires_at, now)
+            )
+            self._evict(now)
+            self._connection.commit()
+
+    def _remember(self, key, value, expires_at):
+        self.memory[key] = (value, expires_at)
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.memory_entries:
+            self.memory.popitem(last=False)
+
+    def _evict(self, now):
+        # Expired entries first, then the least recently used until under the size limit
+        self._connection.execute("DELETE FROM responses WHERE expires_at <= ?", (now,))
+        total = self._connection.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        rows = self._connection.execute("SELECT key, size FROM responses ORDER BY last_access").fetchall()
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            self._connection.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self.memory.pop(key, None)
+            self.stats['evictions'] += 1
+            total -= size
+
+    def get_stats(self):
+        """
+        Get the hit and miss counters of the cache.
+
+        Returns:
+            dict: The counters and the number of entries on disk
+        """
+        with self._lock:
+            stats = dict(self.stats)
+            stats['entries'] = self._connection.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        return stats
+
+
+def get_llm_cache():
+    """
+    Get the LLM cache of the process.
+
+    Returns:
+        LLMCache: The cache, stored in the llm directory of the local cache
+    """
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = LLMCache(os.path.join(get_cache_dir("llm"), "responses.sqlite"))
+        return _cache
+
+
+def cached_completion(request_func, model, messages, **params):
+    """
+    Return the cached response of an LLM request, calling the LLM on a miss.
+
+    Args:
+        request_func: Function calling the LLM and returning the response text
+        model: The model name
+        messages: The prompt, as a string or a list of chat messages
+        **params: The generation parameters, passed to request_func
+
+    Returns:
+        str: The response text
+    """
+    if not LLM_CACHE_ENABLED:
+        return request_func(model=model, messages=messages, **params)
+
+    cache = get_llm_cache()
+    key = make_cache_key(model, messages, **params)
+    response = cache.get(key)
+    if response is None:
+        response = request_func(model=model, messages=messages, **params)
+        cache.set(key, response)
+    return response
@@ -1,11 +1,19 @@
 import os
+import asyncio
 from dotenv import load_dotenv
 import streamlit as st
 import openai
+from data_catalog.async_llm import get_llm_client, run_async, submit_async, iter_async
 
 # Load environment variables
 load_dotenv()
 
+# Short answers meaning the user accepts the content as it is
+AFFIRMATIVE_RESPONSES = ["oui", "valide", "d'accord", "ok", "rien", "parfait", "bien", "correct"]
+
+# Response used when the LLM cannot answer
+FALLBACK_FEEDBACK_RESPONSE = "Merci pour votre retour. Je vais procéder aux ajustements nécessaires."
+
 
 def initialize_llm():
     """
@@ -34,14 +42,17 @@ def process_user_feedback(current_content, user_feedback, stage):
     Returns:
         str: The updated content based on user feedback
     """
-    # If user feedback is minimal or affirmative, just return the current content
-    affirmative_responses = ["oui", "valide", "d'accord", "ok", "rien", "parfait", "bien", "correct"]
-    if any(response in user_feedback.lower() for response in affirmative_responses) and len(user_feedback) < 20:
+    try:
+        return run_async(process_user_feedback_async(current_content, user_feedback, stage))
+    except Exception as e:
+        st.error(f"Error processing feedback with LLM: {str(e)}")
+        # Return original content if there's an error
         return current_content
 
-    try:
-        # Prepare the prompt for the LLM
-        prompt = f"""
+
+def _feedback_request(current_content, user_feedback, stage):
+    # Chat request updating the content from the feedback
+    prompt = f"""
         Je suis en train de créer un catalogue de données et j'ai besoin d'intégrer les retours d'un utilisateur.
 
         Voici le contenu actuel pour l'étape "{stage}":
@@ -56,27 +67,72 @@ def process_user_feedback(current_content, user_feedback, stage):
 
         Retournez le contenu modifié complet, au même format que le contenu original.
         """
+    return {
+        'model': "gpt-4o-mini",
+        'messages': [
+            {"role": "system",
+             "content": "Vous êtes un assistant spécialisé dans la création de catalogues de données précis."},
+            {"role": "user", "content": prompt}
+        ],
+        'temperature': 0.5,
+        'max_tokens': 2500
+    }
 
-        # Make the API call
-        response = openai.ChatCompletion.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system",
-                 "content": "Vous êtes un assistant spécialisé dans la création de catalogues de données précis."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.5,
-            max_tokens=2500
-        )
 
-        # Extract and return the modified content
-        updated_content = response.choices[0].message.content.strip()
-        return updated_content
+def _is_affirmative(user_feedback):
+    # Minimal or affirmative feedback leaves the content unchanged
+    return any(response in user_feedback.lower() for response in AFFIRMATIVE_RESPONSES) and len(user_feedback) < 20
+
+
+async def process_user_feedback_async(current_content, user_feedback, stage):
+    """
+    Process user feedback using LLM to modify catalog content, see process_user_feedback.
+
+    Args:
+        current_content: The current content being reviewed
+        user_feedback: The user's feedback or correction
+        stage: The current workflow stage
+
+    Returns:
+        str: The updated content based on user feedback
+    """
+    # If user feedback is minimal or affirmative, just return the current content
+    if _is_affirmative(user_feedback):
+        return current_content
+
+    # Make the API call, identical requests are served from the cache
+    return await get_llm_client().cached_chat(**_feedback_request(current_content, user_feedback, stage))
+
+
+def stream_user_feedback(current_content, user_feedback, stage):
+    """
+    Process user feedback using LLM to modify catalog content, yielding the
+    updated content as it is generated, for st.write_stream.
+    Must be consumed from the Streamlit script thread.
+
+    Args:
+        current_content: The current content being reviewed
+        user_feedback: The user's feedback or correction
+        stage: The current workflow stage
+
+    Returns:
+        iterator: The fragments of the updated content
+    """
+    if _is_affirmative(user_feedback):
+        yield current_content
+        return
 
+    started = False
+    try:
+        request = _feedback_request(current_content, user_feedback, stage)
+        for fragment in iter_async(get_llm_client().cached_stream_chat(**request)):
+            started = True
+            yield fragment
     except Exception as e:
         st.error(f"Error processing feedback with LLM: {str(e)}")
-        # Return original content if there's an error
-        return current_content
+        # Return original content if nothing was received
+        if not started:
+            yield current_content
 
 
 def generate_response_to_user_feedback(user_feedback, stage):
@@ -91,34 +147,114 @@ def generate_response_to_user_feedback(user_feedback, stage):
         str: A natural language response to the user
     """
     try:
-        # Prepare the prompt for the LLM
-        prompt = f"""
-        Je suis un assistant de catalogage de données. Un utilisateur m'a donné ce retour concernant l'étape "{stage}":
+        return run_async(generate_response_to_user_feedback_async(user_feedback, stage))
+    except Exception:
+        # Fallback response if there's an error
+        return FALLBACK_FEEDBACK_RESPONSE
+
+
+def _response_request(user_feedback, stage):
+    # Chat request answering the user
+    prompt = f"""
+    Je suis un assistant de catalogage de données. Un utilisateur m'a donné ce retour concernant l'étape "{stage}":
+
+    "{user_feedback}"
+
+    Générez une réponse naturelle et sympathique à ce retour. Si le retour est positif ou affirmatif, 
+    confirmez que nous passons à l'étape suivante. Si le retour contient des demandes de modification,
+    confirmez que vous avez bien compris et allez intégrer ces modifications.
+
+    Gardez la réponse courte et directe (maximum 2 phrases).
+    """
+    return {
+        'model': "gpt-4o-mini",
+        'messages': [
+            {"role": "system",
+             "content": "Vous êtes un assistant sympathique et professionnel spécialisé dans le catalogage de données."},
+            {"role": "user", "content": prompt}
+        ],
+        'temperature': 0.7,
+        'max_tokens': 150
+    }
+
+
+async def generate_response_to_user_feedback_async(user_feedback, stage):
+    """
+    Generate a response to the user's feedback using LLM, see generate_response_to_user_feedback.
+
+    Args:
+        user_feedback: The user's feedback
+        stage: The current workflow stage
+
+    Returns:
+        str: A natural language response to the user
+    """
+    # Make the API call, identical requests are served from the cache
+    return await get_llm_client().cached_chat(**_response_request(user_feedback, stage))
+
+
+def stream_response_to_user_feedback(user_feedback, stage):
+    """
+    Generate a response to the user's feedback using LLM, yielding it as it
+    is generated, for st.write_stream.
+
+    Args:
+        user_feedback: The user's feedback
+        stage: The current workflow stage
+
+    Returns:
+        iterator: The fragments of the response
+    """
+    started = False
+    try:
+        for fragment in iter_async(get_llm_client().cached_stream_chat(**_response_request(user_feedback, stage))):
+            started = True
+            yield fragment
+    except Exception:
+        # Fallback response if nothing was received
+        if not started:
+            yield FALLBACK_FEEDBACK_RESPONSE
 
-        "{user_feedback}"
 
-        Générez une réponse naturelle et sympathique à ce retour. Si le retour est positif ou affirmatif, 
-        confirmez que nous passons à l'étape suivante. Si le retour contient des demandes de modification,
-        confirmez que vous avez bien compris et allez intégrer ces modifications.
+def process_feedback_message(current_content, user_feedback, stage, write_stream=None):
+    """
+    Update the content from the user's feedback and answer the user.
+    Both LLM calls are independent and run concurrently.
+
+    Args:
+        current_content: The current content being reviewed
+        user_feedback: The user's feedback or correction
+        stage: The current workflow stage
+        write_stream: A function showing the response as it is generated, such
+            as st.write_stream; must be called from the Streamlit script thread
 
-        Gardez la réponse courte et directe (maximum 2 phrases).
-        """
+    Returns:
+        tuple: (the updated content, the response to the user)
+    """
+    if write_stream is not None:
+        # The content is updated on the loop while the response is streamed
+        update = submit_async(process_user_feedback_async(current_content, user_feedback, stage))
+        response = write_stream(stream_response_to_user_feedback(user_feedback, stage))
+        try:
+            updated_content = update.result()
+        except Exception as e:
+            st.error(f"Error processing feedback with LLM: {str(e)}")
+            updated_content = current_content
+        return updated_content, response
 
-        # Make the API call
-        response = openai.ChatCompletion.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system",
-                 "content": "Vous êtes un assistant sympathique et professionnel spécialisé dans le catalogage de données."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.7,
-            max_tokens=150
+    async def gather():
+        return await asyncio.gather(
+            process_user_feedback_async(current_content, user_feedback, stage),
+            generate_response_to_user_feedback_async(user_feedback, stage),
+            return_exceptions=True
         )
 
-        # Extract and return the response
-        return response.choices[0].message.content.strip()
+    updated_content, response = run_async(gather())
 
-    except Exception as e:
-        # Fallback response if there's an error
-        return "Merci pour votre retour. Je vais procéder aux ajustements nécessaires."
\ No newline at end of file
+    # Errors are reported here, Streamlit calls only work from the script thread
+    if isinstance(updated_content, Exception):
+        st.error(f"Error processing feedback with LLM: {str(updated_content)}")
+        updated_content = current_content
+    if isinstance(response, Exception):
+        response = FALLBACK_FEEDBACK_RESPONSE
+    return updated_content, response
@@ -0,0 +1,352 @@
+import asyncio
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+from dotenv import load_dotenv
+
+from data_catalog.prompt_budget import count_tokens, CHARS_PER_TOKEN
+
+# Load environment variables
+load_dotenv()
+
+# Set DUKE_LLM_PROVIDER=mock to answer every LLM request locally, without network
+LLM_PROVIDER = os.getenv("DUKE_LLM_PROVIDER", "openai")
+
+# Distribution of the delay before the first token, see parse_latency
+MOCK_LATENCY = os.getenv("DUKE_MOCK_LATENCY", "lognormal:0.6,0.5")
+
+# Generation speed once the first token is out
+MOCK_TOKENS_PER_SECOND = float(os.getenv("DUKE_MOCK_TOKENS_PER_SECOND", "80"))
+
+# Share of the requests answered with a rate limit or server error
+MOCK_ERROR_RATE = float(os.getenv("DUKE_MOCK_ERROR_RATE", "0.02"))
+
+# Seed of the latencies, errors and outputs, the same request always gets the same answer
+MOCK_SEED = int(os.getenv("DUKE_MOCK_SEED", "0"))
+
+# Base URL of the mock, requests never leave the process
+MOCK_BASE_URL = "http://mock-llm.local/v1"
+
+# Lines of the column profiles (see file_processor.profiler.format_profile) and of the schema tables
+_PROFILE_COLUMN = re.compile(r"^\s*- (.+?) \(([^)]+)\) \| non-null (\d+)/(\d+)(?:.*?\| type (\w+))?", re.MULTILINE)
+_TABLE_COLUMN = re.compile(r"^\|\s*`?([^|`]+?)`?\s*\|\s*(\w+)\s*\|", re.MULTILINE)
+
+_mock = None
+_mock_lock = threading.Lock()
+
+
+def parse_latency(spec):
+    """
+    Parse a latency distribution.
+
+    Args:
+        spec: 'fixed:seconds', 'uniform:low,high', 'normal:mean,std',
+            'lognormal:median,sigma' or 'exponential:mean'
+
+    Returns:
+        callable: A function drawing a latency in seconds from a random.Random
+    """
+    name, _, values = spec.partition(":")
+    params = [float(value) for value in values.split(",") if value.strip()]
+    if name == 'fixed':
+        return lambda rng: params[0]
+    if name == 'uniform':
+        return lambda rng: rng.uniform(params[0], params[1])
+    if name == 'normal':
+        return lambda rng: max(rng.gauss(params[0], params[1]), 0.0)
+    if name == 'lognormal':
+        return lambda rng: params[0] * rng.lognormvariate(0.0, params[1])
+    if name == 'exponential':
+        return lambda rng: rng.expovariate(1.0 / params[0])
+    raise ValueError(f"Unknown latency distribution: {spec}")
+
+
+def _message_text(messages):
+    if isinstance(messages, str):
+        return messages
+    return "\n".join(str(message.get('content', '')) for message in messages)
+
+
+def _extract_columns(text):
+    # Columns of the file, from a column profile or from a schema table in the prompt
+    columns = {}
+    for name, dtype, non_null, rows, inferred in _PROFILE_COLUMN.findall(text):
+        columns.setdefault(name, {'name': name, 'type': inferred or dtype,
+                                  'nullable': non_null != rows})
+    if not columns:
+        for name, dtype in _TABLE_COLUMN.findall(text):
+            if name.lower() not in ('column', 'field') and not set(name) <= set('-: '):
+                columns.setdefault(name, {'name': name, 'type': dtype, 'nullable': True})
+    if not columns:
+        columns = {f"field_{index}": {'name': f"field_{index}", 'type': 'text', 'nullable': True}
+                   for index in range(1, 6)}
+    return list(columns.values())
+
+
+def _analysis_output(columns, rng, text):
+    lines = ["## File analysis", "",
+             f"The file is a table of {len(columns)} columns describing business records.", "",
+             "### Structure"]
+    lines += [f"- **{column['name']}**: {column['type']} values" for column in columns]
+    lines += ["", "### Notable features",
+              f"- {rng.randint(0, len(columns))} columns contain missing values",
+              "- Identifiers look unique and values follow consistent patterns", "",
+              "### Purpose", "The data appears to be an operational extract used for reporting."]
+    return "\n".join(lines)
+
+
+def _schema_output(columns, rng, text):
+    lines = ["## Schema", "", "| Column | Type | Nullable | Description |", "| --- | --- | --- | --- |"]
+    lines += [f"| {column['name']} | {column['type']} | {'yes' if column['nullable'] else 'no'} | "
+              f"The {column['name'].replace('_', ' ')} of the record |" for column in columns]
+    lines += ["", f"Primary key: {columns[0]['name']}",
+              "Constraints: identifiers are unique, numeric amounts are non-negative."]
+    return "\n".join(lines)
+
+
+def _metadata_output(columns, rng, text):
+    domain = rng.choice(['Finance', 'Sales', 'HR', 'Marketing', 'Operations'])
+    tags = ", ".join(column['name'].replace('_', ' ') for column in columns[:6])
+    return "\n".join([
+        "## Metadata", "",
+        f"- **Title**: {domain} records",
+        f"- **Description**: Records of the {domain.lower()} activity with {len(columns)} attributes.",
+        f"- **Tags**: {domain.lower()}, {tags}",
+        f"- **Domain**: {domain}",
+        f"- **Update frequency**: {rng.choice(['Daily', 'Weekly', 'Monthly'])}",
+        f"- **Sensitivity**: {rng.choice(['Public', 'Internal', 'Confidential'])}",
+    ])
+
+
+def _quality_output(columns, rng, text):
+    lines = ["## Data quality assessment", "", f"Overall quality score: {rng.randint(60, 98)}/100", "",
+             "| Column | Completeness | Issues |", "| --- | --- | --- |"]
+    lines += [f"| {column['name']} | {rng.randint(85, 100)}% | "
+              f"{rng.choice(['none', 'missing values', 'outliers', 'inconsistent formats'])} |"
+              for column in columns]
+    lines += ["", "### Recommendations", "- Enforce the expected formats at the source",
+              "- Fill or flag the missing values of the mandatory columns"]
+    return "\n".join(lines)
+
+
+def _glossary_output(columns, rng, text):
+    lines = ["## Business glossary", ""]
+    lines += [f"- **{column['name'].replace('_', ' ').title()}**: Business meaning of the "
+              f"{column['name']} attribute, expressed as {column['type']} values." for column in columns]
+    return "\n".join(lines)
+
+
+def _documentation_output(columns, rng, text):
+    return "\n\n".join([
+        "# Data catalog entry",
+        _analysis_output(columns, rng, text),
+        _schema_output(columns, rng, text),
+        _metadata_output(columns, rng, text),
+        _quality_output(columns, rng, text),
+        _glossary_output(columns, rng, text),
+        "## Usage examples\n- Aggregate the records by period\n- Join on the primary key with the reference tables",
+    ])
+
+
+def _feedback_output(columns, rng, text):
+    # The content under review, as given in the prompt of llm_processor
+    match = re.search(r'pour l\'étape "[^"]*":\s*(.*?)\s*Voici le retour', text, re.DOTALL)
+    return (match.group(1) if match else text) + "\n\n(Modifications intégrées selon le retour.)"
+
+
+def _response_output(columns, rng, text):
+    return rng.choice(["Merci pour votre retour, je l'intègre et je passe à la suite.",
+                       "C'est noté, les modifications seront appliquées à cette étape."])
+
+
+# Canned output of each agent role, found by a marker of the prompt
+ROLE_OUTPUTS = [
+    ("Data Analyst", _analysis_output),
+    ("Schema Extractor", _schema_output),
+    ("Metadata Curator", _metadata_output),
+    ("Data Quality Assessor", _quality_output),
+    ("Business Glossary Creator", _glossary_output),
+    ("Documentation Specialist", _documentation_output),
+    ("catalogues de données précis", _feedback_output),
+    ("assistant sympathique", _response_output),
+]
+
+
+class MockLLM:
+    """
+    Local stand-in for an LLM provider, for load testing without network.
+    Each request waits for a first-token latency drawn from a distribution,
+    then produces its output at a fixed token throughput, or fails with a
+    rate limit or server error at a configured rate. The output has the shape
+    expected from the agent role of the prompt and is sized from the columns of
+    the file. Everything is seeded by the request, so runs are reproducible.
+    """
+
+    def __init__(self, latency=MOCK_LATENCY, tokens_per_second=MOCK_TOKENS_PER_SECOND,
+                 error_rate=MOCK_ERROR_RATE, seed=MOCK_SEED):
+        self.sample_latency = parse_latency(latency) if isinstance(latency, str) else latency
+        self.tokens_per_second = tokens_per_second
+        self.error_rate = error_rate
+        self.seed = seed
+        self.stats = {'requests': 0, 'errors': 0, 'prompt_tokens': 0, 'completion_tokens': 0}
+        self._attempts = {}
+        self._lock = threading.Lock()
+
+    def plan(self, messages, max_tokens=None):
+        """
+        Decide how a request is answered.
+
+        Args:
+            messages: The chat messages, or a prompt string
+            max_tokens: The maximum number of tokens of the output
+
+        Returns:
+            dict: error (the HTTP status, or None), latency (seconds before the first
+            token), text, tokens and duration (seconds to generate the text)
+        """
+        text = _message_text(messages)
+        key = hashlib.sha256(f"{self.seed}:{text}".encode('utf-8')).hexdigest()
+        with self._lock:
+            # Retries of a request draw again, so they can succeed
+            attempt = self._attempts.get(key, 0)
+            self._attempts[key] = attempt + 1
+        rng = random.Random(f"{key}:{attempt}")
+
+        latency = self.sample_latency(rng)
+        prompt_tokens = count_tokens(text)
+        if rng.random() < self.error_rate:
+            with self._lock:
+                self.stats['requests'] += 1
+                self.stats['errors'] += 1
+            return {'error': rng.choice([429, 500, 503]), 'latency': latency, 'text': "", 'tokens': 0,
+                    'duration': 0.0}
+
+        # The output of a request is the same on every attempt
+        output_rng = random.Random(key)
+        build = next((build for marker, build in ROLE_OUTPUTS if marker in text), _analysis_output)
+        output = build(_extract_columns(text), output_rng, text)
+        if max_tokens:
+            output = output[:max_tokens * CHARS_PER_TOKEN]
+        # Agents of a crew expect the ReAct format
+        if "Final Answer" in text:
+            output = f"Thought: I now can give a great answer\nFinal Answer: {output}"
+
+        tokens = count_tokens(output)
+        with self._lock:
+            # Only the requests being retried keep their attempt count
+            self._attempts.pop(key, None)
+            self.stats['requests'] += 1
+            self.stats['prompt_tokens'] += prompt_tokens
+            self.stats['completion_tokens'] += tokens
+        return {'error': None, 'latency': latency, 'text': output, 'tokens': tokens,
+                'duration': tokens / self.tokens_per_second}
+
+    def complete(self, messages, max_tokens=None, max_retries=None):
+        """
+        Answer a request synchronously, retrying the simulated errors with backoff.
+
+        Args:
+            messages: The chat messages, or a prompt string
+            max_tokens: The maximum number of tokens of the output
+            max_retries: Number of retries, defaults to DUKE_LLM_MAX_RETRIES
+
+        Returns:
+            str: The output
+        """
+        from data_catalog.async_llm import LLM_MAX_RETRIES, LLMRequestError, backoff_delay
+
+        max_retries = LLM_MAX_RETRIES if max_retries is None else max_retries
+        for attempt in range(max_retries + 1):
+            plan = self.plan(messages, max_tokens)
+            time.sleep(plan['latency'])
+            if plan['error'] is None:
+                time.sleep(plan['duration'])
+                return plan['text']
+            if attempt < max_retries:
+                time.sleep(backoff_delay(attempt))
+        raise LLMRequestError(f"Mock LLM request failed after {max_retries + 1} attempts: status {plan['error']}")
+
+    def reset_stats(self):
+        """
+        Reset the request counters.
+        """
+        with self._lock:
+            self.stats = {key: 0 for key in self.stats}
+
+
+async def _stream_events(plan, model):
+    # Server-sent events of the output, word by word at the mock throughput
+    fragments = re.findall(r"\s*\S+", plan['text']) or [""]
+    delay = plan['duration'] / len(fragments)
+    for fragment in fragments:
+        await asyncio.sleep(delay)
+        chunk = {'object': 'chat.completion.chunk', 'model': model,
+                 'choices': [{'index': 0, 'delta': {'content': fragment}}]}
+        yield f"data: {json.dumps(chunk)}\n\n".encode('utf-8')
+    yield b"data: [DONE]\n\n"
+
+
+def create_mock_transport(mock=None):
+    """
+    Create an httpx transport answering the chat completions API with a mock LLM,
+    to give to data_catalog.async_llm.AsyncLLMClient.
+
+    Args:
+        mock: The mock LLM, defaults to the one of get_mock_llm
+
+    Returns:
+        httpx.MockTransport: The transport
+    """
+    import httpx
+
+    mock = mock or get_mock_llm()
+
+    async def handle(request):
+        body = json.loads(request.content)
+        plan = mock.plan(body['messages'], body.get('max_tokens'))
+        await asyncio.sleep(plan['latency'])
+        if plan['error'] is not None:
+            return httpx.Response(plan['error'], json={'error': {'message': "Simulated error of the mock LLM"}})
+        if body.get('stream'):
+            return httpx.Response(200, headers={'content-type': 'text/event-stream'},
+                                  content=_stream_events(plan, body['model']))
+
+        await asyncio.sleep(plan['duration'])
+        return httpx.Response(200, json={
+            'object': 'chat.completion',
+            'model': body['model'],
+            'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': plan['text']},
+                         'finish_reason': 'stop'}],
+            'usage': {'completion_tokens': plan['tokens']}
+        })
+
+    return httpx.MockTransport(handle)
+
+
+def is_mock_provider():
+    """
+    Check if the LLM requests are answered by the mock LLM.
+
+    Returns:
+        bool: True if DUKE_LLM_PROVIDER is mock
+    """
+    return LLM_PROVIDER == 'mock'
+
+
+def get_mock_llm():
+    """
+    Get the mock LLM of the process, shared by the crews and the async client
+    so that its stats cover every request.
+
+    Returns:
+        MockLLM: The mock LLM
+    """
+    global _mock
+    with _mock_lock:
+        if _mock is None:
+            _mock = MockLLM()
+        return _mock
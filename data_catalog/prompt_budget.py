@@ -0,0 +1,208 @@
+import os
+from functools import lru_cache
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Maximum number of tokens of a task description
+PROMPT_TOKEN_BUDGET = int(os.getenv("DUKE_PROMPT_TOKEN_BUDGET", "8000"))
+
+# Maximum number of tokens of the outputs of previous tasks given as context to a task
+CONTEXT_TOKEN_BUDGET = int(os.getenv("DUKE_CONTEXT_TOKEN_BUDGET", "8000"))
+
+# Average number of characters per token, used when tiktoken is not installed
+CHARS_PER_TOKEN = 4
+
+
+@lru_cache(maxsize=8)
+def _get_encoding(model):
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model) if model else tiktoken.get_encoding("cl100k_base")
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
+
+
+def count_tokens(text, model=None):
+    """
+    Count the tokens of a text, with tiktoken when it is installed and from
+    the length of the text otherwise.
+
+    Args:
+        text: The text
+        model: The model name, selects the tiktoken encoding
+
+    Returns:
+        int: The number of tokens
+    """
+    if not text:
+        return 0
+    encoding = _get_encoding(model)
+    if encoding is None:
+        return -(-len(text) // CHARS_PER_TOKEN)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def count_message_tokens(messages, model=None):
+    """
+    Count the tokens of the text of an LLM prompt, see count_tokens.
+
+    Args:
+        messages: The prompt, as a string or a list of chat messages
+        model: The model name, selects the tiktoken encoding
+
+    Returns:
+        int: The number of tokens
+    """
+    if isinstance(messages, str):
+        return count_tokens(messages, model)
+    return count_tokens("\n".join(message.get('content') or "" for message in messages), model)
+
+
+def truncate_to_tokens(text, max_tokens, model=None):
+    """
+    Truncate a text to a number of tokens, keeping whole lines from the start
+    and noting how many lines were left out.
+
+    Args:
+        text: The text
+        max_tokens: The maximum number of tokens
+        model: The model name, selects the tiktoken encoding
+
+    Returns:
+        str: The truncated text
+    """
+    if count_tokens(text, model) <= max_tokens:
+        return text
+
+    lines = text.splitlines()
+    kept, used = [], 0
+    for line in lines:
+        # Room is kept for the note about the omitted lines
+        tokens = count_tokens(line + "\n", model)
+        if used + tokens > max_tokens - 16:
+            break
+        kept.append(line)
+        used += tokens
+
+    if not kept:
+        # A single line longer than the budget is cut by characters
+        return text[:max(max_tokens - 16, 0) * CHARS_PER_TOKEN] + "\n[... truncated]"
+    return "\n".join(kept) + f"\n[... {len(lines) - len(kept)} more lines omitted]"
+
+
+def _to_text(value):
+    # Sections can be task outputs or other objects rendered by str
+    return "" if value is None else str(value)
+
+
+def fit_sections(sections, budget, model=None):
+    """
+    Fit the sections of a prompt into a token budget.
+    Sections are shrunk largest first: every section keeps its full size when
+    it is under the common cap, and the larger ones are replaced by their
+    first shorter rendering under the cap, or truncated.
+
+    Args:
+        sections: The sections keyed by name; a value is either a text or a list
+            of renderings of the same content, from the most to the least detailed
+        budget: The total number of tokens of the sections
+        model: The model name, selects the tiktoken encoding
+
+    Returns:
+        tuple: (the fitted texts keyed by name, the usage of each section as
+        {'tokens': ..., 'original_tokens': ..., 'trimmed': ...})
+    """
+    renderings = {name: [_to_text(text) for text in value] if isinstance(value, (list, tuple)) else [_to_text(value)]
+                  for name, value in sections.items()}
+    sizes = {name: count_tokens(texts[0], model) for name, texts in renderings.items()}
+
+    # Highest cap such that the sections capped to it fit in the budget
+    cap = max(budget, 0)
+    if sum(sizes.values()) > budget:
+        remaining, remaining_budget = sorted(sizes.values()), max(budget, 0)
+        while remaining and remaining[0] * len(remaining) <= remaining_budget:
+            remaining_budget -= remaining.pop(0)
+        cap = remaining_budget // len(remaining) if remaining else remaining_budget
+
+    fitted, usage = {}, {}
+    for name, texts in renderings.items():
+        if sizes[name] <= cap:
+            text = texts[0]
+        else:
+            text = next((rendering for rendering in texts[1:] if count_tokens(rendering, model) <= cap), None)
+            if text is None:
+                text = truncate_to_tokens(texts[-1], cap, model)
+        fitted[name] = text
+        usage[name] = {'tokens': count_tokens(text, model), 'original_tokens': sizes[name],
+                       'trimmed': text != texts[0]}
+    return fitted, usage
+
+
+def assemble_prompt(template, sections, fixed=None, budget=None, task_name=None, model=None):
+    """
+    Build a task description whose size stays within a token budget.
+
+    Args:
+        template: The description, with a {name} field per section and per fixed value
+        sections: The variable-size sections, see fit_sections
+        fixed: The values inserted as they are, such as the file name
+        budget: The maximum number of tokens, defaults to PROMPT_TOKEN_BUDGET
+        task_name: The name of the task, for the usage report
+        model: The model name, selects the tiktoken encoding
+
+    Returns:
+        tuple: (the description, the usage report with the task name, tokens,
+        budget and the usage of each section)
+    """
+    fixed = fixed or {}
+    budget = PROMPT_TOKEN_BUDGET if budget is None else budget
+
+    # The template and the fixed values are never shrunk
+    base = template.format(**fixed, **{name: "" for name in sections})
+    fitted, section_usage = fit_sections(sections, budget - count_tokens(base, model), model)
+
+    prompt = template.format(**fixed, **fitted)
+    return prompt, {
+        'task': task_name,
+        'tokens': count_tokens(prompt, model),
+        'budget': budget,
+        'sections': section_usage
+    }
+
+
+def format_prompt_usage(usage):
+    """
+    Format a usage report of assemble_prompt as a single line.
+
+    Args:
+        usage: The usage report
+
+    Returns:
+        str: The formatted report
+    """
+    trimmed = [f"{name} {section['original_tokens']}->{section['tokens']}"
+               for name, section in usage['sections'].items() if section['trimmed']]
+    line = f"Prompt tokens for {usage['task'] or 'task'}: {usage['tokens']}/{usage['budget']}"
+    if trimmed:
+        line += f" (trimmed: {', '.join(trimmed)})"
+    return line
+
+
+def record_prompt_usage(usage):
+    """
+    Record a usage report of assemble_prompt on the current trace span,
+    see tracing.spans.
+
+    Args:
+        usage: The usage report
+    """
+    from tracing.spans import current_span
+
+    trimmed = sum(1 for section in usage['sections'].values() if section['trimmed'])
+    current_span().set(prompt_tokens=usage['tokens'], prompt_budget=usage['budget'], trimmed_sections=trimmed,
+                       prompt_usage=format_prompt_usage(usage))
@@ -1,11 +1,13 @@
 from crewai import Task
-import pandas as pd
 import streamlit as st
-from file_loader.load_file import load_excel_file, load_csv_file, load_txt_file
+from file_loader.dataset import get_datasets, get_file_sample_text, get_file_profile_text
 from file_loader.utils import get_file_extension
 from chat_interface.utils import update_chat_with_catalog_progress
+from data_catalog.prompt_budget import assemble_prompt, record_prompt_usage
+from tracing.spans import traced
 
 
+@traced("task_builder.analysis")
 def create_file_analysis_task(data_analyzer, file):
     """
     Create a task for analyzing a file's structure and content.
@@ -19,31 +21,16 @@ def create_file_analysis_task(data_analyzer, file):
     """
     # Prepare file info
     file_name = file.name
-    file_extension = get_file_extension(file_name)
 
     # Load a small sample of the file for analysis
     file_content = None
     try:
-        if file_extension in ['.xls', '.xlsx']:
-            df = load_excel_file(file)
-            if df is not None:
-                file_content = df.head(10).to_string()
-        elif file_extension == '.csv':
-            df = load_csv_file(file)
-            if df is not None:
-                file_content = df.head(10).to_string()
-        elif file_extension == '.txt':
-            file_content = load_txt_file(file)
-            if isinstance(file_content, pd.DataFrame):
-                file_content = file_content.head(10).to_string()
-            elif file_content is not None:
-                file_content = file_content[:1000]  # First 1000 characters
+        file_content = [get_file_sample_text(file), get_file_sample_text(file, n_rows=3)]
     except Exception as e:
         file_content = f"Error loading file: {str(e)}"
 
     # Create the task
-    return Task(
-        description=f"""
+    description, usage = assemble_prompt("""
         Analyze the structure and content of the file: {file_name}
 
         Sample content:
@@ -56,13 +43,19 @@ def create_file_analysis_task(data_analyzer, file):
         4. Provide a summary of what this file appears to be used for
 
         Be detailed but concise in your analysis.
-        """,
+        """, {'file_content': file_content},
+                                         fixed={'file_name': file_name}, task_name="file analysis")
+    record_prompt_usage(usage)
+
+    return Task(
+        description=description,
         agent=data_analyzer,
         expected_output="A comprehensive analysis of the file structure and content",
         async_execution=False
     )
 
 
+@traced("task_builder.schema")
 def create_schema_extraction_task(schema_extractor, file, file_analysis_result):
     """
     Create a task for extracting the schema from a file.
@@ -83,38 +76,17 @@ def create_schema_extraction_task(schema_extractor, file, file_analysis_result):
     schema_info = "Could not load schema information"
     try:
         if file_extension in ['.xls', '.xlsx', '.csv']:
-            df = None
-            if file_extension in ['.xls', '.xlsx']:
-                df = load_excel_file(file)
-            else:
-                df = load_csv_file(file)
-
-            if df is not None:
-                # Create schema information string
-                columns_info = []
-                for col in df.columns:
-                    dtype = str(df[col].dtype)
-                    non_null = df[col].count()
-                    unique_values = df[col].nunique()
-                    sample_values = df[col].dropna().head(3).tolist()
-
-                    columns_info.append(
-                        f"Column: {col}\n"
-                        f"  - Data Type: {dtype}\n"
-                        f"  - Non-Null Count: {non_null}/{len(df)}\n"
-                        f"  - Unique Values: {unique_values}\n"
-                        f"  - Sample Values: {sample_values}"
-                    )
-
-                schema_info = "\n".join(columns_info)
+            # Column statistics of every sheet, computed in a single pass
+            profile_text = get_file_profile_text(file)
+            if profile_text is not None:
+                schema_info = [profile_text, get_file_profile_text(file, compact=True)]
         elif file_extension == '.txt':
             schema_info = "Text file - structured schema not applicable"
     except Exception as e:
         schema_info = f"Error extracting schema: {str(e)}"
 
     # Create the task
-    return Task(
-        description=f"""
+    description, usage = assemble_prompt("""
         Extract the schema from the file: {file_name}
 
         Previous analysis:
@@ -131,13 +103,19 @@ def create_schema_extraction_task(schema_extractor, file, file_analysis_result):
         5. Document any constraints or validation rules that should apply to this data
 
         Provide the schema in a structured, clear format.
-        """,
+        """, {'file_analysis_result': file_analysis_result, 'schema_info': schema_info},
+                                         fixed={'file_name': file_name}, task_name="schema extraction")
+    record_prompt_usage(usage)
+
+    return Task(
+        description=description,
         agent=schema_extractor,
         expected_output="A formal schema definition for the data file",
         async_execution=False
     )
 
 
+@traced("task_builder.metadata")
 def create_metadata_curation_task(metadata_curator, file, schema_result):
     """
     Create a task for curating metadata for a file.
@@ -150,9 +128,8 @@ def create_metadata_curation_task(metadata_curator, file, schema_result):
     Returns:
         Task: The metadata curation task
     """
-    return Task(
-        description=f"""
-        Create comprehensive metadata for the file: {file.name}
+    description, usage = assemble_prompt("""
+        Create comprehensive metadata for the file: {file_name}
 
         Schema information:
         {schema_result}
@@ -166,13 +143,24 @@ def create_metadata_curation_task(metadata_curator, file, schema_result):
         6. Note any sensitivity classifications (e.g., Public, Internal, Confidential)
 
         Create metadata that would help users discover and understand this data asset.
-        """,
+        Start with these lines, they are indexed by the catalog search:
+        - **Title**: the title
+        - **Description**: a one sentence description
+        - **Tags**: the tags, separated by commas
+        - **Domain**: the data domain
+        """, {'schema_result': schema_result},
+                                         fixed={'file_name': file.name}, task_name="metadata curation")
+    record_prompt_usage(usage)
+
+    return Task(
+        description=description,
         agent=metadata_curator,
         expected_output="Comprehensive metadata for the data file",
         async_execution=False
     )
 
 
+@traced("task_builder.quality")
 def create_data_quality_assessment_task(data_quality_agent, file, schema_result):
     """
     Create a task for assessing the quality of data in a file.
@@ -187,38 +175,32 @@ def create_data_quality_assessment_task(data_quality_agent, file, schema_result)
     """
     # Prepare file info
     file_name = file.name
-    file_extension = get_file_extension(file_name)
 
     # Load file for quality assessment
     quality_info = "Could not load data for quality assessment"
     try:
-        df = None
-        if file_extension in ['.xls', '.xlsx']:
-            df = load_excel_file(file)
-        elif file_extension == '.csv':
-            df = load_csv_file(file)
-        elif file_extension == '.txt':
-            content = load_txt_file(file)
-            if isinstance(content, pd.DataFrame):
-                df = content
-
-        if df is not None:
-            # Calculate quality metrics
-            missing_values = df.isna().sum().sum()
-            duplicate_rows = df.duplicated().sum()
-            total_rows = len(df)
-
-            quality_info = (
-                f"Total rows: {total_rows}\n"
-                f"Missing values: {missing_values}\n"
-                f"Duplicate rows: {duplicate_rows}\n"
+        sections = []
+        for dataset in get_datasets(file):
+            profile = dataset.profile()
+            if profile is None:
+                continue
+
+            # Quality metrics computed while profiling the file
+            sections.append(
+                (f"Sheet: {dataset.sheet_name}\n" if dataset.sheet_name is not None else "") +
+                f"Total rows: {profile['row_count']}\n"
+                f"Missing values: {profile['missing_values']}\n"
+                f"Duplicate rows: {profile['duplicate_rows']}\n"
+                f"Near-duplicate rows: {profile['near_duplicate_rows']}\n"
             )
+
+        if sections:
+            quality_info = "\n".join(sections)
     except Exception as e:
         quality_info = f"Error assessing data quality: {str(e)}"
 
     # Create the task
-    return Task(
-        description=f"""
+    description, usage = assemble_prompt("""
         Assess the quality of data in the file: {file_name}
 
         Schema information:
@@ -235,13 +217,20 @@ def create_data_quality_assessment_task(data_quality_agent, file, schema_result)
         5. Suggest specific improvements to enhance data quality
 
         Provide a detailed data quality assessment.
-        """,
+        Start with the line: Overall quality score: <0 to 100>/100
+        """, {'schema_result': schema_result, 'quality_info': quality_info},
+                                         fixed={'file_name': file_name}, task_name="data quality assessment")
+    record_prompt_usage(usage)
+
+    return Task(
+        description=description,
         agent=data_quality_agent,
         expected_output="A comprehensive data quality assessment",
         async_execution=False
     )
 
 
+@traced("task_builder.glossary")
 def create_business_glossary_task(business_glossary_agent, schema_result, metadata_result):
     """
     Create a task for building a business glossary based on the file.
@@ -254,8 +243,7 @@ def create_business_glossary_task(business_glossary_agent, schema_result, metada
     Returns:
         Task: The business glossary task
     """
-    return Task(
-        description=f"""
+    description, usage = assemble_prompt("""
         Create a business glossary based on the data schema and metadata.
 
         Schema information:
@@ -272,13 +260,20 @@ def create_business_glossary_task(business_glossary_agent, schema_result, metada
         5. Ensure consistency with any existing business terminology
 
         Create a business glossary that would help users understand the business context of this data.
-        """,
+        Write one line per term: - **Term**: definition
+        """, {'schema_result': schema_result, 'metadata_result': metadata_result},
+                                         task_name="business glossary")
+    record_prompt_usage(usage)
+
+    return Task(
+        description=description,
         agent=business_glossary_agent,
         expected_output="A business glossary for the data file",
         async_execution=False
     )
 
 
+@traced("task_builder.documentation")
 def create_documentation_task(documentation_agent, file, analysis_result, schema_result, metadata_result,
                               quality_result, glossary_result):
     """
@@ -296,9 +291,8 @@ def create_documentation_task(documentation_agent, file, analysis_result, schema
     Returns:
         Task: The documentation task
     """
-    return Task(
-        description=f"""
-        Create comprehensive documentation for the data catalog entry for: {file.name}
+    description, usage = assemble_prompt("""
+        Create comprehensive documentation for the data catalog entry for: {file_name}
 
         Compile all the information collected so far:
 
@@ -325,7 +319,14 @@ def create_documentation_task(documentation_agent, file, analysis_result, schema
         5. Include any usage examples or common queries that might be useful
 
         The documentation should serve as a complete reference for this data asset.
-        """,
+        """, {'analysis_result': analysis_result, 'schema_result': schema_result,
+                                          'metadata_result': metadata_result, 'quality_result': quality_result,
+                                          'glossary_result': glossary_result},
+                                         fixed={'file_name': file.name}, task_name="documentation")
+    record_prompt_usage(usage)
+
+    return Task(
+        description=description,
         agent=documentation_agent,
         expected_output="Comprehensive documentation for the data catalog entry",
         async_execution=False
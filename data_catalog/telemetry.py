@@ -0,0 +1,35 @@
+import os
+import threading
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Key of the AgentOps recording of the crews, nothing is recorded without it
+AGENTOPS_API_KEY = os.getenv("AGENTOPS_API_KEY")
+
+_agentops_initialized = False
+_agentops_lock = threading.Lock()
+
+
+def init_agentops():
+    """
+    Start the AgentOps recording once per process, on the first cataloging job.
+    Importing agentops and its handshake with the server are deferred to this
+    call so they do not slow down the start of the app.
+
+    Returns:
+        bool: True if AgentOps was initialized by this call or a previous one
+    """
+    global _agentops_initialized
+    with _agentops_lock:
+        if _agentops_initialized or not AGENTOPS_API_KEY:
+            return _agentops_initialized
+        try:
+            import agentops
+            agentops.init(api_key=AGENTOPS_API_KEY, default_tags=['crewai'])
+            _agentops_initialized = True
+        except Exception as e:
+            # The crews run the same without the recording
+            print(f"Error initializing AgentOps: {e}")
+        return _agentops_initialized
@@ -1,92 +1,232 @@
 import pandas as pd
 import json
+import re
 from datetime import datetime
 
+# Fields of the metadata task output stored in the catalog entry
+METADATA_FIELDS = ['title', 'description', 'tags', 'domain']
 
-def generate_catalog_id(file_name):
+# "- **Title**: value", "**Title:** value" or "Title: value" lines of the crew outputs
+_FIELD_LINE = re.compile(r"^[ \t]*(?:[-*][ \t]+)?\**([A-Za-z][\w \t]*?):?\**[ \t]*:[ \t]*\**[ \t]*(.+?)[ \t]*$",
+                         re.MULTILINE)
+
+# "Overall quality score: 87/100" line of the quality assessment
+_QUALITY_SCORE = re.compile(r"overall[\w \t*]*?score\W*?(\d+(?:\.\d+)?)", re.IGNORECASE)
+
+# "- **Term**: definition" lines of the business glossary
+_GLOSSARY_LINE = re.compile(r"^[ \t]*[-*][ \t]+\*\*([^*\n]+?):?\*\*[ \t]*:?[ \t]*(.+?)[ \t]*$", re.MULTILINE)
+
+
+def generate_catalog_id(file_name, schema_key=None):
     """
-    Generate a unique ID for a catalog entry.
+    Generate the ID of the catalog entry of a file.
+    The ID depends on the file name and columns of the file, so a re-cataloged
+    file keeps its ID while another file uploaded under the same name gets its own.
 
     Args:
         file_name: The name of the file
+        schema_key: The schema key of the file, see data_catalog.fingerprints.get_schema_key
 
     Returns:
-        str: A unique catalog ID
+        str: The catalog ID
     """
     import hashlib
-    import time
 
-    # Generate a hash based on the filename and current timestamp
-    timestamp = str(time.time())
-    hash_input = file_name + timestamp
-    hash_obj = hashlib.md5(hash_input.encode())
+    # Generate a hash based on the filename and the schema
+    key = file_name if schema_key is None else f"{file_name}:{schema_key}"
+    hash_obj = hashlib.md5(key.encode())
 
     # Return a shortened hash
     return hash_obj.hexdigest()[:12]
 
 
+def parse_metadata(text):
+    """
+    Parse the title, description, tags and domain of the metadata task output.
+
+    Args:
+        text: The output of the metadata curation task
+
+    Returns:
+        dict: The fields found in the output, the tags as a list
+    """
+    metadata = {}
+    for name, value in _FIELD_LINE.findall(text or ""):
+        key = name.strip().lower()
+        if key in METADATA_FIELDS and key not in metadata:
+            metadata[key] = value.strip("* ")
+    if 'tags' in metadata:
+        metadata['tags'] = [tag.strip() for tag in metadata['tags'].split(',') if tag.strip()]
+    return metadata
+
+
+def parse_glossary(text):
+    """
+    Parse the terms of the business glossary task output.
+
+    Args:
+        text: The output of the business glossary task
+
+    Returns:
+        dict: The definitions keyed by term
+    """
+    glossary = {}
+    for term, definition in _GLOSSARY_LINE.findall(text or ""):
+        glossary.setdefault(term.strip(), definition.strip())
+    return glossary
+
+
+def parse_quality_assessment(text):
+    """
+    Parse the overall score of the quality assessment task output.
+
+    Args:
+        text: The output of the data quality assessment task
+
+    Returns:
+        dict: The overall_score out of 100, None if missing, and the assessment text
+    """
+    match = _QUALITY_SCORE.search(text or "")
+    score = float(match.group(1)) if match else None
+    if score is not None and not 0 <= score <= 100:
+        score = None
+    return {'overall_score': score, 'assessment': text or ""}
+
+
+def build_catalog_entry(file_name, documentation, profiles, task_outputs=None):
+    """
+    Build a catalog entry from the crew documentation and the file profiles.
+
+    Args:
+        file_name: The name of the file
+        documentation: The documentation produced by the crew
+        profiles: The column profiles keyed by sheet name, see file_loader.dataset.get_file_profiles
+        task_outputs: The raw output of each crew task, keyed by task (see
+            data_catalog.fingerprints.CATALOG_TASKS), to fill the metadata, quality
+            assessment and glossary
+
+    Returns:
+        dict: The catalog entry
+    """
+    # The schema columns are derived from the profiles so that the Markdown
+    # export does not depend on parsing the LLM output
+    columns = []
+    for table_name, profile in profiles.items():
+        for column in profile['columns']:
+            columns.append({
+                'name': column['name'] if len(profiles) == 1 else f"{table_name}.{column['name']}",
+                'type': column['dtype'],
+                'description': (f"{column['non_null']}/{profile['row_count']} non-null, "
+                                f"{column['distinct']} distinct values")
+            })
+
+    from data_catalog.fingerprints import get_schema_key
+
+    # The title defaults to the file name so that every entry can be listed
+    task_outputs = task_outputs or {}
+    metadata = parse_metadata(task_outputs.get('metadata'))
+    metadata.setdefault('title', file_name)
+
+    return {
+        'id': generate_catalog_id(file_name, get_schema_key(profiles)),
+        'file_name': file_name,
+        'created_at': datetime.now().isoformat(),
+        'documentation': documentation,
+        'metadata': metadata,
+        'schema': {'columns': columns},
+        'quality_assessment': parse_quality_assessment(task_outputs.get('quality')),
+        'business_glossary': parse_glossary(task_outputs.get('glossary')),
+        'profile': profiles
+    }
+
+
 def save_catalog_entry(catalog_entry, file_name):
     """
-    Save a catalog entry to a JSON file.
+    Save a catalog entry to the catalog store.
+    The entry replaces the previous catalog of the same file, if any.
 
     Args:
         catalog_entry: The catalog entry to save
         file_name: The name of the original file
 
     Returns:
-        str: The path to the saved catalog file
+        str: The ID of the saved catalog entry
     """
-    # Generate a filename for the catalog entry
-    catalog_id = catalog_entry.get('id', generate_catalog_id(file_name))
-    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-    catalog_filename = f"catalog_{catalog_id}_{timestamp}.json"
+    from data_catalog.catalog_store import get_catalog_store
+    from tracing.spans import span
+
+    catalog_entry = dict(catalog_entry)
+    catalog_entry.setdefault('id', generate_catalog_id(file_name))
 
     # Save the catalog entry
-    try:
-        with open(catalog_filename, 'w') as file:
-            json.dump(catalog_entry, file, indent=2)
-        return catalog_filename
-    except Exception as e:
-        print(f"Error saving catalog entry: {e}")
-        return None
+    with span("catalog.save", file=file_name) as current:
+        try:
+            get_catalog_store().save(catalog_entry)
+            current.set(bytes_written=len(json.dumps(catalog_entry, default=str)))
+            return catalog_entry['id']
+        except Exception as e:
+            print(f"Error saving catalog entry: {e}")
+            current.set(errors=1)
+            return None
 
 
-def load_catalog_entries():
+def load_catalog_entries(offset=0, limit=None, **filters):
     """
-    Load all saved catalog entries.
+    Load saved catalog entries, most recent first.
+
+    Args:
+        offset: The number of entries to skip
+        limit: The maximum number of entries, all of them if None
+        **filters: Optional file_name and domain filters
 
     Returns:
         list: A list of catalog entries
     """
-    import glob
+    from data_catalog.catalog_store import get_catalog_store
 
-    catalog_entries = []
+    return get_catalog_store().list_entries(offset=offset, limit=limit, **filters)
 
-    # Find all catalog files
-    catalog_files = glob.glob("catalog_*.json")
 
-    # Load each file
-    for catalog_file in catalog_files:
-        try:
-            with open(catalog_file, 'r') as file:
-                catalog_entry = json.load(file)
-                catalog_entries.append(catalog_entry)
-        except Exception as e:
-            print(f"Error loading catalog entry {catalog_file}: {e}")
+def search_catalog(query, domain=None, tag=None, offset=0, limit=20):
+    """
+    Search the saved catalog entries.
 
-    return catalog_entries
+    Args:
+        query: The words to look for in titles, descriptions, columns and glossary terms
+        domain: Only return the entries of this domain
+        tag: Only return the entries with this tag
+        offset: The number of results to skip
+        limit: The maximum number of results
 
+    Returns:
+        dict: The total number of matches, the ranked results and the domain and tag facets
+    """
+    from data_catalog.catalog_store import get_catalog_store
+
+    return get_catalog_store().search(query, domain=domain, tag=tag, offset=offset, limit=limit)
 
-def create_catalog_summary(catalog_entries):
+
+def create_catalog_summary(catalog_entries=None, offset=0, limit=None):
     """
-    Create a summary of all catalog entries.
+    Create a summary of catalog entries.
 
     Args:
-        catalog_entries: A list of catalog entries
+        catalog_entries: A list of catalog entries, or None to summarize the
+            catalog store from its indexed columns without loading the entries
+        offset: The number of stored entries to skip, when catalog_entries is None
+        limit: The maximum number of stored entries, when catalog_entries is None
 
     Returns:
         DataFrame: A summary DataFrame
     """
+    if catalog_entries is None:
+        from data_catalog.catalog_store import get_catalog_store
+
+        summary_dicts = get_catalog_store().list_summaries(offset=offset, limit=limit)
+        summary = pd.DataFrame(summary_dicts, columns=['id', 'file_name', 'title', 'domain',
+                                                       'created_at', 'quality_score'])
+        return summary.astype(object).where(summary.notna(), 'unknown')
+
     # Create a list of summary dictionaries
     summary_dicts = []
 
@@ -0,0 +1,274 @@
+import hashlib
+import os
+import shutil
+import threading
+import time
+import uuid
+from functools import lru_cache
+
+from file_loader.utils import get_cache_dir
+
+# Set DUKE_COLUMNAR_CACHE=0 to always parse the uploads
+COLUMNAR_CACHE_ENABLED = os.getenv("DUKE_COLUMNAR_CACHE", "1") != "0"
+
+# Maximum size, in megabytes, of the parsed datasets kept on disk
+COLUMNAR_CACHE_MAX_MB = float(os.getenv("DUKE_COLUMNAR_CACHE_MAX_MB", "4096"))
+
+# Bumped when the layout of the cached datasets changes
+CACHE_FORMAT_VERSION = 1
+
+# Seconds after which a table still being written is considered abandoned
+STALE_WRITE_SECONDS = 3600
+
+_evict_lock = threading.Lock()
+
+
+@lru_cache(maxsize=1)
+def _get_pyarrow():
+    # pyarrow is optional, without it every load parses the upload
+    try:
+        import pyarrow
+        import pyarrow.ipc
+    except ImportError:
+        return None
+    return pyarrow
+
+
+def is_columnar_cache_available():
+    """
+    Check whether parsed datasets can be cached on disk
+    Returns:
+        bool: True if the cache is enabled and pyarrow is installed
+    """
+    return COLUMNAR_CACHE_ENABLED and _get_pyarrow() is not None
+
+
+def _get_entry_path(content_hash, extension, sheet_name):
+    # One directory per table: the same bytes parse differently as .csv or .txt,
+    # and each sheet of a workbook is a table of its own
+    sheet_key = hashlib.sha256(str(sheet_name).encode('utf-8')).hexdigest()[:12]
+    name = f"v{CACHE_FORMAT_VERSION}-{content_hash}-{extension.lstrip('.')}-{sheet_key}"
+    return os.path.join(get_cache_dir("datasets"), name)
+
+
+def _get_part_paths(path):
+    try:
+        names = sorted(name for name in os.listdir(path) if name.endswith(".arrow"))
+    except FileNotFoundError:
+        return None
+    return [os.path.join(path, name) for name in names]
+
+
+def _open_parts(content_hash, extension, sheet_name):
+    # Memory-map the Arrow files of a cached table, None on a miss
+    if not is_columnar_cache_available():
+        return None
+    path = _get_entry_path(content_hash, extension, sheet_name)
+    part_paths = _get_part_paths(path)
+    if not part_paths:
+        return None
+
+    pa = _get_pyarrow()
+    try:
+        readers = [pa.ipc.open_file(pa.memory_map(part_path, 'r')) for part_path in part_paths]
+    except (OSError, pa.ArrowInvalid) as e:
+        # Evicted while being opened, or a damaged file: parse the upload again
+        print(f"Error reading the columnar cache: {e}")
+        return None
+
+    # Mark the entry as recently used for the LRU eviction
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+    return readers
+
+
+def has_cached_table(content_hash, extension, sheet_name=None):
+    """
+    Check whether a parsed table is in the columnar cache
+    Args:
+        content_hash: The content hash of the upload
+        extension: The extension of the upload, such as '.csv'
+        sheet_name: The sheet of a workbook
+    Returns:
+        bool: True if the table can be read from the cache
+    """
+    if not is_columnar_cache_available():
+        return False
+    return bool(_get_part_paths(_get_entry_path(content_hash, extension, sheet_name)))
+
+
+def read_cached_dataframe(content_hash, extension, sheet_name=None, max_rows=None):
+    """
+    Read a parsed table from the columnar cache
+    Args:
+        content_hash: The content hash of the upload
+        extension: The extension of the upload, such as '.csv'
+        sheet_name: The sheet of a workbook
+        max_rows: Only read the first max_rows rows if provided
+    Returns:
+        DataFrame: The table, or None if it is not cached
+    """
+    import pandas as pd
+
+    readers = _open_parts(content_hash, extension, sheet_name)
+    if readers is None:
+        return None
+
+    frames = []
+    remaining = max_rows
+    for reader in readers:
+        table = reader.read_all()
+        if remaining is not None:
+            table = table.slice(0, remaining)
+            remaining -= table.num_rows
+        frames.append(table.to_pandas())
+        if remaining == 0:
+            break
+    return frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True)
+
+
+def iter_cached_chunks(content_hash, extension, sheet_name=None):
+    """
+    Stream a parsed table from the columnar cache, one DataFrame per stored chunk
+    Args:
+        content_hash: The content hash of the upload
+        extension: The extension of the upload, such as '.csv'
+        sheet_name: The sheet of a workbook
+    Returns:
+        iterator: The DataFrame chunks in file order, nothing if the table is not cached
+    """
+    readers = _open_parts(content_hash, extension, sheet_name) or []
+    for reader in readers:
+        for index in range(reader.num_record_batches):
+            yield reader.get_batch(index).to_pandas()
+
+
+class ColumnarWriter:
+    """
+    Write the chunks of a parsed table to the columnar cache as they are produced.
+    Chunks go to Arrow IPC files, a new file being started whenever the column
+    types of a chunk differ from the previous ones. The table only becomes
+    visible to readers once commit is called after the last chunk.
+    """
+
+    def __init__(self, content_hash, extension, sheet_name=None):
+        self.path = _get_entry_path(content_hash, extension, sheet_name)
+        self._tmp_path = f"{self.path}.{uuid.uuid4().hex[:8]}.tmp"
+        self._writer = None
+        self._schema = None
+        self._parts = 0
+        self.failed = not is_columnar_cache_available()
+
+    def write(self, df):
+        """
+        Append a chunk to the table. A chunk that Arrow cannot store, such as a
+        column mixing numbers and text, abandons the cache entry
+        Args:
+            df: The DataFrame chunk
+        """
+        if self.failed:
+            return
+        pa = _get_pyarrow()
+        try:
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            if self._writer is None or not table.schema.equals(self._schema):
+                self._close_writer()
+                os.makedirs(self._tmp_path, exist_ok=True)
+                part_path = os.path.join(self._tmp_path, f"part-{self._parts:05d}.arrow")
+                self._writer = pa.ipc.new_file(part_path, table.schema)
+                self._schema = table.schema
+                self._parts += 1
+            self._writer.write_table(table)
+        except (pa.ArrowException, ValueError, TypeError, OSError) as e:
+            print(f"Skipping the columnar cache of {os.path.basename(self.path)}: {e}")
+            self.abort()
+
+    def commit(self):
+        """
+        Publish the written table to the readers and evict old tables if needed
+        """
+        if self.failed:
+            return
+        self._close_writer()
+        if self._parts == 0:
+            # Nothing to read back for an empty table
+            self.abort()
+            return
+        try:
+            os.rename(self._tmp_path, self.path)
+        except OSError:
+            # Already written by a concurrent load of the same upload
+            self.abort()
+            return
+        evict_columnar_cache()
+
+    def abort(self):
+        """
+        Drop the partially written table
+        """
+        self.failed = True
+        try:
+            self._close_writer()
+        except Exception:
+            pass
+        shutil.rmtree(self._tmp_path, ignore_errors=True)
+
+    def _close_writer(self):
+        if self._writer is not None:
+            writer, self._writer = self._writer, None
+            writer.close()
+
+
+def store_dataframe(content_hash, extension, df, sheet_name=None):
+    """
+    Store a parsed table in the columnar cache
+    Args:
+        content_hash: The content hash of the upload
+        extension: The extension of the upload, such as '.csv'
+        df: The parsed DataFrame
+        sheet_name: The sheet of a workbook
+    Returns:
+        bool: True if the table was stored
+    """
+    writer = ColumnarWriter(content_hash, extension, sheet_name)
+    writer.write(df)
+    writer.commit()
+    return not writer.failed
+
+
+def _get_entry_size(path):
+    return sum(os.path.getsize(part_path) for part_path in _get_part_paths(path) or [])
+
+
+def evict_columnar_cache(max_bytes=None):
+    """
+    Remove the least recently used tables until the cache fits in its size limit
+    Args:
+        max_bytes: The size limit in bytes, defaults to COLUMNAR_CACHE_MAX_MB
+    """
+    if max_bytes is None:
+        max_bytes = COLUMNAR_CACHE_MAX_MB * 1024 * 1024
+    directory = get_cache_dir("datasets")
+    with _evict_lock:
+        entries = []
+        for name in os.listdir(directory):
+            path = os.path.join(directory, name)
+            try:
+                if name.endswith(".tmp"):
+                    # Left over by a process that stopped while writing
+                    if time.time() - os.path.getmtime(path) > STALE_WRITE_SECONDS:
+                        shutil.rmtree(path, ignore_errors=True)
+                    continue
+                entries.append((os.path.getmtime(path), _get_entry_size(path), path))
+            except OSError:
+                continue
+
+        total = sum(size for _, size, _ in entries)
+        # Oldest use first; readers keep their memory maps of removed files
+        for _, size, path in sorted(entries):
+            if total <= max_bytes:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
@@ -0,0 +1,394 @@
+import os
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+from file_loader.load_file import (load_excel_file, load_csv_file, load_txt_file, iter_csv_chunks,
+                                   iter_excel_chunks, iter_txt_chunks, get_excel_sheet_names)
+from file_loader.utils import get_file_extension, get_content_hash, get_file_lock
+from file_loader.columnar_cache import ColumnarWriter, read_cached_dataframe, iter_cached_chunks, store_dataframe, \
+    has_cached_table
+from file_processor.profiler import profile_chunks, refine_profile, format_profile
+from file_processor.duplicates import DuplicateCounter, count_duplicates
+from file_processor.sampling import RowSampler, sample_text_excerpts, sample_block_excerpts
+from tracing.spans import span, current_span
+
+# Maximum number of parsed files kept in memory by the process, all the sheets
+# of a workbook count as a single file
+MAX_CACHED_DATASETS = int(os.getenv("DUKE_MAX_CACHED_DATASETS", "4"))
+
+# Files larger than this are streamed in chunks instead of being fully loaded
+STREAMING_THRESHOLD_MB = int(os.getenv("DUKE_STREAMING_THRESHOLD_MB", "200"))
+
+# Number of worker processes used to profile streamed files
+PROFILE_WORKERS = int(os.getenv("DUKE_PROFILE_WORKERS", "1"))
+
+# Number of rows (or characters for text files) kept in memory for streamed files
+PREVIEW_ROWS = 1000
+PREVIEW_CHARS = 100000
+
+# Cache entries keyed by content hash: {'handles': {sheet_name: handle}, 'sheet_names': list}
+_datasets = OrderedDict()
+_datasets_lock = threading.Lock()
+
+
+class DatasetHandle:
+    """
+    Shared handle on the parsed content of an uploaded file.
+    The file is parsed on first access and the same object is returned
+    to every caller afterwards. Files above STREAMING_THRESHOLD_MB are never
+    fully loaded: only a preview is kept in memory and the statistics are
+    computed by streaming the file in chunks.
+    Parsed tables are kept in the columnar cache (see file_loader.columnar_cache),
+    later loads of the same content memory-map them instead of parsing the upload.
+    Each sheet of an Excel workbook gets its own handle.
+    """
+
+    def __init__(self, file, content_hash, sheet_name=None):
+        self.file = file
+        self.file_name = file.name
+        self.extension = get_file_extension(file.name)
+        self.content_hash = content_hash
+        self.sheet_name = sheet_name
+        self.size = _get_file_size(file)
+        self.streaming = self.size > STREAMING_THRESHOLD_MB * 1024 * 1024
+        self._data = None
+        self._loaded = False
+        self._profile = None
+        self._sampler = None
+        self._text_samples = {}
+        self._from_cache = False
+        # Shared with every reader of the file object, including the content
+        # hash and the other sheets; reentrant because loading and profiling nest
+        self._lock = get_file_lock(file)
+
+    @property
+    def data(self):
+        """
+        The parsed content: a DataFrame for tabular files, a str for text files.
+        For streamed files this is only a preview of the first rows.
+        """
+        with self._lock:
+            if not self._loaded:
+                with span("file.load", file=self.label, streaming=self.streaming) as current:
+                    self._data = self._load()
+                    current.set(**self._load_stats())
+                self._loaded = True
+        return self._data
+
+    def _load_stats(self):
+        # Rows (or characters for text) and bytes read by _load, for its trace span
+        data = self._data
+        if self._from_cache:
+            stats = {'bytes_read': 0, 'cache_hits': 1}
+        else:
+            stats = {'bytes_read': self.file.tell() if self.streaming else self.size}
+        if isinstance(data, pd.DataFrame):
+            stats['rows'] = len(data)
+        elif data is not None:
+            stats['chars'] = len(data)
+        return stats
+
+    @property
+    def label(self):
+        """
+        A readable name of the dataset, including the sheet for workbooks.
+        """
+        if self.sheet_name is None:
+            return self.file_name
+        return f"{self.file_name} [{self.sheet_name}]"
+
+    @property
+    def dataframe(self):
+        """
+        The parsed content if it is tabular, None otherwise.
+        """
+        data = self.data
+        return data if isinstance(data, pd.DataFrame) else None
+
+    def _load(self):
+        # Tables parsed before are read back from the columnar cache
+        if self.extension in ['.csv', '.xls', '.xlsx']:
+            data = read_cached_dataframe(self.content_hash, self.extension, self.sheet_name,
+                                         PREVIEW_ROWS if self.streaming else None)
+            if data is not None:
+                self._from_cache = True
+                return data
+
+        data = self._parse()
+        if isinstance(data, pd.DataFrame):
+            # Column labels are read back from the columnar cache as strings,
+            # parsed tables use the same labels whether cached or not
+            data.columns = data.columns.map(str)
+        if not self.streaming and isinstance(data, pd.DataFrame):
+            store_dataframe(self.content_hash, self.extension, data, self.sheet_name)
+        return data
+
+    def _parse(self):
+        # Always parse from the beginning of the upload stream
+        self.file.seek(0)
+        if self.streaming and self.extension == '.csv':
+            return pd.read_csv(self.file, nrows=PREVIEW_ROWS)
+        elif self.streaming and self.extension == '.txt':
+            return self.file.read(PREVIEW_CHARS * 4).decode('utf-8', errors='ignore')[:PREVIEW_CHARS]
+        elif self.extension in ['.xls', '.xlsx']:
+            max_rows = PREVIEW_ROWS if self.streaming else None
+            return load_excel_file(self.file, self.sheet_name, max_rows)
+        elif self.extension == '.csv':
+            return load_csv_file(self.file)
+        elif self.extension == '.txt':
+            return load_txt_file(self.file)
+        return None
+
+    def iter_chunks(self):
+        """
+        Iterate over the tabular content of the dataset in chunks.
+        Returns:
+            iterator: DataFrame chunks, a single one for files loaded in memory
+        """
+        if self.streaming and has_cached_table(self.content_hash, self.extension, self.sheet_name):
+            current_span().add(cache_hits=1)
+            yield from iter_cached_chunks(self.content_hash, self.extension, self.sheet_name)
+        elif self.streaming and self.extension == '.csv':
+            with self._lock:
+                yield from self._cache_chunks(iter_csv_chunks(self.file))
+        elif self.streaming and self.extension in ['.xls', '.xlsx']:
+            with self._lock:
+                yield from self._cache_chunks(iter_excel_chunks(self.file, self.sheet_name))
+        elif self.dataframe is not None:
+            yield self.dataframe
+
+    def _cache_chunks(self, chunks):
+        # Write the chunks to the columnar cache as they are parsed, the table
+        # is only published once the whole file went through
+        writer = ColumnarWriter(self.content_hash, self.extension, self.sheet_name)
+        try:
+            for chunk in chunks:
+                chunk.columns = chunk.columns.map(str)
+                writer.write(chunk)
+                yield chunk
+        except BaseException:
+            writer.abort()
+            raise
+        writer.commit()
+
+    def profile(self):
+        """
+        Compute the column profile of the dataset once and reuse it.
+        Returns:
+            dict: The profile, see file_processor.profiler.ChunkProfiler.result, with
+            the duplicate_rows and near_duplicate_rows counts, or None for non tabular files
+        """
+        with self._lock:
+            # Streamed files keep a preview of the same kind as their content, so
+            # a streamed text file has no DataFrame and no profile either
+            if self._profile is None and self.dataframe is not None:
+                self._profile = self._compute_profile()
+        return self._profile
+
+    def _compute_profile(self):
+        reads_upload = int(self.streaming and not has_cached_table(self.content_hash, self.extension, self.sheet_name))
+        with span("file.profile", file=self.label, streaming=self.streaming) as current:
+            # Duplicates are counted and the sample is drawn on the same pass over
+            # the chunks of streamed files, frames held in memory are counted at once
+            sampler = RowSampler()
+            if self.streaming:
+                with DuplicateCounter() as duplicates:
+                    def chunks():
+                        for chunk in self.iter_chunks():
+                            duplicates.update(chunk)
+                            sampler.update(chunk)
+                            yield chunk
+
+                    profile = profile_chunks(chunks(), max_workers=PROFILE_WORKERS)
+                    profile.update(duplicates.result())
+            else:
+                sampler.update(self.dataframe)
+                profile = profile_chunks([self.dataframe])
+                profile.update(count_duplicates(self.dataframe))
+
+            # Outliers and histograms are counted exactly with a second pass over
+            # the data; for streamed files it reads the columnar cache once warm
+            if self.streaming:
+                reads_upload += not has_cached_table(self.content_hash, self.extension, self.sheet_name)
+                refine_profile(self.iter_chunks(), profile)
+            else:
+                refine_profile([self.dataframe], profile)
+            self._sampler = sampler
+            # Streamed files are read in full by each pass that does not hit the
+            # columnar cache, the others are profiled in memory
+            current.set(rows=profile['row_count'], bytes_read=self.size * reads_upload)
+            return profile
+
+    def sample_text(self, n_rows=10, n_chars=1000):
+        """
+        Build a short textual sample of the dataset for the LLM prompts.
+        Tabular files show rows drawn across the whole file, covering the values
+        of a low-cardinality column, missing values and extreme values; text
+        files show excerpts spread over the text.
+        Args:
+            n_rows: Number of rows to show for tabular files
+            n_chars: Number of characters to show for text files
+        Returns:
+            str: The sample content, or None if the file could not be loaded
+        """
+        data = self.data
+        if isinstance(data, pd.DataFrame):
+            # The sample is drawn while profiling
+            self.profile()
+            sample, description = self._sampler.sample(n_rows)
+            return f"{description}\n{sample.to_string()}"
+        elif data is not None and self.streaming:
+            # Only the beginning of streamed text files is kept in memory, the
+            # excerpts are read over the whole file once for each length
+            if n_chars not in self._text_samples:
+                with self._lock:
+                    self._text_samples[n_chars] = sample_block_excerpts(iter_txt_chunks(self.file), n_chars)
+            return self._text_samples[n_chars]
+        elif data is not None:
+            return sample_text_excerpts(data, n_chars)
+        return None
+
+
+def _get_file_size(file):
+    # Streamlit uploads expose their size, other file objects are measured
+    size = getattr(file, 'size', None)
+    if size is None:
+        file.seek(0, os.SEEK_END)
+        size = file.tell()
+        file.seek(0)
+    return size
+
+
+def get_dataset(file, sheet_name=None):
+    """
+    Get the shared dataset handle of an uploaded file.
+    Handles are keyed by content hash, so the same upload is only parsed once
+    no matter how many task builders ask for it.
+    Args:
+        file: The uploaded file object from Streamlit
+        sheet_name: The sheet of an Excel file, defaults to the first sheet
+    Returns:
+        DatasetHandle: The dataset handle
+    """
+    content_hash = get_content_hash(file)
+    if sheet_name is None and get_file_extension(file.name) in ['.xls', '.xlsx']:
+        sheet_name = _get_sheet_names(file, content_hash)[0]
+    return _get_handle(file, content_hash, sheet_name)
+
+
+def get_datasets(file):
+    """
+    Get the dataset handles of every table in an uploaded file.
+    Excel workbooks give one handle per sheet, other files a single handle.
+    Args:
+        file: The uploaded file object from Streamlit
+    Returns:
+        list: The dataset handles
+    """
+    content_hash = get_content_hash(file)
+    if get_file_extension(file.name) not in ['.xls', '.xlsx']:
+        return [_get_handle(file, content_hash, None)]
+    return [_get_handle(file, content_hash, sheet_name)
+            for sheet_name in _get_sheet_names(file, content_hash)]
+
+
+def get_file_sample_text(file, n_rows=10, n_chars=1000):
+    """
+    Build a short textual sample of every table in an uploaded file.
+    Args:
+        file: The uploaded file object from Streamlit
+        n_rows: Number of rows to show per table
+        n_chars: Number of characters to show for text files
+    Returns:
+        str: The sample content, with one section per sheet for workbooks
+    """
+    datasets = get_datasets(file)
+    if len(datasets) == 1:
+        return datasets[0].sample_text(n_rows, n_chars)
+    return "\n\n".join(f"Sheet: {dataset.sheet_name}\n{dataset.sample_text(n_rows, n_chars)}"
+                       for dataset in datasets)
+
+
+def get_file_profile_text(file, compact=False):
+    """
+    Build the compact column profile of every table in an uploaded file.
+    Args:
+        file: The uploaded file object from Streamlit
+        compact: Only keep the type, completeness and distinct count of the columns
+    Returns:
+        str: The formatted profiles, or None if the file has no tabular content
+    """
+    sections = []
+    for dataset in get_datasets(file):
+        profile = dataset.profile()
+        if profile is None:
+            continue
+        if dataset.sheet_name is not None:
+            sections.append(f"Sheet: {dataset.sheet_name}\n{format_profile(profile, compact)}")
+        else:
+            sections.append(format_profile(profile, compact))
+    return "\n\n".join(sections) if sections else None
+
+
+def get_file_profiles(file):
+    """
+    Get the column profile of every table in an uploaded file.
+    Args:
+        file: The uploaded file object from Streamlit
+    Returns:
+        dict: The profiles keyed by sheet name, or by file name for non workbooks
+    """
+    profiles = {}
+    for dataset in get_datasets(file):
+        profile = dataset.profile()
+        if profile is not None:
+            profiles[dataset.sheet_name or dataset.file_name] = profile
+    return profiles
+
+
+def _get_entry(content_hash):
+    # Must be called with _datasets_lock held
+    entry = _datasets.get(content_hash)
+    if entry is None:
+        entry = {'handles': {}, 'sheet_names': None}
+        _datasets[content_hash] = entry
+
+        # Evict the least recently used files
+        while len(_datasets) > MAX_CACHED_DATASETS:
+            _datasets.popitem(last=False)
+    else:
+        _datasets.move_to_end(content_hash)
+    return entry
+
+
+def _get_sheet_names(file, content_hash):
+    with _datasets_lock:
+        sheet_names = _get_entry(content_hash)['sheet_names']
+    if sheet_names is None:
+        with get_file_lock(file):
+            sheet_names = get_excel_sheet_names(file)
+        with _datasets_lock:
+            _get_entry(content_hash)['sheet_names'] = sheet_names
+    return sheet_names
+
+
+def _get_handle(file, content_hash, sheet_name):
+    with _datasets_lock:
+        handles = _get_entry(content_hash)['handles']
+        handle = handles.get(sheet_name)
+        if handle is None or handle.extension != get_file_extension(file.name):
+            handle = DatasetHandle(file, content_hash, sheet_name)
+            handles[sheet_name] = handle
+    return handle
+
+
+def release_dataset(content_hash):
+    """
+    Drop the dataset handles of a file from the shared cache.
+    Args:
+        content_hash: The content hash of the file
+    """
+    with _datasets_lock:
+        _datasets.pop(content_hash, None)
@@ -1,22 +1,146 @@
+import io
+import os
 import pandas as pd
 import streamlit as st
 
+# Memory ceiling, in megabytes, of the chunks produced by the streaming loaders
+STREAMING_MEMORY_LIMIT_MB = int(os.getenv("DUKE_STREAMING_MEMORY_MB", "256"))
 
-def load_excel_file(file):
+# Number of rows parsed to estimate the in-memory size of a row
+ROW_SIZE_SAMPLE_ROWS = 1000
+
+
+def load_excel_file(file, sheet_name=None, max_rows=None):
     """
-    Load an Excel file into a pandas DataFrame
+    Load one sheet of an Excel file into a pandas DataFrame
     Args:
         file: The uploaded file object from Streamlit
+        sheet_name: The sheet to load, defaults to the first sheet
+        max_rows: Only load the first max_rows data rows if provided
     Returns:
         DataFrame: The loaded DataFrame
     """
     try:
-        return pd.read_excel(file)
+        if not _is_openxml_workbook(file):
+            # Legacy .xls workbooks are not supported by openpyxl
+            file.seek(0)
+            return pd.read_excel(file, sheet_name=sheet_name or 0, nrows=max_rows)
+
+        workbook = _open_workbook(file)
+        try:
+            sheet = workbook[sheet_name] if sheet_name else workbook.worksheets[0]
+            rows = sheet.iter_rows(values_only=True)
+            header = next(rows, None)
+            if header is None:
+                return pd.DataFrame()
+            return _rows_to_dataframe(header, _take_rows(rows, max_rows))
+        finally:
+            workbook.close()
     except Exception as e:
         st.error(f"Error loading Excel file: {e}")
         return None
 
 
+def get_excel_sheet_names(file):
+    """
+    Get the names of the sheets of an Excel file without loading their content
+    Args:
+        file: The uploaded file object from Streamlit
+    Returns:
+        list: The sheet names, in workbook order
+    """
+    if not _is_openxml_workbook(file):
+        file.seek(0)
+        return list(pd.ExcelFile(file).sheet_names)
+
+    workbook = _open_workbook(file)
+    try:
+        return list(workbook.sheetnames)
+    finally:
+        workbook.close()
+
+
+def iter_excel_chunks(file, sheet_name=None, chunk_rows=None):
+    """
+    Stream one sheet of an Excel file as a sequence of DataFrame chunks
+    Args:
+        file: The uploaded file object from Streamlit
+        sheet_name: The sheet to stream, defaults to the first sheet
+        chunk_rows: The number of rows per chunk, defaults to ROW_SIZE_SAMPLE_ROWS * 10
+    Returns:
+        iterator: The DataFrame chunks, in sheet order
+    """
+    if chunk_rows is None:
+        chunk_rows = ROW_SIZE_SAMPLE_ROWS * 10
+
+    if not _is_openxml_workbook(file):
+        # Legacy .xls workbooks can only be read whole
+        file.seek(0)
+        df = pd.read_excel(file, sheet_name=sheet_name or 0)
+        for start in range(0, len(df), chunk_rows):
+            yield df.iloc[start:start + chunk_rows]
+        return
+
+    workbook = _open_workbook(file)
+    try:
+        sheet = workbook[sheet_name] if sheet_name else workbook.worksheets[0]
+        rows = sheet.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        while True:
+            batch = _take_rows(rows, chunk_rows)
+            if not batch:
+                break
+            yield _rows_to_dataframe(header, batch)
+    finally:
+        workbook.close()
+
+
+def _is_openxml_workbook(file):
+    # .xlsx files are zip archives, legacy .xls files are OLE2 documents
+    file.seek(0)
+    signature = file.read(4)
+    file.seek(0)
+    return signature == b'PK\x03\x04'
+
+
+def _open_workbook(file):
+    from openpyxl import load_workbook
+
+    # The read-only mode streams the rows instead of building the full object model
+    file.seek(0)
+    return load_workbook(file, read_only=True, data_only=True)
+
+
+def _take_rows(rows, max_rows):
+    # Skip fully empty rows, openpyxl reports them for formatted but blank cells
+    batch = []
+    for row in rows:
+        if all(value is None for value in row):
+            continue
+        batch.append(row)
+        if max_rows is not None and len(batch) >= max_rows:
+            break
+    return batch
+
+
+def _rows_to_dataframe(header, rows):
+    # Name the columns the same way pd.read_excel does
+    columns = []
+    for index, name in enumerate(header):
+        name = f"Unnamed: {index}" if name is None else name
+        candidate, suffix = name, 1
+        while candidate in columns:
+            candidate = f"{name}.{suffix}"
+            suffix += 1
+        columns.append(candidate)
+
+    width = len(columns)
+    rows = [tuple(row[:width]) + (None,) * (width - len(row)) for row in rows]
+    return pd.DataFrame(rows, columns=columns).infer_objects()
+
+
 def load_csv_file(file, delimiter=','):
     """
     Load a CSV file into a pandas DataFrame
@@ -43,15 +167,84 @@ def load_txt_file(file, delimiter=None):
         str or DataFrame: The content of the file
     """
     try:
-        # First try to read as text
-        content = file.read().decode('utf-8')
-
-        # If delimiter is provided, try to parse as CSV
+        # If delimiter is provided, parse the byte stream directly as CSV
+        # instead of decoding the whole file into a string first
         if delimiter:
-            import io
-            return pd.read_csv(io.StringIO(content), delimiter=delimiter)
+            return pd.read_csv(file, delimiter=delimiter, encoding='utf-8')
 
-        return content
+        return file.read().decode('utf-8')
     except Exception as e:
         st.error(f"Error loading text file: {e}")
-        return None
\ No newline at end of file
+        return None
+
+
+def estimate_chunk_rows(file, delimiter=',', memory_limit_mb=None):
+    """
+    Estimate how many rows of a delimited file fit in the streaming memory ceiling
+    Args:
+        file: The uploaded file object from Streamlit
+        delimiter: The delimiter used in the file, defaults to ','
+        memory_limit_mb: The memory ceiling in megabytes, defaults to STREAMING_MEMORY_LIMIT_MB
+    Returns:
+        int: The number of rows per chunk
+    """
+    if memory_limit_mb is None:
+        memory_limit_mb = STREAMING_MEMORY_LIMIT_MB
+
+    file.seek(0)
+    sample = pd.read_csv(file, delimiter=delimiter, nrows=ROW_SIZE_SAMPLE_ROWS)
+    file.seek(0)
+
+    if len(sample) == 0:
+        return ROW_SIZE_SAMPLE_ROWS
+
+    # Keep half of the ceiling for the parser buffers and the profilers
+    row_size = max(sample.memory_usage(deep=True).sum() / len(sample), 1)
+    return max(int(memory_limit_mb * 1024 * 1024 / 2 / row_size), ROW_SIZE_SAMPLE_ROWS)
+
+
+def iter_csv_chunks(file, delimiter=',', chunk_rows=None, memory_limit_mb=None):
+    """
+    Stream a delimited file as a sequence of DataFrame chunks
+    Args:
+        file: The uploaded file object from Streamlit
+        delimiter: The delimiter used in the file, defaults to ','
+        chunk_rows: The number of rows per chunk, estimated from memory_limit_mb if not provided
+        memory_limit_mb: The memory ceiling in megabytes of a single chunk
+    Returns:
+        iterator: The DataFrame chunks, in file order
+    """
+    if chunk_rows is None:
+        chunk_rows = estimate_chunk_rows(file, delimiter, memory_limit_mb)
+
+    file.seek(0)
+    with pd.read_csv(file, delimiter=delimiter, chunksize=chunk_rows, encoding='utf-8') as reader:
+        for chunk in reader:
+            yield chunk
+
+
+def iter_txt_chunks(file, chunk_chars=None):
+    """
+    Stream a text file as a sequence of decoded string blocks
+    Args:
+        file: The uploaded file object from Streamlit
+        chunk_chars: The number of characters per block, derived from STREAMING_MEMORY_LIMIT_MB if not provided
+    Returns:
+        iterator: The text blocks, in file order
+    """
+    if chunk_chars is None:
+        # A Python str can use up to 4 bytes per character
+        chunk_chars = STREAMING_MEMORY_LIMIT_MB * 1024 * 1024 // 4
+
+    file.seek(0)
+    # Undecodable bytes are dropped, as for the preview of streamed text files
+    reader = io.TextIOWrapper(file, encoding='utf-8', errors='ignore')
+    try:
+        while True:
+            block = reader.read(chunk_chars)
+            if not block:
+                break
+            yield block
+    finally:
+        # Detach so that closing the wrapper does not close the upload
+        reader.detach()
\ No newline at end of file
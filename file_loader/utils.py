@@ -1,3 +1,20 @@
+import threading
+import weakref
+from collections import OrderedDict
+
+# Number of content hashes remembered by Streamlit upload
+MAX_REMEMBERED_HASHES = 256
+
+# Content hashes keyed by (Streamlit file ID, size): every rerun gets new file
+# objects for the same upload, which are not hashed again
+_hashes_by_upload = OrderedDict()
+
+# Content hashes and stream locks of the file objects themselves
+_hashes_by_object = weakref.WeakKeyDictionary()
+_file_locks = weakref.WeakKeyDictionary()
+_hashes_lock = threading.Lock()
+
+
 def get_file_extension(file_name):
     """
     Get the extension of a file
@@ -49,4 +66,84 @@ def detect_delimiter(sample_text):
         except:
             continue
 
-    return max_delimiter
\ No newline at end of file
+    return max_delimiter
+
+def get_cache_dir(*parts):
+    """
+    Get a directory of the local cache, creating it if needed
+    Args:
+        *parts: The path of the directory inside the cache root
+    Returns:
+        str: The path of the directory
+    """
+    import os
+    root = os.getenv("DUKE_CACHE_DIR", ".duke_cache")
+    path = os.path.join(root, *parts)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def compute_content_hash(file, chunk_size=1024 * 1024):
+    """
+    Compute a SHA-256 hash of the content of an uploaded file.
+    The file is read in blocks and its read position is reset afterwards.
+    Args:
+        file: The uploaded file object from Streamlit
+        chunk_size: The size of the blocks read, in bytes
+    Returns:
+        str: The hexadecimal content hash
+    """
+    import hashlib
+    hash_obj = hashlib.sha256()
+    file.seek(0)
+    while True:
+        block = file.read(chunk_size)
+        if not block:
+            break
+        hash_obj.update(block)
+    file.seek(0)
+    return hash_obj.hexdigest()
+
+
+def get_file_lock(file):
+    """
+    Get the lock serializing the reads of an uploaded file, whose read
+    position is shared by every reader of the object.
+    Args:
+        file: The uploaded file object from Streamlit
+    Returns:
+        RLock: The lock of the file object
+    """
+    with _hashes_lock:
+        lock = _file_locks.get(file)
+        if lock is None:
+            lock = _file_locks[file] = threading.RLock()
+        return lock
+
+
+def get_content_hash(file):
+    """
+    Get the content hash of an uploaded file, see compute_content_hash.
+    The file is only read the first time: the hash is remembered for the file
+    object, and for the Streamlit upload across reruns.
+    Args:
+        file: The uploaded file object from Streamlit
+    Returns:
+        str: The hexadecimal content hash
+    """
+    file_id = getattr(file, 'file_id', None)
+    upload_key = (file_id, getattr(file, 'size', None)) if file_id is not None else None
+    with get_file_lock(file):
+        with _hashes_lock:
+            content_hash = _hashes_by_object.get(file) or _hashes_by_upload.get(upload_key)
+        if content_hash is None:
+            content_hash = compute_content_hash(file)
+
+        with _hashes_lock:
+            _hashes_by_object[file] = content_hash
+            if upload_key is not None:
+                _hashes_by_upload[upload_key] = content_hash
+                _hashes_by_upload.move_to_end(upload_key)
+                while len(_hashes_by_upload) > MAX_REMEMBERED_HASHES:
+                    _hashes_by_upload.popitem(last=False)
+    return content_hash
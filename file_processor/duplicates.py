@@ -0,0 +1,217 @@
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+# Memory budget, in megabytes, of the row hashes buffered before spilling to disk
+DUPLICATE_MEMORY_LIMIT_MB = int(os.getenv("DUKE_DUPLICATE_MEMORY_MB", "64"))
+
+# Number of hash partitions, each one is counted separately at the end
+DUPLICATE_PARTITION_BITS = 6
+
+
+def hash_rows(chunk):
+    """
+    Hash every row of a DataFrame to a 64-bit integer in a vectorized way
+    Args:
+        chunk: A DataFrame chunk
+    Returns:
+        ndarray: The uint64 row hashes
+    """
+    return pd.util.hash_pandas_object(chunk, index=False).to_numpy(dtype=np.uint64)
+
+
+def normalize_rows(chunk):
+    """
+    Normalize the values of a DataFrame so that rows differing only by case,
+    surrounding whitespace, or float noise share the same key. Only the text
+    and float columns are rewritten, with vectorized string methods
+    Args:
+        chunk: A DataFrame chunk
+    Returns:
+        DataFrame: The normalized chunk
+    """
+    normalized = {}
+    for column, dtype in chunk.dtypes.items():
+        series = chunk[column]
+        if pd.api.types.is_float_dtype(dtype):
+            series = series.round(6)
+        elif pd.api.types.is_object_dtype(dtype):
+            series = series.astype('string').str.strip().str.lower()
+        elif pd.api.types.is_string_dtype(dtype):
+            series = series.str.strip().str.lower()
+        normalized[column] = series
+    return pd.DataFrame(normalized, index=chunk.index)
+
+
+def count_duplicates(dataframe):
+    """
+    Count the exact and near duplicate rows of a DataFrame held in memory
+    Args:
+        dataframe: The DataFrame
+    Returns:
+        dict: The duplicate_rows and near_duplicate_rows counts
+    """
+    exact = int(dataframe.duplicated().sum())
+    normalized = int(normalize_rows(dataframe).duplicated().sum())
+    return {
+        'duplicate_rows': exact,
+        'near_duplicate_rows': max(normalized - exact, 0),
+    }
+
+
+class DuplicateDetector:
+    """
+    Count duplicate rows from their 64-bit hashes.
+    Hashes are bucketed in partitions by their top bits; when the buffered
+    hashes exceed the memory budget the largest partitions are appended to
+    files on disk. Duplicates are then counted one partition at a time, so the
+    peak memory is the budget plus the largest partition. The spilled
+    partitions are removed by close, on exiting a with block, or when the
+    detector is garbage collected.
+    """
+
+    def __init__(self, memory_limit_mb=None, partition_bits=DUPLICATE_PARTITION_BITS):
+        if memory_limit_mb is None:
+            memory_limit_mb = DUPLICATE_MEMORY_LIMIT_MB
+        self.memory_limit = memory_limit_mb * 1024 * 1024
+        self.partition_bits = partition_bits
+        self.buffers = [[] for _ in range(1 << partition_bits)]
+        self.buffered_bytes = 0
+        self._spill_dir = None
+        self.spilled = set()
+        self.row_count = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @property
+    def spill_dir(self):
+        """
+        The directory of the spilled partitions, None until the first spill.
+        """
+        return self._spill_dir.name if self._spill_dir is not None else None
+
+    def update(self, hashes):
+        """
+        Add row hashes to the detector
+        Args:
+            hashes: The uint64 row hashes, see hash_rows
+        """
+        if len(hashes) == 0:
+            return
+        partitions = (hashes >> np.uint64(64 - self.partition_bits)).astype(np.int64)
+        order = np.argsort(partitions, kind='stable')
+        hashes, partitions = hashes[order], partitions[order]
+        bounds = np.searchsorted(partitions, np.arange(len(self.buffers) + 1))
+        for partition in range(len(self.buffers)):
+            start, end = bounds[partition], bounds[partition + 1]
+            if end > start:
+                self.buffers[partition].append(hashes[start:end])
+
+        self.buffered_bytes += hashes.nbytes
+        self.row_count += len(hashes)
+        if self.buffered_bytes > self.memory_limit:
+            self._spill()
+
+    def _partition_path(self, partition):
+        return os.path.join(self.spill_dir, f"partition_{partition}.bin")
+
+    def _spill(self):
+        if self._spill_dir is None:
+            # Cleaned up with the detector even if close is never reached
+            self._spill_dir = tempfile.TemporaryDirectory(prefix="duke_duplicates_")
+
+        # Spill the largest partitions first until half of the budget is free
+        sizes = [sum(array.nbytes for array in buffer) for buffer in self.buffers]
+        for partition in np.argsort(sizes)[::-1]:
+            if self.buffered_bytes <= self.memory_limit / 2:
+                break
+            with open(self._partition_path(partition), 'ab') as file:
+                for array in self.buffers[partition]:
+                    array.tofile(file)
+            self.spilled.add(int(partition))
+            self.buffered_bytes -= sizes[partition]
+            self.buffers[partition] = []
+
+    def count(self):
+        """
+        Count the rows whose hash was already seen
+        Returns:
+            int: The number of duplicate rows
+        """
+        duplicates = 0
+        for partition, buffer in enumerate(self.buffers):
+            arrays = list(buffer)
+            if partition in self.spilled:
+                arrays.append(np.fromfile(self._partition_path(partition), dtype=np.uint64))
+            if not arrays:
+                continue
+            hashes = np.concatenate(arrays)
+            duplicates += len(hashes) - len(np.unique(hashes))
+        return duplicates
+
+    def close(self):
+        """
+        Remove the spilled partitions from disk
+        """
+        if self._spill_dir is not None:
+            self._spill_dir.cleanup()
+            self._spill_dir = None
+            self.spilled = set()
+
+
+class DuplicateCounter:
+    """
+    Count exact and near duplicate rows over a stream of DataFrame chunks.
+    Near duplicates are rows that only match once normalized, see normalize_rows.
+    Use it in a with block so the spilled partitions are removed on errors too.
+    """
+
+    def __init__(self, memory_limit_mb=None):
+        if memory_limit_mb is None:
+            memory_limit_mb = DUPLICATE_MEMORY_LIMIT_MB
+        self.exact = DuplicateDetector(memory_limit_mb / 2)
+        self.normalized = DuplicateDetector(memory_limit_mb / 2)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def update(self, chunk):
+        """
+        Add a chunk to the counts
+        Args:
+            chunk: A DataFrame chunk
+        """
+        self.exact.update(hash_rows(chunk))
+        self.normalized.update(hash_rows(normalize_rows(chunk)))
+
+    def result(self):
+        """
+        Count the duplicates and release the spilled partitions
+        Returns:
+            dict: The duplicate_rows and near_duplicate_rows counts
+        """
+        try:
+            exact = self.exact.count()
+            normalized = self.normalized.count()
+        finally:
+            self.close()
+        return {
+            'duplicate_rows': exact,
+            'near_duplicate_rows': max(normalized - exact, 0),
+        }
+
+    def close(self):
+        """
+        Remove the spilled partitions from disk
+        """
+        self.exact.close()
+        self.normalized.close()
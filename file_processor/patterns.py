@@ -0,0 +1,104 @@
+import re
+
+import pandas as pd
+
+# Maximum length of a value pattern, longer patterns are truncated
+PATTERN_MAX_LENGTH = 30
+
+# Regular expressions of the value classes recognized in text columns, the
+# first class matching a value wins
+VALUE_CLASSES = {
+    'blank': r'\s*',
+    'boolean': r'(?i:true|false|yes|no|oui|non|vrai|faux|y|n)',
+    'integer': r'[+-]?\d+',
+    'decimal': r'[+-]?(?:\d+[.,]\d*|[.,]\d+)(?:[eE][+-]?\d+)?',
+    'date': r'\d{4}-\d{2}-\d{2}|\d{1,2}[/.-]\d{1,2}[/.-]\d{2,4}',
+    'datetime': r'\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}(?::\d{2}(?:\.\d+)?)?(?:Z|[+-]\d{2}:?\d{2})?',
+    'time': r'\d{1,2}:\d{2}(?::\d{2})?',
+    'email': r'[^@\s]+@[^@\s]+\.[A-Za-z]{2,}',
+    'url': r'(?i:https?://|www\.)\S+',
+    'uuid': r'[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}',
+    'phone': r'\+?\d[\d .()-]{7,}\d',
+    'percentage': r'[+-]?\d+(?:[.,]\d+)?\s?%',
+    'currency': r'[$€£]\s?[+-]?\d[\d\s,.]*|[+-]?\d[\d\s,.]*\s?[$€£]',
+}
+
+# The value classes as a single expression: the alternatives are tried in
+# order, so the first class matching the whole value is the named group matched
+_VALUE_CLASS = re.compile("|".join(f"(?P<{name}>{pattern})" for name, pattern in VALUE_CLASSES.items()))
+
+_LETTERS = re.compile(r'[^\W\d_]+')
+_DIGIT = re.compile(r'\d')
+_SPACES = re.compile(r'\s+')
+
+# Share of the non-blank values that must belong to a class to infer it as the column type
+INFERENCE_THRESHOLD = 0.95
+
+
+def value_patterns(values):
+    """
+    Reduce text values to their shape: runs of letters become 'A', each digit
+    becomes '9' and the other characters are kept, e.g. 'AB-1234' gives 'A-9999'
+    Args:
+        values: A Series of values
+    Returns:
+        Series: The patterns, with the same index
+    """
+    return values.astype(str).map(_value_pattern)
+
+
+def _value_pattern(text):
+    pattern = _SPACES.sub(' ', _DIGIT.sub('9', _LETTERS.sub('A', text)))
+    return pattern[:PATTERN_MAX_LENGTH]
+
+
+def classify_values(values, counts):
+    """
+    Count how many values belong to each value class
+    Args:
+        values: A Series of distinct text values
+        counts: The number of occurrences of each value
+    Returns:
+        dict: The number of occurrences per class, values matching no class are not counted
+    """
+    classes = {}
+    for value, count in zip(values, counts):
+        match = _VALUE_CLASS.fullmatch(str(value))
+        if match is not None and count:
+            classes[match.lastgroup] = classes.get(match.lastgroup, 0) + count
+    return classes
+
+
+def infer_type(dtype, classes, non_null):
+    """
+    Infer the semantic type of a column
+    Args:
+        dtype: The pandas dtype name of the column
+        classes: The number of values per value class, see classify_values
+        non_null: The number of non-null values
+    Returns:
+        tuple: (the inferred type, the share of the values matching it)
+    """
+    kind = dtype.split('[')[0]
+    if kind.startswith(('int', 'uint', 'Int', 'UInt')):
+        return 'integer', 1.0
+    if kind.startswith(('float', 'Float')):
+        return 'decimal', 1.0
+    if kind in ('bool', 'boolean'):
+        return 'boolean', 1.0
+    if kind.startswith('datetime'):
+        return 'datetime', 1.0
+
+    filled = non_null - classes.get('blank', 0)
+    if filled <= 0:
+        return 'empty', 1.0
+    # Integers are also valid decimals
+    candidates = {name: count for name, count in classes.items() if name != 'blank'}
+    if 'integer' in candidates and 'decimal' in candidates:
+        candidates['decimal'] += candidates['integer']
+    if candidates:
+        name, count = max(candidates.items(), key=lambda item: item[1])
+        share = count / filled
+        if share >= INFERENCE_THRESHOLD:
+            return name, share
+    return 'text', 1.0
@@ -0,0 +1,591 @@
+import numpy as np
+import pandas as pd
+
+from file_processor.sketches import HyperLogLog, KLLSketch, CountMinSketch, hash_values, update_sketches
+from file_processor.patterns import value_patterns, classify_values, infer_type
+
+# Number of most frequent values reported per column
+TOP_K = 5
+
+# Number of sample values reported per column
+SAMPLE_VALUES = 3
+
+# Number of candidate frequent values kept per column between chunks
+TOP_K_CANDIDATES = TOP_K * 20
+
+# Number of distinct values tracked exactly per column before switching to the
+# HyperLogLog and count-min estimates, which keep the memory per column constant
+DISTINCT_EXACT_LIMIT = 1000
+
+# Chunks with more columns only use the HyperLogLog and count-min estimates,
+# counting the distinct values of every column exactly costs too much on wide tables
+DISTINCT_EXACT_MAX_COLUMNS = 50
+
+# Quantiles reported for numeric columns
+QUANTILES = {'p01': 0.01, 'p25': 0.25, 'p50': 0.5, 'p75': 0.75, 'p99': 0.99}
+
+# Number of value patterns tracked per text column, the others are counted together
+PATTERN_LIMIT = 100
+
+# Number of distinct values of a text column whose pattern and class are
+# detected in each chunk, the others are estimated from a sample of them
+PATTERN_SAMPLE_VALUES = 1000
+
+# Number of value patterns reported per text column
+TOP_PATTERNS = 5
+
+# Outlier rules of the numeric columns: Tukey fences and absolute z-score
+IQR_FACTOR = 1.5
+ZSCORE_THRESHOLD = 3.0
+
+# Number of equal-width bins of the numeric distributions
+HISTOGRAM_BINS = 10
+
+# Key under which the patterns beyond PATTERN_LIMIT are counted
+OTHER_PATTERNS = '...'
+
+
+def merge_dtypes(left, right):
+    """
+    Merge the dtypes observed for the same column in two chunks
+    Args:
+        left: The first dtype name
+        right: The second dtype name
+    Returns:
+        str: The dtype name able to hold both
+    """
+    if left is None:
+        return right
+    if right is None or left == right:
+        return left
+    try:
+        left_dtype, right_dtype = np.dtype(left), np.dtype(right)
+    except TypeError:
+        return 'object'
+    # Only numeric types can be promoted, anything else becomes a generic object
+    if left_dtype.kind in 'biufc' and right_dtype.kind in 'biufc':
+        return str(np.result_type(left_dtype, right_dtype))
+    return 'object'
+
+
+def to_builtin(value):
+    """
+    Convert a pandas or numpy scalar into a JSON serializable Python value
+    Args:
+        value: The value to convert
+    Returns:
+        The converted value
+    """
+    if value is None:
+        return None
+    if isinstance(value, (pd.Timestamp, np.datetime64)):
+        return None if pd.isna(value) else pd.Timestamp(value).isoformat()
+    if isinstance(value, pd.Timedelta):
+        return str(value)
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and np.isnan(value):
+        return None
+    if isinstance(value, (str, int, float, bool)):
+        return value
+    return str(value)
+
+
+class ChunkProfiler:
+    """
+    Incremental column profiler fed with DataFrame chunks.
+    Each update computes the statistics of all the columns of the chunk with
+    a handful of vectorized operations: the distinct values of the columns
+    sharing a numpy dtype are counted with one sort, and all the columns feed
+    their sketches in one update. Only the other columns, such as text, get a
+    value_counts each. The partial results are merged, so a file can be
+    profiled in a single pass whatever its size.
+    Distinct counts, quantiles and frequent values are kept in mergeable
+    sketches, so the memory per column is constant and profilers built on
+    different chunks or in different processes can be merged.
+    """
+
+    def __init__(self):
+        self.row_count = 0
+        self.columns = []
+        self.dtypes = {}
+        self.non_null = {}
+        self.minimums = {}
+        self.maximums = {}
+        # Running count, mean and sum of squared deviations of numeric columns
+        self.moments = {}
+        self.frequencies = {}
+        # Exact value counts of low cardinality columns, None once the limit is reached
+        self.distinct_values = {}
+        self.cardinalities = {}
+        self.quantile_sketches = {}
+        self.samples = {}
+        # Value pattern and value class counts of the text columns
+        self.patterns = {}
+        self.value_classes = {}
+        # Text columns whose patterns and classes were estimated from a sample
+        self.sampled_patterns = set()
+
+    def _add_column(self, column, dtype):
+        if column not in self.non_null:
+            self.columns.append(column)
+            self.non_null[column] = 0
+            self.frequencies[column] = CountMinSketch(max_candidates=TOP_K_CANDIDATES)
+            self.distinct_values[column] = {}
+            self.cardinalities[column] = HyperLogLog()
+            self.samples[column] = []
+        self.dtypes[column] = merge_dtypes(self.dtypes.get(column), dtype)
+
+    def update(self, chunk):
+        """
+        Add a chunk to the profile
+        Args:
+            chunk: A DataFrame chunk
+        """
+        for column, dtype in chunk.dtypes.items():
+            self._add_column(column, str(dtype))
+
+        # Null counts of every column at once
+        non_null = chunk.notna().sum()
+        for column in chunk.columns:
+            self.non_null[column] += int(non_null[column])
+
+        # Range of the numeric and datetime columns, moments of the numeric ones
+        ordered = chunk.select_dtypes(include=['number', 'datetime'], exclude=['bool'])
+        if not ordered.empty:
+            minimums, maximums = ordered.min(), ordered.max()
+            for column in ordered.columns:
+                self._update_range(column, minimums[column], maximums[column])
+        numeric = chunk.select_dtypes(include='number', exclude=['bool'])
+        if not numeric.empty:
+            counts, means, variances = numeric.count(), numeric.mean(), numeric.var(ddof=0)
+            values = numeric.to_numpy(dtype=np.float64, na_value=np.nan)
+            for position, column in enumerate(numeric.columns):
+                count = int(counts[column])
+                self._update_moments(column, count, means[column], variances[column] * count)
+                if column not in self.quantile_sketches:
+                    self.quantile_sketches[column] = KLLSketch()
+                self.quantile_sketches[column].update(values[:, position])
+
+        # Frequencies feed the distinct count and the frequent values sketches,
+        # so only the distinct values of the chunk are hashed; the patterns and
+        # classes of the text columns are computed on the distinct values too
+        exact = len(chunk.columns) <= DISTINCT_EXACT_MAX_COLUMNS
+        text_columns = set(chunk.select_dtypes(include=['object', 'string']).columns)
+        for columns, codes, values, counts in _distinct_value_counts(chunk):
+            hashes = hash_values(values)
+            update_sketches([self.cardinalities[column] for column in columns],
+                            [self.frequencies[column] for column in columns], codes, values, hashes, counts)
+            bounds = np.searchsorted(codes, np.arange(len(columns) + 1))
+            for position, column in enumerate(columns):
+                start, end = bounds[position], bounds[position + 1]
+                if not exact:
+                    self.distinct_values[column] = None
+                elif self.distinct_values[column] is not None:
+                    self._update_distinct(column, zip(values[start:end], counts[start:end]))
+                if column in text_columns and end > start:
+                    self._update_text(column, pd.Series(counts[start:end], index=values[start:end]))
+
+        # Sample values are taken from the first rows where they are present,
+        # the first rows of the chunk are enough for most columns
+        missing = [column for column in chunk.columns if len(self.samples[column]) < SAMPLE_VALUES]
+        if missing:
+            head = chunk[missing].head(SAMPLE_VALUES * 10)
+            present = head.notna().to_numpy()
+            for position, column in enumerate(missing):
+                values = head[column].to_numpy()[present[:, position]]
+                if len(values) < SAMPLE_VALUES - len(self.samples[column]) and len(chunk) > len(head):
+                    values = chunk[column].dropna().to_numpy()
+                self.samples[column].extend(to_builtin(value) for value in
+                                            values[:SAMPLE_VALUES - len(self.samples[column])])
+
+        self.row_count += len(chunk)
+
+    def _update_range(self, column, low, high):
+        if pd.isna(low):
+            return
+        current = self.minimums.get(column)
+        self.minimums[column] = low if current is None else min(current, low)
+        current = self.maximums.get(column)
+        self.maximums[column] = high if current is None else max(current, high)
+
+    def _update_moments(self, column, count, mean, m2):
+        # Chan's parallel algorithm for combining means and variances
+        if count == 0:
+            return
+        current = self.moments.get(column)
+        if current is None:
+            self.moments[column] = (count, float(mean), float(m2))
+            return
+        total_count, total_mean, total_m2 = current
+        combined = total_count + count
+        delta = mean - total_mean
+        self.moments[column] = (
+            combined,
+            total_mean + delta * count / combined,
+            total_m2 + m2 + delta * delta * total_count * count / combined,
+        )
+
+    def _update_distinct(self, column, items):
+        # Low cardinalities are also counted exactly, until the limit is reached
+        distinct = self.distinct_values[column]
+        if distinct is None:
+            return
+        for value, count in items:
+            distinct[value] = distinct.get(value, 0) + int(count)
+            if len(distinct) > DISTINCT_EXACT_LIMIT:
+                self.distinct_values[column] = None
+                return
+
+    def _update_text(self, column, counts):
+        # The counts are sorted by frequency: the most frequent values are all
+        # classified, the others through a random sample whose occurrences are
+        # scaled up to the values it stands for
+        values, occurrences = counts.index, counts.to_numpy(dtype=np.float64)
+        if len(counts) > PATTERN_SAMPLE_VALUES:
+            head = PATTERN_SAMPLE_VALUES // 2
+            tail = np.random.default_rng(0).choice(len(counts) - head, PATTERN_SAMPLE_VALUES - head, replace=False)
+            positions = np.concatenate([np.arange(head), np.sort(tail) + head])
+            scale = occurrences[head:].sum() / occurrences[positions[head:]].sum()
+            values, occurrences = values[positions], occurrences[positions]
+            occurrences[head:] *= scale
+            self.sampled_patterns.add(column)
+
+        pattern_counts = {}
+        for pattern, count in zip(value_patterns(pd.Series(values, dtype=object)), occurrences):
+            pattern_counts[pattern] = pattern_counts.get(pattern, 0) + count
+        self._merge_patterns(column, pattern_counts.items())
+        self._merge_classes(column, classify_values(values, occurrences).items())
+
+    def _merge_patterns(self, column, items):
+        patterns = self.patterns.setdefault(column, {})
+        for pattern, count in items:
+            if pattern not in patterns and len(patterns) >= PATTERN_LIMIT:
+                pattern = OTHER_PATTERNS
+            patterns[pattern] = patterns.get(pattern, 0) + int(round(count))
+
+    def _merge_classes(self, column, items):
+        classes = self.value_classes.setdefault(column, {})
+        for name, count in items:
+            classes[name] = classes.get(name, 0) + int(round(count))
+
+    def merge(self, other):
+        """
+        Merge the profile of another part of the same file
+        Args:
+            other: Another ChunkProfiler
+        """
+        for column in other.columns:
+            self._add_column(column, other.dtypes[column])
+            self.non_null[column] += other.non_null[column]
+
+            if column in other.minimums:
+                self._update_range(column, other.minimums[column], other.maximums[column])
+            if column in other.moments:
+                self._update_moments(column, *other.moments[column])
+
+            if column in other.quantile_sketches:
+                if column not in self.quantile_sketches:
+                    self.quantile_sketches[column] = KLLSketch()
+                self.quantile_sketches[column].merge(other.quantile_sketches[column])
+
+            if column in other.patterns:
+                self._merge_patterns(column, other.patterns[column].items())
+                self._merge_classes(column, other.value_classes[column].items())
+            if column in other.sampled_patterns:
+                self.sampled_patterns.add(column)
+
+            self.frequencies[column].merge(other.frequencies[column])
+            self.cardinalities[column].merge(other.cardinalities[column])
+            if other.distinct_values[column] is None:
+                self.distinct_values[column] = None
+            else:
+                self._update_distinct(column, other.distinct_values[column].items())
+
+            missing = SAMPLE_VALUES - len(self.samples[column])
+            if missing > 0:
+                self.samples[column].extend(other.samples[column][:missing])
+        self.row_count += other.row_count
+
+    def _column_result(self, column):
+        non_null = self.non_null[column]
+        result = {
+            'name': to_builtin(column),
+            'dtype': self.dtypes[column],
+            'non_null': non_null,
+            'null_count': self.row_count - non_null,
+            'completeness': round(non_null / self.row_count, 4) if self.row_count else None,
+        }
+
+        classes = self.value_classes.get(column, {})
+        result['inferred_type'], share = infer_type(self.dtypes[column], classes, non_null)
+        result['inferred_type_share'] = round(share, 4)
+        if column in self.patterns:
+            result['value_classes'] = dict(classes)
+            top = sorted(self.patterns[column].items(), key=lambda item: item[1], reverse=True)[:TOP_PATTERNS]
+            result['patterns'] = [[pattern, count] for pattern, count in top]
+            result['patterns_is_estimate'] = column in self.sampled_patterns
+
+        if self.distinct_values[column] is None:
+            result['distinct'] = self.cardinalities[column].estimate()
+            result['distinct_is_estimate'] = True
+        else:
+            result['distinct'] = len(self.distinct_values[column])
+            result['distinct_is_estimate'] = False
+
+        if column in self.minimums:
+            result['min'] = to_builtin(self.minimums[column])
+            result['max'] = to_builtin(self.maximums[column])
+        if column in self.moments:
+            count, mean, m2 = self.moments[column]
+            result['mean'] = to_builtin(mean)
+            result['std'] = to_builtin(np.sqrt(m2 / (count - 1))) if count > 1 else None
+        if column in self.quantile_sketches:
+            sketch = self.quantile_sketches[column]
+            values = sketch.quantiles(list(QUANTILES.values()))
+            result['quantiles'] = {name: to_builtin(value) for name, value in zip(QUANTILES, values)}
+            # Exact until the sketch had to compact its values
+            result['quantiles_is_estimate'] = sketch.retained() < sketch.count
+            if sketch.count:
+                result['outliers'] = self._outliers(sketch, result)
+                result['histogram'] = self._histogram(sketch, result)
+
+        if self.distinct_values[column] is None:
+            top = self.frequencies[column].heavy_hitters(TOP_K)
+        else:
+            top = sorted(self.distinct_values[column].items(), key=lambda item: item[1], reverse=True)[:TOP_K]
+        result['top_values'] = [[to_builtin(value), count] for value, count in top]
+        result['sample_values'] = self.samples[column]
+        return result
+
+    def _outliers(self, sketch, result):
+        # Counts estimated from the quantile sketch, see refine_profile for exact counts
+        bounds = outlier_bounds(result)
+        outliers = {'iqr_bounds': list(bounds['iqr']), 'is_estimate': True}
+        outliers['iqr'] = sketch.count_outside(*bounds['iqr'])
+        if 'zscore' in bounds:
+            outliers['zscore_bounds'] = list(bounds['zscore'])
+            outliers['zscore'] = sketch.count_outside(*bounds['zscore'])
+        return outliers
+
+    def _histogram(self, sketch, result):
+        low, high = float(result['min']), float(result['max'])
+        if low == high:
+            return {'edges': [low, high], 'counts': [sketch.count]}
+        edges = np.linspace(low, high, HISTOGRAM_BINS + 1)
+        return {'edges': [float(edge) for edge in edges], 'counts': sketch.histogram(edges)}
+
+    def result(self):
+        """
+        Get the profile accumulated so far
+        Returns:
+            dict: The row count, column count, missing value count and per-column statistics
+        """
+        columns = [self._column_result(column) for column in self.columns]
+        return {
+            'row_count': self.row_count,
+            'column_count': len(columns),
+            'missing_values': sum(column['null_count'] for column in columns),
+            'columns': columns,
+        }
+
+
+def _distinct_value_counts(chunk):
+    # Distinct values of the columns of a chunk and their counts, by group of
+    # columns: (columns, position of the column of each value in columns,
+    # values, counts), the values of a column being contiguous. Columns sharing
+    # a numpy dtype are sorted together, the others use value_counts
+    groups = {}
+    others = []
+    for column in chunk.columns:
+        dtype = chunk[column].dtype
+        if isinstance(dtype, np.dtype) and dtype.kind in 'biufmM':
+            groups.setdefault(dtype, []).append(column)
+        else:
+            others.append(column)
+
+    for columns in groups.values():
+        # One sorted row per column, missing values are sorted last
+        ordered = np.sort(chunk[columns].to_numpy().T, axis=1)
+        rows = ordered.shape[1]
+        if rows == 0:
+            continue
+        flat = ordered.reshape(-1)
+        missing = pd.isna(flat)
+        starts = np.ones(len(flat), dtype=bool)
+        starts[1:] = flat[1:] != flat[:-1]
+        starts[::rows] = True
+        # Every missing value ends a run and is then dropped
+        bounds = np.flatnonzero(starts | missing)
+        lengths = np.diff(np.append(bounds, len(flat)))
+        keep = ~missing[bounds]
+        positions = bounds[keep]
+        yield columns, positions // rows, flat[positions], lengths[keep]
+
+    if others:
+        frequencies = [chunk[column].value_counts(dropna=True) for column in others]
+        codes = np.repeat(np.arange(len(others)), [len(counts) for counts in frequencies])
+        values = np.empty(len(codes), dtype=object)
+        values[:] = [value for counts in frequencies for value in counts.index]
+        counts = np.concatenate([counts.to_numpy(dtype=np.int64) for counts in frequencies])
+        yield others, codes, values, counts
+
+
+def outlier_bounds(column):
+    """
+    Compute the outlier bounds of a numeric column from its profile
+    Args:
+        column: The column profile, see ChunkProfiler.result
+    Returns:
+        dict: The (low, high) Tukey fences under 'iqr', and the z-score bounds
+        under 'zscore' when the standard deviation is known
+    """
+    q1, q3 = column['quantiles']['p25'], column['quantiles']['p75']
+    spread = IQR_FACTOR * (q3 - q1)
+    bounds = {'iqr': (q1 - spread, q3 + spread)}
+    if column.get('std'):
+        deviation = ZSCORE_THRESHOLD * column['std']
+        bounds['zscore'] = (column['mean'] - deviation, column['mean'] + deviation)
+    return bounds
+
+
+def refine_profile(chunks, profile):
+    """
+    Replace the outlier counts and histograms estimated from the quantile
+    sketches by exact values, with one more pass over the data
+    Args:
+        chunks: An iterable of the DataFrame chunks the profile was built from
+        profile: The profile, see ChunkProfiler.result, updated in place
+    """
+    columns = {column['name']: column for column in profile['columns'] if 'outliers' in column}
+    if not columns:
+        return
+    bounds = {name: outlier_bounds(column) for name, column in columns.items()}
+    outliers = {name: {rule: 0 for rule in bounds[name]} for name in columns}
+    histograms = {name: np.zeros(len(column['histogram']['counts']), dtype=np.int64)
+                  for name, column in columns.items()}
+    for chunk in chunks:
+        for name, column in columns.items():
+            if name not in chunk.columns:
+                continue
+            values = pd.to_numeric(chunk[name], errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)
+            values = values[~np.isnan(values)]
+            for rule, (low, high) in bounds[name].items():
+                outliers[name][rule] += int(((values < low) | (values > high)).sum())
+            edges = column['histogram']['edges']
+            if len(edges) > 2:
+                histograms[name] += np.histogram(values, bins=edges)[0]
+            else:
+                histograms[name][0] += len(values)
+    for name, column in columns.items():
+        column['outliers'].update(outliers[name])
+        column['outliers']['is_estimate'] = False
+        column['histogram']['counts'] = histograms[name].tolist()
+
+
+def profile_chunks(chunks, max_workers=1):
+    """
+    Profile a stream of DataFrame chunks
+    Args:
+        chunks: An iterable of DataFrame chunks
+        max_workers: Number of worker processes, chunks are profiled in the
+            current process when it is 1
+    Returns:
+        dict: The profile, see ChunkProfiler.result
+    """
+    profiler = ChunkProfiler()
+    if max_workers <= 1:
+        for chunk in chunks:
+            profiler.update(chunk)
+        return profiler.result()
+
+    from collections import deque
+    from concurrent.futures import ProcessPoolExecutor
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(executor.submit(_profile_chunk, chunk))
+            # Bound the number of chunks in flight to keep the memory bounded,
+            # partial profiles are merged in file order to keep the samples stable
+            if len(pending) >= max_workers * 2:
+                profiler.merge(pending.popleft().result())
+        while pending:
+            profiler.merge(pending.popleft().result())
+    return profiler.result()
+
+
+def _profile_chunk(chunk):
+    # Runs in a worker process, the partial profiler is sent back pickled
+    profiler = ChunkProfiler()
+    profiler.update(chunk)
+    return profiler
+
+
+def _format_value(value):
+    if isinstance(value, float):
+        return f"{value:.4g}"
+    return str(value)
+
+
+def format_profile(profile, compact=False):
+    """
+    Format a profile as compact text for the LLM prompts, one line per column
+    Args:
+        profile: The profile, see ChunkProfiler.result
+        compact: Only keep the type, completeness and distinct count of the
+            columns, for prompts with a tight token budget
+    Returns:
+        str: The formatted profile
+    """
+    header = (f"Rows: {profile['row_count']}, Columns: {profile['column_count']}, "
+              f"Missing values: {profile['missing_values']}")
+    if 'duplicate_rows' in profile:
+        header += (f", Duplicate rows: {profile['duplicate_rows']}, "
+                   f"Near-duplicate rows: {profile['near_duplicate_rows']}")
+    lines = [header]
+
+    for column in profile['columns']:
+        parts = [
+            f"{column['name']} ({column['dtype']})",
+            f"non-null {column['non_null']}/{profile['row_count']}",
+            f"distinct {'~' if column['distinct_is_estimate'] else ''}{column['distinct']}",
+        ]
+        if 'inferred_type' in column:
+            share = column['inferred_type_share']
+            parts.append(f"type {column['inferred_type']}" + (f" {share:.0%}" if share < 1 else ""))
+        if compact:
+            lines.append("- " + " | ".join(parts))
+            continue
+        if column.get('value_classes', {}).get('blank'):
+            parts.append(f"blank {column['value_classes']['blank']}")
+        if 'min' in column:
+            parts.append(f"range {_format_value(column['min'])} .. {_format_value(column['max'])}")
+        if column.get('mean') is not None:
+            std = column.get('std')
+            parts.append(f"mean {_format_value(column['mean'])}" +
+                         (f" ± {_format_value(std)}" if std is not None else ""))
+        if column.get('quantiles'):
+            quantiles = column['quantiles']
+            estimate = '~' if column.get('quantiles_is_estimate') else ''
+            parts.append(f"quartiles {estimate}{_format_value(quantiles['p25'])} / {_format_value(quantiles['p50'])} / "
+                         f"{_format_value(quantiles['p75'])}")
+        if column.get('outliers'):
+            outliers = column['outliers']
+            estimate = '~' if outliers['is_estimate'] else ''
+            text = f"outliers IQR {estimate}{outliers['iqr']}"
+            if 'zscore' in outliers:
+                text += f", |z|>{ZSCORE_THRESHOLD:g} {estimate}{outliers['zscore']}"
+            parts.append(text)
+        if column.get('histogram') and len(column['histogram']['counts']) > 1:
+            parts.append(f"histogram {column['histogram']['counts']}")
+        if column.get('patterns') and len(column['patterns']) < column['distinct']:
+            estimate = '~' if column.get('patterns_is_estimate') else ''
+            parts.append(f"patterns {estimate}" + ", ".join(f"{pattern!r}×{count}" for pattern, count in column['patterns']))
+        # Frequent values are only worth showing when some value repeats
+        if column['top_values'] and column['top_values'][0][1] > 1:
+            parts.append("top " + ", ".join(f"{value!r}×{count}" for value, count in column['top_values']))
+        parts.append(f"samples {column['sample_values']}")
+        lines.append("- " + " | ".join(parts))
+
+    return "\n".join(lines)
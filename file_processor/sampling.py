@@ -0,0 +1,264 @@
+import numpy as np
+import pandas as pd
+
+# Number of rows kept by a sampler, the largest sample it can return
+SAMPLE_ROWS = 10
+
+# Number of distinct values above which a column is no longer used for stratification
+STRATA_LIMIT = 50
+
+# Number of text columns tracked as stratification candidates
+STRATA_COLUMNS = 20
+
+
+def _bottom_k(keys, positions, k):
+    # The k entries with the smallest keys, sorted by key
+    if len(keys) > k:
+        selected = np.argpartition(keys, k - 1)[:k]
+        keys, positions = keys[selected], positions[selected]
+    order = np.argsort(keys, kind='stable')
+    return keys[order], positions[order]
+
+
+class RowSampler:
+    """
+    One-pass row sampler fed with DataFrame chunks.
+    Every row gets a random key and the rows with the smallest keys form a
+    uniform reservoir sample. Alongside it the sampler keeps one row per value
+    of the low-cardinality text columns, rows with missing values, and the rows
+    holding the minimum and maximum of each numeric column, so the final sample
+    can cover the strata, the nulls and the extreme values of the data.
+    """
+
+    def __init__(self, n_rows=SAMPLE_ROWS, seed=0):
+        self.n_rows = n_rows
+        self.row_count = 0
+        self._rng = np.random.default_rng(seed)
+        self.columns = None
+        # (keys, positions) of the uniform and of the null row reservoirs
+        self.reservoir = (np.empty(0), np.empty(0, dtype=np.int64))
+        self.null_reservoir = (np.empty(0), np.empty(0, dtype=np.int64))
+        # Smallest key and its position per value of each candidate column, None past STRATA_LIMIT
+        self.strata = {}
+        # Position of the minimum and maximum row of each numeric column: column -> [(value, position), ...]
+        self.extremes = {}
+        self.rows = {}
+
+    def update(self, chunk):
+        """
+        Add a chunk to the sample
+        Args:
+            chunk: A DataFrame chunk, in file order
+        """
+        if self.columns is None:
+            self.columns = list(chunk.columns)
+        if chunk.empty:
+            return
+        keys = self._rng.random(len(chunk))
+        positions = np.arange(self.row_count, self.row_count + len(chunk))
+        frame = chunk.reset_index(drop=True)
+        wanted = set()
+
+        self.reservoir = _bottom_k(np.concatenate([self.reservoir[0], keys]),
+                                   np.concatenate([self.reservoir[1], positions]), self.n_rows)
+        wanted.update(self.reservoir[1].tolist())
+
+        has_null = frame.isna().any(axis=1).to_numpy()
+        if has_null.any():
+            self.null_reservoir = _bottom_k(np.concatenate([self.null_reservoir[0], keys[has_null]]),
+                                            np.concatenate([self.null_reservoir[1], positions[has_null]]),
+                                            self.n_rows)
+        wanted.update(self.null_reservoir[1].tolist())
+
+        wanted.update(self._update_strata(frame, keys, positions))
+        wanted.update(self._update_extremes(frame, positions))
+
+        # Keep the rows still referenced, in their original dtypes
+        offset = self.row_count
+        new_positions = sorted(position for position in wanted if position >= offset)
+        for position, (_, row) in zip(new_positions, frame.iloc[[p - offset for p in new_positions]].iterrows()):
+            self.rows[position] = row
+        self.rows = {position: row for position, row in self.rows.items() if position in wanted}
+        self.row_count += len(chunk)
+
+    def _update_strata(self, frame, keys, positions):
+        if not self.strata:
+            text_columns = frame.select_dtypes(include=['object', 'string', 'category', 'bool']).columns
+            self.strata = {column: {} for column in list(text_columns)[:STRATA_COLUMNS]}
+
+        referenced = set()
+        for column, strata in self.strata.items():
+            if strata is None or column not in frame.columns:
+                continue
+            # Smallest key of each value of the chunk
+            keyed = pd.DataFrame({'value': frame[column], 'key': keys}).dropna()
+            firsts = keyed.groupby('value', sort=False, observed=True)['key'].idxmin()
+            for value, index in firsts.items():
+                current = strata.get(value)
+                if current is None or keys[index] < current[0]:
+                    strata[value] = (keys[index], int(positions[index]))
+            if len(strata) > STRATA_LIMIT:
+                self.strata[column] = None
+                continue
+            referenced.update(position for _, position in strata.values())
+        return referenced
+
+    def _update_extremes(self, frame, positions):
+        numeric = frame.select_dtypes(include='number', exclude=['bool'])
+        referenced = set()
+        if numeric.empty:
+            for extremes in self.extremes.values():
+                referenced.update(position for _, position in extremes)
+            return referenced
+
+        valid = numeric.notna().any()
+        minimums, maximums = numeric.loc[:, valid].idxmin(), numeric.loc[:, valid].idxmax()
+        for column in minimums.index:
+            low = (numeric[column].iloc[minimums[column]], int(positions[minimums[column]]))
+            high = (numeric[column].iloc[maximums[column]], int(positions[maximums[column]]))
+            current = self.extremes.get(column)
+            if current is not None:
+                low = min(current[0], low, key=lambda item: item[0])
+                high = max(current[1], high, key=lambda item: item[0])
+            self.extremes[column] = [low, high]
+        for extremes in self.extremes.values():
+            referenced.update(position for _, position in extremes)
+        return referenced
+
+    def _most_extreme(self, selected):
+        # Score the extreme values by their distance to the median of the
+        # uniform sample, in interquartile ranges
+        reservoir = pd.DataFrame([self.rows[position] for position in self.reservoir[1]])
+        best, best_score = None, 0.0
+        for column, extremes in self.extremes.items():
+            values = pd.to_numeric(reservoir.get(column), errors='coerce') if column in reservoir else None
+            if values is None or values.dropna().empty:
+                continue
+            median = values.median()
+            spread = (values.quantile(0.75) - values.quantile(0.25)) or values.std() or 1.0
+            for value, position in extremes:
+                score = abs(float(value) - median) / spread
+                if position not in selected and score > best_score:
+                    best, best_score = (column, position), score
+        return best
+
+    def sample(self, n_rows=None):
+        """
+        Build the sample
+        Args:
+            n_rows: The number of rows, at most the n_rows of the sampler
+        Returns:
+            tuple: (the sample DataFrame indexed by row number in file order,
+            a short description of how the rows were chosen)
+        """
+        n_rows = min(n_rows or self.n_rows, self.n_rows)
+        if self.columns is None or self.row_count == 0:
+            return pd.DataFrame(columns=self.columns or []), "The file has no rows"
+        if self.row_count <= n_rows:
+            rows = [self.rows[position] for position in sorted(self.reservoir[1])]
+            return pd.DataFrame(rows, columns=self.columns), f"All {self.row_count} rows"
+
+        selected, reasons = [], []
+
+        # One row per value of the stratification column covering the most values
+        quota = max(n_rows // 2, 1)
+        candidates = {column: strata for column, strata in self.strata.items()
+                      if strata is not None and len(strata) > 1}
+        if candidates:
+            fitting = [column for column, strata in candidates.items() if len(strata) <= quota]
+            column = (max(fitting, key=lambda name: len(candidates[name])) if fitting
+                      else min(candidates, key=lambda name: len(candidates[name])))
+            strata = sorted(candidates[column].values())[:quota]
+            selected.extend(position for _, position in strata)
+            reasons.append(f"one row for {len(strata)} of the {len(candidates[column])} values of '{column}'")
+
+        # A row with missing values, if none was selected yet
+        if len(selected) < n_rows and len(self.null_reservoir[1]):
+            if not any(self.rows[position].isna().any() for position in selected):
+                position = next((int(p) for p in self.null_reservoir[1] if p not in selected), None)
+                if position is not None:
+                    selected.append(position)
+                    reasons.append("a row with missing values")
+
+        # The most extreme value of the numeric columns
+        if len(selected) < n_rows and self.extremes:
+            extreme = self._most_extreme(set(selected))
+            if extreme is not None:
+                selected.append(extreme[1])
+                reasons.append(f"the most extreme value of '{extreme[0]}'")
+
+        # Uniform random rows for the rest
+        randoms = [int(position) for position in self.reservoir[1] if position not in selected]
+        randoms = randoms[:n_rows - len(selected)]
+        if randoms:
+            selected.extend(randoms)
+            reasons.append(f"{len(randoms)} random row{'s' if len(randoms) > 1 else ''}")
+
+        positions = sorted(selected)
+        sample = pd.DataFrame([self.rows[position] for position in positions], columns=self.columns)
+        sample.index = positions
+        description = f"Sample of {len(positions)} of {self.row_count} rows: " + ", ".join(reasons)
+        return sample, description
+
+
+def sample_text_excerpts(text, n_chars=1000, n_excerpts=4):
+    """
+    Take excerpts spread over a text instead of only its beginning
+    Args:
+        text: The text
+        n_chars: The total number of characters of the excerpts
+        n_excerpts: The number of excerpts
+    Returns:
+        str: The excerpts, separated by an ellipsis line
+    """
+    if len(text) <= n_chars:
+        return text
+    lines = text.splitlines()
+    if len(lines) < n_excerpts * 2:
+        return text[:n_chars]
+
+    size = n_chars // n_excerpts
+    excerpts = []
+    for start in np.linspace(0, len(lines) - 1, n_excerpts, endpoint=False).astype(int):
+        excerpt, length = [], 0
+        for line in lines[start:]:
+            if length + len(line) > size and excerpt:
+                break
+            excerpt.append(line[:size])
+            length += len(line) + 1
+        excerpts.append("\n".join(excerpt))
+    return "\n[...]\n".join(excerpts)
+
+
+def sample_block_excerpts(blocks, n_chars=1000, n_excerpts=4):
+    """
+    Take excerpts spread over a text read as a stream of blocks, so that only one
+    block is held in memory at a time
+    Args:
+        blocks: The text blocks in order, see file_loader.load_file.iter_txt_chunks
+        n_chars: The total number of characters of the excerpts
+        n_excerpts: The number of excerpts
+    Returns:
+        str: The excerpts, separated by an ellipsis line
+    """
+    size = n_chars // n_excerpts
+    excerpts, text, length = [], "", 0
+    for block in blocks:
+        # The text itself is returned when it is short enough
+        if length <= n_chars:
+            text += block[:n_chars + 1 - length]
+        length += len(block)
+        for offset in np.linspace(0, len(block), n_excerpts, endpoint=False).astype(int):
+            # Excerpts start at a line, except the one at the beginning of the text
+            if length > len(block) or offset > 0:
+                newline = block.find("\n", offset, offset + size)
+                offset = newline + 1 if newline >= 0 else offset
+            excerpt = block[offset:offset + size]
+            end = excerpt.rfind("\n")
+            excerpts.append(excerpt[:end] if end > 0 else excerpt)
+    if length <= n_chars:
+        return text
+
+    # Evenly spaced excerpts among the ones of every block
+    positions = np.linspace(0, len(excerpts), n_excerpts, endpoint=False).astype(int)
+    return "\n[...]\n".join(excerpts[position] for position in positions)
@@ -0,0 +1,380 @@
+import numpy as np
+import pandas as pd
+
+# Large odd constants used to derive independent hash functions from one 64-bit hash
+_MULTIPLIERS = np.array([0x9E3779B97F4A7C15, 0xC2B2AE3D27D4EB4F, 0x165667B19E3779F9,
+                         0xD6E8FEB86659FD93, 0xFF51AFD7ED558CCD, 0xC4CEB9FE1A85EC53],
+                        dtype=np.uint64)
+
+
+def hash_values(values):
+    """
+    Hash values to 64-bit integers in a vectorized way
+    Args:
+        values: A pandas Series, Index or array of values
+    Returns:
+        ndarray: The uint64 hashes, one per value
+    """
+    if isinstance(values, pd.Index):
+        values = values.to_series()
+    elif not isinstance(values, pd.Series):
+        values = pd.Series(values)
+    return pd.util.hash_pandas_object(values, index=False).to_numpy(dtype=np.uint64)
+
+
+def _leading_zeros(values):
+    # Count the leading zeros of uint64 values, exactly, by splitting them in
+    # 32-bit halves that float64 can represent without rounding
+    high = (values >> np.uint64(32)).astype(np.float64)
+    low = (values & np.uint64(0xFFFFFFFF)).astype(np.float64)
+    _, high_exponent = np.frexp(high)
+    _, low_exponent = np.frexp(low)
+    return np.where(high > 0, 32 - high_exponent, 64 - low_exponent)
+
+
+class HyperLogLog:
+    """
+    HyperLogLog cardinality sketch.
+    Uses 2**precision one-byte registers and estimates the number of distinct
+    values with a relative error of about 1.04 / sqrt(2**precision).
+    """
+
+    def __init__(self, precision=12):
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype=np.uint8)
+
+    def update(self, hashes):
+        """
+        Add hashed values to the sketch
+        Args:
+            hashes: The uint64 hashes of the values, see hash_values
+        """
+        if len(hashes) == 0:
+            return
+        indexes, ranks = self._registers(np.asarray(hashes, dtype=np.uint64))
+        np.maximum.at(self.registers, indexes, ranks)
+
+    def _registers(self, hashes):
+        # Register of each hash and the rank stored in it
+        indexes = (hashes >> np.uint64(64 - self.precision)).astype(np.int64)
+        remainder = hashes << np.uint64(self.precision)
+        ranks = np.minimum(_leading_zeros(remainder) + 1, 64 - self.precision + 1).astype(np.uint8)
+        return indexes, ranks
+
+    def merge(self, other):
+        """
+        Merge another sketch built with the same precision
+        Args:
+            other: Another HyperLogLog
+        """
+        if other.precision != self.precision:
+            raise ValueError("Cannot merge HyperLogLog sketches with different precisions")
+        np.maximum(self.registers, other.registers, out=self.registers)
+
+    def estimate(self):
+        """
+        Estimate the number of distinct values added to the sketch
+        Returns:
+            int: The estimated cardinality
+        """
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / np.sum(np.ldexp(1.0, -self.registers.astype(np.int64)))
+
+        # Linear counting is more accurate for small cardinalities
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * m and zeros > 0:
+            estimate = m * np.log(m / zeros)
+        return int(round(estimate))
+
+
+class KLLSketch:
+    """
+    KLL quantile sketch for numeric values.
+    Keeps a hierarchy of compactors whose capacity shrinks geometrically from
+    k at the top level, so about 3k items are retained and quantiles have a
+    rank error of about 1.7 / k. Only the lowest full compactor is compacted
+    at a time, so the upper levels keep their items.
+    """
+
+    def __init__(self, k=200, seed=0):
+        """
+        Args:
+            k: The capacity of the top compactor, the accuracy parameter
+            seed: The seed of the compaction offsets, fixed by default so that
+                the same values always give the same sketch
+        """
+        self.k = k
+        self.count = 0
+        self.compactors = [np.empty(0, dtype=np.float64)]
+        self._rng = np.random.default_rng(seed)
+
+    def _capacity(self, level):
+        depth = len(self.compactors) - level - 1
+        return max(int(np.ceil(self.k * (2 / 3) ** depth)), 2)
+
+    def update(self, values):
+        """
+        Add numeric values to the sketch
+        Args:
+            values: An array of numeric values, NaN values are ignored
+        """
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        if len(values) == 0:
+            return
+        self.compactors[0] = np.concatenate([self.compactors[0], values])
+        self.count += len(values)
+        self._compress()
+
+    def retained(self):
+        """
+        Get the number of values kept by the sketch
+        Returns:
+            int: The retained values, equal to count until the first compaction
+        """
+        return sum(len(items) for items in self.compactors)
+
+    def _max_size(self):
+        return sum(self._capacity(level) for level in range(len(self.compactors)))
+
+    def _compress(self):
+        # Compact the lowest full level until the retained items fit; adding a
+        # level raises the capacities of the levels below it
+        while self.retained() >= self._max_size():
+            for level, items in enumerate(self.compactors):
+                if len(items) >= self._capacity(level):
+                    break
+            if level + 1 == len(self.compactors):
+                self.compactors.append(np.empty(0, dtype=np.float64))
+
+            # Keep one item back when the count is odd so that weights stay exact
+            items = np.sort(items)
+            kept = items[:len(items) % 2]
+            items = items[len(items) % 2:]
+
+            # Promote every other item, starting at a random offset
+            offset = int(self._rng.integers(2))
+            self.compactors[level + 1] = np.concatenate([self.compactors[level + 1], items[offset::2]])
+            self.compactors[level] = kept
+
+    def merge(self, other):
+        """
+        Merge another KLL sketch
+        Args:
+            other: Another KLLSketch
+        """
+        while len(self.compactors) < len(other.compactors):
+            self.compactors.append(np.empty(0, dtype=np.float64))
+        for level, items in enumerate(other.compactors):
+            self.compactors[level] = np.concatenate([self.compactors[level], items])
+        self.count += other.count
+        self._compress()
+
+    def _cumulative_weights(self):
+        # Sorted retained items and their cumulative weights
+        items = np.concatenate(self.compactors)
+        weights = np.concatenate([np.full(len(items_), 2.0 ** level)
+                                  for level, items_ in enumerate(self.compactors)])
+        order = np.argsort(items, kind='stable')
+        return items[order], np.cumsum(weights[order])
+
+    def count_outside(self, low, high):
+        """
+        Estimate how many values are strictly below low or strictly above high
+        Args:
+            low: The lower bound
+            high: The upper bound
+        Returns:
+            int: The estimated number of values outside the bounds
+        """
+        if self.count == 0:
+            return 0
+        items, cumulative = self._cumulative_weights()
+        below = np.searchsorted(items, low, side='left')
+        up_to_high = np.searchsorted(items, high, side='right')
+        outside = (cumulative[below - 1] if below > 0 else 0.0) + cumulative[-1] - (
+            cumulative[up_to_high - 1] if up_to_high > 0 else 0.0)
+        # Rescale from the retained weights to the exact count
+        return int(round(outside * self.count / cumulative[-1]))
+
+    def histogram(self, edges):
+        """
+        Estimate the number of values in each bin
+        Args:
+            edges: The increasing bin edges, the last bin includes its right edge
+        Returns:
+            list: The estimated count of each bin
+        """
+        if self.count == 0:
+            return [0 for _ in range(len(edges) - 1)]
+        items, cumulative = self._cumulative_weights()
+        positions = np.searchsorted(items, np.asarray(edges, dtype=np.float64), side='left')
+        positions[-1] = np.searchsorted(items, edges[-1], side='right')
+        totals = np.concatenate([[0.0], cumulative])[positions]
+        counts = np.diff(totals) * self.count / cumulative[-1]
+        return [int(round(count)) for count in counts]
+
+    def quantiles(self, fractions):
+        """
+        Estimate quantiles of the values added to the sketch
+        Args:
+            fractions: The quantile fractions, between 0 and 1
+        Returns:
+            list: The estimated quantiles, None if the sketch is empty
+        """
+        if self.count == 0:
+            return [None for _ in fractions]
+
+        items, cumulative = self._cumulative_weights()
+        ranks = np.asarray(fractions, dtype=np.float64) * cumulative[-1]
+        positions = np.minimum(np.searchsorted(cumulative, ranks, side='left'), len(items) - 1)
+        return [float(value) for value in items[positions]]
+
+
+class CountMinSketch:
+    """
+    Count-min frequency sketch with a bounded list of heavy-hitter candidates.
+    Frequencies are overestimated by at most e / width of the total count,
+    with probability 1 - exp(-depth).
+    """
+
+    def __init__(self, width=2048, depth=4, max_candidates=100):
+        if depth > len(_MULTIPLIERS):
+            raise ValueError(f"CountMinSketch depth cannot exceed {len(_MULTIPLIERS)}")
+        self.width = width
+        self.depth = depth
+        self.max_candidates = max_candidates
+        self.table = np.zeros((depth, width), dtype=np.int64)
+        self.total = 0
+        # Candidate heavy hitters: value -> hash
+        self.candidates = {}
+
+    def _columns(self, hashes):
+        bits = self.width.bit_length() - 1
+        if bits and self.width == 1 << bits:
+            # The top bits of the products index a power of two width directly
+            return [((hashes * _MULTIPLIERS[row]) >> np.uint64(64 - bits)).astype(np.int64)
+                    for row in range(self.depth)]
+        return [((hashes * _MULTIPLIERS[row]) >> np.uint64(40)).astype(np.int64) % self.width
+                for row in range(self.depth)]
+
+    def update(self, values, counts):
+        """
+        Add value frequencies to the sketch
+        Args:
+            values: The distinct values, as an Index, Series or array
+            counts: The number of occurrences of each value
+        """
+        if len(values) == 0:
+            return
+        values = pd.Index(values)
+        hashes = hash_values(values)
+        counts = np.asarray(counts, dtype=np.int64)
+        for row, columns in enumerate(self._columns(hashes)):
+            np.add.at(self.table[row], columns, counts)
+        self.total += int(counts.sum())
+        self._add_candidates(values, hashes, counts)
+
+    def _add_candidates(self, values, hashes, counts):
+        # The most frequent values of an update are the heavy-hitter candidates
+        if len(counts) > self.max_candidates:
+            top = np.argpartition(-counts, self.max_candidates - 1)[:self.max_candidates]
+        else:
+            top = np.arange(len(counts))
+        for position in top:
+            self.candidates[values[position]] = hashes[position]
+        self._prune_candidates()
+
+    def _prune_candidates(self):
+        if len(self.candidates) <= self.max_candidates:
+            return
+        top = self.heavy_hitters(self.max_candidates)
+        self.candidates = {value: self.candidates[value] for value, _ in top}
+
+    def estimate(self, hashes):
+        """
+        Estimate the frequency of hashed values
+        Args:
+            hashes: The uint64 hashes of the values, see hash_values
+        Returns:
+            ndarray: The estimated frequencies
+        """
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        estimates = [self.table[row][columns] for row, columns in enumerate(self._columns(hashes))]
+        return np.min(estimates, axis=0)
+
+    def heavy_hitters(self, k):
+        """
+        Get the most frequent values seen by the sketch.
+        Values whose estimate is below twice the sketch error bound are left
+        out, since their count could be mostly due to collisions.
+        Args:
+            k: The number of values to return
+        Returns:
+            list: (value, estimated count) pairs, most frequent first
+        """
+        if not self.candidates:
+            return []
+        values = list(self.candidates)
+        estimates = self.estimate(np.array([self.candidates[value] for value in values], dtype=np.uint64))
+        order = np.argsort(-estimates, kind='stable')[:k]
+        error_bound = 2 * np.e * self.total / self.width
+        return [(values[position], int(estimates[position])) for position in order
+                if estimates[position] > error_bound]
+
+    def merge(self, other):
+        """
+        Merge another sketch built with the same dimensions
+        Args:
+            other: Another CountMinSketch
+        """
+        if other.table.shape != self.table.shape:
+            raise ValueError("Cannot merge CountMinSketch sketches with different dimensions")
+        self.table += other.table
+        self.total += other.total
+        self.candidates.update(other.candidates)
+        self._prune_candidates()
+
+
+def update_sketches(cardinalities, frequencies, codes, values, hashes, counts):
+    """
+    Add the distinct values of several columns to their sketches at once,
+    with a single vectorized update of all the registers and tables
+    Args:
+        cardinalities: The HyperLogLog of each column, all with the same precision
+        frequencies: The CountMinSketch of each column, all with the same dimensions
+        codes: The position of the column of each value in the lists of sketches,
+            in increasing order
+        values: The distinct values of each column, as an array
+        hashes: The uint64 hashes of the values, see hash_values
+        counts: The number of occurrences of each value
+    """
+    if len(hashes) == 0:
+        return
+    codes = np.asarray(codes, dtype=np.int64)
+    counts = np.asarray(counts, dtype=np.int64)
+
+    # Registers of all the HyperLogLog sketches side by side
+    size = len(cardinalities[0].registers)
+    indexes, ranks = cardinalities[0]._registers(hashes)
+    registers = np.zeros(len(cardinalities) * size, dtype=np.uint8)
+    np.maximum.at(registers, codes * size + indexes, ranks)
+    for sketch, part in zip(cardinalities, registers.reshape(len(cardinalities), size)):
+        np.maximum(sketch.registers, part, out=sketch.registers)
+
+    # Rows of all the count-min tables side by side, bincount sums the counts
+    # falling in the same cell
+    width = frequencies[0].width
+    for row, columns in enumerate(frequencies[0]._columns(hashes)):
+        table = np.bincount(codes * width + columns, weights=counts, minlength=len(frequencies) * width)
+        table = np.rint(table).astype(np.int64).reshape(len(frequencies), width)
+        for sketch, part in zip(frequencies, table):
+            sketch.table[row] += part
+
+    bounds = np.searchsorted(codes, np.arange(len(frequencies) + 1))
+    for position, sketch in enumerate(frequencies):
+        start, end = bounds[position], bounds[position + 1]
+        if end > start:
+            sketch.total += int(counts[start:end].sum())
+            sketch._add_candidates(values[start:end], hashes[start:end], counts[start:end])
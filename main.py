@@ -1,7 +1,38 @@
 import streamlit as st
 from styles.jazzy_theme import apply_jazzy_theme
 from chat_interface.chat_ui import initialize_chat, display_chat, handle_file_upload, handle_user_input
-from data_catalog.crewai_feedback import check_crewai_status
+from data_catalog.crewai_feedback import (check_crewai_status, deliver_job_results, cancel_crewai_jobs,
+                                         collect_feedback_requests, collect_job_progress, get_live_steps)
+from tracing.panel import display_trace_panel
+
+
+@st.fragment(run_every=1)
+def display_crewai_status():
+    """
+    Poll the background CrewAI jobs of the session and display their status
+    along with the last step of their agents.
+    """
+    # Deliver feedback requests and finished jobs to the chat and rerun the
+    # whole app to show them
+    progressed = collect_job_progress()
+    requested = collect_feedback_requests()
+    delivered = deliver_job_results()
+    if progressed or requested or delivered:
+        st.rerun(scope="app")
+
+    is_running, result, error = check_crewai_status()
+    if is_running:
+        st.info("Analyse en cours... Veuillez répondre aux demandes de validation quand elles apparaissent.")
+        # Last step of the agents, updated on every poll
+        for label, step in get_live_steps().items():
+            st.caption(f"{label} · {step['title']}")
+            st.markdown(step['content'][-500:])
+        if st.button("Annuler l'analyse"):
+            cancel_crewai_jobs()
+    elif error:
+        st.error(f"Erreur dans l'analyse: {error}")
+    elif result:
+        st.success("Analyse terminée avec succès!")
 
 
 def main():
@@ -28,13 +59,10 @@ def main():
 
         # Add status indicator for CrewAI
         st.markdown("### Status")
-        is_running, result, error = check_crewai_status()
-        if is_running:
-            st.info("Analyse en cours... Veuillez répondre aux demandes de validation quand elles apparaissent.")
-        elif error:
-            st.error(f"Erreur dans l'analyse: {error}")
-        elif result:
-            st.success("Analyse terminée avec succès!")
+        display_crewai_status()
+
+        # Time spent per stage, for each cataloging job
+        display_trace_panel()
 
     # Main chat area
     display_chat()
@@ -0,0 +1,121 @@
+"""
+Report what importing the app costs, module by module.
+
+Usage:
+    python scripts/import_profile.py [module ...] [--top N] [--json]
+
+Each module (main by default) is imported in a fresh interpreter with
+python -X importtime, and the timings are summarized per package and per
+project module.
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+
+# Root of the repository, imported modules are resolved from there
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Top-level packages of the project
+PROJECT_PACKAGES = ['main', 'chat_interface', 'data_catalog', 'file_loader', 'file_processor', 'styles', 'tracing']
+
+# Line of the -X importtime report: "import time: self [us] | cumulative | imported package"
+_IMPORT_TIME_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def profile_import(module):
+    """
+    Import a module in a fresh interpreter and collect its import timings.
+
+    Args:
+        module: The module name
+
+    Returns:
+        list: One dict per imported module with name, depth, self_ms and cumulative_ms,
+        in the order of the report (children before their parent)
+    """
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [ROOT, os.getenv("PYTHONPATH")])))
+    completed = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                               cwd=ROOT, env=env, capture_output=True, text=True)
+
+    timings = []
+    for line in completed.stderr.splitlines():
+        match = _IMPORT_TIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            timings.append({'name': name, 'depth': len(indent) // 2, 'self_ms': int(self_us) / 1000,
+                            'cumulative_ms': int(cumulative_us) / 1000})
+    if completed.returncode != 0:
+        # Keep the timings of what was imported before the error
+        error = completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else "unknown error"
+        print(f"Import of {module} failed: {error}", file=sys.stderr)
+    return timings
+
+
+def summarize(timings, top=15):
+    """
+    Summarize the import timings of a module.
+
+    Args:
+        timings: The timings of profile_import
+        top: The number of packages and modules to keep
+
+    Returns:
+        dict: total_ms, packages (self time summed per top-level package),
+        project (cumulative time of the project modules) and slowest (the
+        modules with the highest self time)
+    """
+    packages = {}
+    for timing in timings:
+        package = timing['name'].split('.')[0]
+        packages[package] = packages.get(package, 0.0) + timing['self_ms']
+
+    project = [timing for timing in timings if timing['name'].split('.')[0] in PROJECT_PACKAGES]
+    return {
+        'total_ms': sum(timing['self_ms'] for timing in timings),
+        'packages': sorted(packages.items(), key=lambda item: -item[1])[:top],
+        'project': sorted(((timing['name'], timing['cumulative_ms']) for timing in project),
+                          key=lambda item: -item[1])[:top],
+        'slowest': sorted(((timing['name'], timing['self_ms']) for timing in timings),
+                          key=lambda item: -item[1])[:top],
+    }
+
+
+def format_summary(module, summary):
+    """
+    Format the summary of a module as text tables.
+
+    Args:
+        module: The module name
+        summary: The summary of summarize
+
+    Returns:
+        str: The report
+    """
+    lines = [f"Import of {module}: {summary['total_ms']:.0f} ms"]
+    for title, rows in [("Self time per package", summary['packages']),
+                        ("Project modules, including what they import", summary['project']),
+                        ("Slowest modules, self time", summary['slowest'])]:
+        lines += ["", title]
+        lines += [f"  {milliseconds:9.1f} ms  {name}" for name, milliseconds in rows]
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report the import time of the app modules")
+    parser.add_argument("modules", nargs="*", default=["main"], help="Modules to import, main by default")
+    parser.add_argument("--top", type=int, default=15, help="Number of rows per table")
+    parser.add_argument("--json", action="store_true", help="Print the summaries as JSON")
+    args = parser.parse_args()
+
+    summaries = {module: summarize(profile_import(module), args.top) for module in args.modules}
+    if args.json:
+        print(json.dumps(summaries, indent=2))
+    else:
+        print("\n\n".join(format_summary(module, summary) for module, summary in summaries.items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+import random
+
+from data_catalog.catalog_store import CatalogStore
+from data_catalog.mock_llm import _glossary_output, _metadata_output, _quality_output
+from data_catalog.utils import build_catalog_entry, parse_glossary, parse_metadata, parse_quality_assessment
+
+COLUMNS = [{'name': 'order_id', 'type': 'int64'}, {'name': 'net_amount', 'type': 'float64'}]
+
+PROFILES = {None: {'row_count': 3, 'columns': [
+    {'name': 'order_id', 'dtype': 'int64', 'non_null': 3, 'distinct': 3},
+    {'name': 'net_amount', 'dtype': 'float64', 'non_null': 3, 'distinct': 2},
+]}}
+
+
+def test_parse_metadata_fields():
+    metadata = parse_metadata("## Metadata\n\n**Title:** Orders 2024\n- **Domain**: Sales\nTags: orders, Revenue")
+    assert metadata == {'title': 'Orders 2024', 'domain': 'Sales', 'tags': ['orders', 'Revenue']}
+    assert parse_metadata(None) == {}
+
+
+def test_parse_glossary_terms():
+    glossary = parse_glossary("## Business glossary\n\n- **Net amount**: Amount after returns\n"
+                              "- **Order:** A purchase\nSome prose")
+    assert glossary == {'Net amount': 'Amount after returns', 'Order': 'A purchase'}
+
+
+def test_parse_quality_score():
+    assert parse_quality_assessment("## Quality\n\n**Overall quality score:** 87/100")['overall_score'] == 87.0
+    assert parse_quality_assessment("Overall score: 250")['overall_score'] is None
+    assert parse_quality_assessment(None)['overall_score'] is None
+
+
+def test_summary_fields_default_to_the_file_name():
+    entry = build_catalog_entry("orders.csv", "# Orders", PROFILES)
+    assert entry['metadata']['title'] == "orders.csv"
+    assert entry['quality_assessment']['overall_score'] is None
+
+
+def test_catalog_entry_is_searchable(tmp_path):
+    task_outputs = {'metadata': _metadata_output(COLUMNS, random.Random(0), ""),
+                    'quality': _quality_output(COLUMNS, random.Random(0), ""),
+                    'glossary': _glossary_output(COLUMNS, random.Random(0), "")}
+    entry = build_catalog_entry("orders.csv", "# Orders", PROFILES, task_outputs)
+    domain = entry['metadata']['domain']
+
+    store = CatalogStore(str(tmp_path / "catalog.sqlite"))
+    store.save(entry)
+    summary = store.list_summaries()[0]
+    assert summary['title'] == f"{domain} records"
+    assert summary['domain'] == domain
+    assert summary['quality_score'] == entry['quality_assessment']['overall_score'] is not None
+
+    result = store.search(domain.lower())
+    assert result['total'] == 1
+    assert result['facets']['domain'] == {domain: 1}
+    assert domain.lower() in result['facets']['tags']
+    assert store.search("returns")['total'] == 0
+    assert store.search("meaning")['total'] == 1
@@ -0,0 +1,21 @@
+import io
+
+import pandas as pd
+
+from benchmarks.synthetic import SyntheticUpload
+from file_loader.dataset import DatasetHandle
+from file_loader.utils import compute_content_hash
+
+
+def test_column_labels_survive_the_columnar_cache(tmp_path, monkeypatch):
+    monkeypatch.setenv("DUKE_CACHE_DIR", str(tmp_path))
+    buffer = io.BytesIO()
+    pd.DataFrame({'region': ['north', 'south'], 2023: [1.5, 2.5], 2024: [3, 4]}).to_excel(buffer, index=False)
+    upload = SyntheticUpload(buffer.getvalue(), "sales.xlsx", "application/vnd.ms-excel")
+    content_hash = compute_content_hash(upload)
+
+    parsed = DatasetHandle(upload, content_hash).dataframe
+    cached = DatasetHandle(upload, content_hash)
+    assert cached.dataframe is not None and cached._from_cache
+    assert list(parsed.columns) == list(cached.dataframe.columns) == ['region', '2023', '2024']
+    pd.testing.assert_frame_equal(parsed, cached.dataframe, check_dtype=False)
@@ -0,0 +1,39 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from file_processor.duplicates import DuplicateCounter, DuplicateDetector, count_duplicates
+
+
+def test_spilled_partitions_are_counted():
+    hashes = np.random.default_rng(0).integers(0, 2 ** 63, 5000, dtype=np.int64).astype(np.uint64)
+    with DuplicateDetector(memory_limit_mb=0.01) as detector:
+        detector.update(hashes.repeat(2))
+        assert detector.spilled
+        assert detector.count() == 5000
+
+
+def test_spill_directory_is_removed_on_errors():
+    with pytest.raises(RuntimeError):
+        with DuplicateCounter(memory_limit_mb=0.02) as counter:
+            counter.update(pd.DataFrame({'a': np.arange(10000)}))
+            spill_dir = counter.exact.spill_dir
+            assert os.path.isdir(spill_dir)
+            raise RuntimeError("profiling failed")
+    assert not os.path.exists(spill_dir)
+
+
+def test_near_duplicates():
+    with DuplicateCounter() as counter:
+        counter.update(pd.DataFrame({'a': [1, 1, 2, 2], 'b': ['x', 'x', 'y', ' Y ']}))
+        assert counter.result() == {'duplicate_rows': 1, 'near_duplicate_rows': 1}
+
+
+def test_in_memory_counts_match_the_streamed_counts():
+    frame = pd.DataFrame({'a': [1, 1, 2, 2, 3], 'b': ['x', 'x', 'y', ' Y ', None], 'c': [0.1, 0.1, 0.2, 0.2000000001, 0.3]})
+    with DuplicateCounter() as counter:
+        counter.update(frame.iloc[:2])
+        counter.update(frame.iloc[2:])
+        assert count_duplicates(frame) == counter.result() == {'duplicate_rows': 1, 'near_duplicate_rows': 1}
@@ -0,0 +1,22 @@
+import json
+
+from data_catalog.fingerprints import CATALOG_TASKS, get_schema_signature, plan_recatalog
+
+
+def _profiles(columns):
+    return {None: {'row_count': 3, 'columns': [{'name': name, 'dtype': dtype} for name, dtype in columns]}}
+
+
+def test_new_column_reruns_the_schema_change_tasks():
+    previous = _profiles([('order_id', 'int64'), ('net_amount', 'float64'), ('customer', 'str')])
+    snapshot = json.loads(json.dumps({
+        'content_hash': 'previous',
+        'schema': get_schema_signature(previous),
+        'task_outputs': {key: f"{key} output" for key in CATALOG_TASKS},
+    }))
+
+    current = _profiles([('order_id', 'int64'), ('net_amount', 'float64'), ('customer', 'str'), ('region', 'str')])
+    tasks, changes = plan_recatalog(snapshot, 'current', current)
+    assert tasks == {'analysis', 'schema', 'quality', 'documentation'}
+    assert changes == ["Column added: null.region (str)"]
+    assert plan_recatalog(snapshot, 'previous', previous) == (set(), [])
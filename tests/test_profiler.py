@@ -0,0 +1,84 @@
+import time
+
+import numpy as np
+import pandas as pd
+
+from file_processor.patterns import classify_values, value_patterns
+from file_processor.profiler import PATTERN_SAMPLE_VALUES, SAMPLE_VALUES, profile_chunks
+
+
+def _column(profile, name):
+    return next(column for column in profile['columns'] if column['name'] == name)
+
+
+def test_value_classes_take_the_first_matching_class():
+    values = ["", "oui", "12", "1,5", "2024-01-02", "10:30", "a@b.fr", "www.x.org", "+33 6 12 34 56 78", "12 %", "abc"]
+    classes = classify_values(values, [1] * len(values))
+    assert classes == {'blank': 1, 'boolean': 1, 'integer': 1, 'decimal': 1, 'date': 1, 'time': 1,
+                       'email': 1, 'url': 1, 'phone': 1, 'percentage': 1}
+    assert list(value_patterns(pd.Series(["AB-1234", "x  y"]))) == ["A-9999", "A A"]
+
+
+def test_patterns_of_high_cardinality_columns_are_sampled():
+    rows = 20 * PATTERN_SAMPLE_VALUES
+    codes = pd.Series([f"C-{i:06d}" for i in range(rows)])
+    codes[::10] = "unknown"
+    profile = profile_chunks([pd.DataFrame({'code': codes})])
+    column = _column(profile, 'code')
+    assert column['patterns_is_estimate']
+    patterns = dict(column['patterns'])
+    assert patterns['A'] == rows // 10
+    assert abs(patterns['A-999999'] - rows * 0.9) <= rows * 0.01
+    assert column['inferred_type'] == 'text'
+
+
+def _wide_frame(rows, columns=500):
+    rng = np.random.default_rng(0)
+    makers = [lambda: rng.integers(0, 1000, rows), lambda: rng.normal(size=rows),
+              lambda: rng.choice(['alpha', 'beta', 'gamma', 'delta'], rows), lambda: rng.integers(0, rows * 10, rows)]
+    return pd.DataFrame({f"c{i}": makers[i % len(makers)]() for i in range(columns)})
+
+
+def test_distinct_values_of_numpy_columns_are_exact():
+    df = pd.DataFrame({
+        'integer': [3, 1, 3, 2, 3, 1],
+        'decimal': [0.5, np.nan, 0.5, -1.0, np.nan, 2.0],
+        'flag': [True, False, True, True, True, False],
+        'day': pd.to_datetime(['2024-01-01', None, '2024-01-01', '2024-01-02', None, None]),
+        'text': ['a', 'b', None, 'a', 'a', 'c'],
+    })
+    profile = profile_chunks([df.iloc[:4], df.iloc[4:]])
+    for name in df.columns:
+        column = _column(profile, name)
+        expected = df[name].value_counts()
+        assert column['distinct'] == len(expected) and not column['distinct_is_estimate']
+        assert column['top_values'][0][1] == expected.iloc[0]
+        assert column['null_count'] == df[name].isna().sum()
+    assert _column(profile, 'integer')['top_values'] == [[3, 3], [1, 2], [2, 1]]
+    assert _column(profile, 'day')['top_values'][0] == ['2024-01-01T00:00:00', 2]
+
+
+def test_wide_frames_are_profiled_with_sketches():
+    df = _wide_frame(5000)
+    profile = profile_chunks([df])
+    for column in profile['columns'][:4]:
+        expected = df[column['name']].nunique()
+        assert column['distinct_is_estimate']
+        assert abs(column['distinct'] - expected) <= 0.05 * expected
+    assert sorted(value for value, _ in profile['columns'][2]['top_values']) == ['alpha', 'beta', 'delta', 'gamma']
+
+
+def test_wide_frame_profile_time():
+    # Regression check against the per-column count / nunique / head loop the
+    # profiler replaced: profiling everything must stay within a small factor
+    df = _wide_frame(5000)
+    profile_times, loop_times = [], []
+    for _ in range(3):
+        start = time.perf_counter()
+        profile_chunks([df])
+        profile_times.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        for name in df.columns:
+            df[name].count(), df[name].nunique(), df[name].dropna().head(SAMPLE_VALUES)
+        loop_times.append(time.perf_counter() - start)
+    assert min(profile_times) < 6 * min(loop_times)
@@ -0,0 +1,17 @@
+import io
+
+from file_loader.load_file import iter_txt_chunks
+from file_processor.sampling import sample_block_excerpts
+
+
+def test_block_excerpts_are_spread_over_the_text():
+    text = "".join(f"line {number}\n" for number in range(10000))
+    sample = sample_block_excerpts(iter_txt_chunks(io.BytesIO(text.encode()), chunk_chars=5000), n_chars=200)
+    excerpts = sample.split("\n[...]\n")
+    assert len(excerpts) == 4 and excerpts[0].startswith("line 0\n")
+    assert all(line in text.splitlines() for excerpt in excerpts for line in excerpt.splitlines())
+    assert "line 7" in excerpts[-1]
+
+
+def test_short_texts_are_returned_whole():
+    assert sample_block_excerpts(iter_txt_chunks(io.BytesIO(b"short text"), chunk_chars=4)) == "short text"
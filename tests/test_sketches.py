@@ -0,0 +1,82 @@
+import numpy as np
+import pandas as pd
+
+from file_processor.sketches import HyperLogLog, KLLSketch, CountMinSketch, hash_values
+
+
+def _max_rank_error(sketch, values, fractions):
+    ordered = np.sort(values)
+    estimates = np.asarray(sketch.quantiles(fractions))
+    ranks = np.searchsorted(ordered, estimates) / len(ordered)
+    return np.abs(ranks - fractions).max()
+
+
+def test_kll_quantiles_of_a_normal_distribution():
+    values = np.random.default_rng(1).normal(size=200_000)
+    fractions = np.linspace(0.01, 0.99, 99)
+    for batch_size in (len(values), 1000):
+        sketch = KLLSketch(k=200)
+        for start in range(0, len(values), batch_size):
+            sketch.update(values[start:start + batch_size])
+        assert sketch.count == len(values)
+        assert _max_rank_error(sketch, values, fractions) < 0.01
+
+
+def test_kll_retains_about_3k_items():
+    sketch = KLLSketch(k=200)
+    for chunk in np.array_split(np.random.default_rng(2).uniform(size=100_000), 100):
+        sketch.update(chunk)
+    assert 200 <= sum(len(items) for items in sketch.compactors) <= 3 * 200
+
+
+def test_kll_merge_matches_the_whole_stream():
+    values = np.random.default_rng(3).exponential(size=100_000)
+    left, right = KLLSketch(), KLLSketch()
+    left.update(values[:60_000])
+    right.update(values[60_000:])
+    left.merge(right)
+    assert left.count == len(values)
+    assert _max_rank_error(left, values, np.linspace(0.05, 0.95, 19)) < 0.01
+
+
+def test_kll_is_deterministic_and_ignores_nan():
+    values = np.random.default_rng(4).normal(size=50_000)
+    values[::10] = np.nan
+    first, second = KLLSketch(), KLLSketch()
+    first.update(values)
+    second.update(values)
+    assert first.count == np.count_nonzero(~np.isnan(values))
+    assert first.quantiles([0.01, 0.5, 0.99]) == second.quantiles([0.01, 0.5, 0.99])
+
+
+def test_kll_counts_and_histogram_add_up():
+    values = np.random.default_rng(5).normal(size=100_000)
+    sketch = KLLSketch()
+    sketch.update(values)
+    counts = sketch.histogram(np.linspace(values.min(), values.max(), 11))
+    assert abs(sum(counts) - len(values)) <= len(counts)
+    assert abs(sketch.count_outside(-1, 1) - np.count_nonzero(np.abs(values) > 1)) < 0.02 * len(values)
+
+
+def test_hyperloglog_estimates_distinct_values():
+    sketch = HyperLogLog(precision=12)
+    sketch.update(hash_values(pd.Series(np.arange(100_000))))
+    assert abs(sketch.estimate() - 100_000) < 0.05 * 100_000
+
+    small = HyperLogLog()
+    small.update(hash_values(pd.Series(["a", "b", "c", "a"])))
+    assert small.estimate() == 3
+
+
+def test_count_min_finds_the_heavy_hitters():
+    rng = np.random.default_rng(6)
+    values = np.concatenate([np.full(5000, "frequent"), np.full(3000, "common"),
+                             rng.integers(0, 10_000, size=20_000).astype(str)])
+    counts = pd.Series(values).value_counts()
+    sketch = CountMinSketch(max_candidates=20)
+    for start in range(0, len(counts), 1000):
+        chunk = counts.iloc[start:start + 1000]
+        sketch.update(chunk.index, chunk.to_numpy())
+    top = sketch.heavy_hitters(2)
+    assert [value for value, _ in top] == ["frequent", "common"]
+    assert top[0][1] >= 5000
@@ -0,0 +1,106 @@
+import hashlib
+import json
+import os
+import threading
+from functools import lru_cache
+from dotenv import load_dotenv
+
+from file_loader.utils import get_cache_dir
+
+# Load environment variables
+load_dotenv()
+
+# File the finished spans are appended to, one JSON object per line; set it
+# to an empty value to keep the spans in memory only
+TRACE_FILE = os.getenv("DUKE_TRACE_FILE")
+
+# jsonl writes the spans as they are, otlp as OpenTelemetry OTLP/JSON trace requests
+TRACE_FORMAT = os.getenv("DUKE_TRACE_FORMAT", "jsonl")
+
+# Name of the service in the OTLP resource
+SERVICE_NAME = "duke-data-catalog"
+
+_write_lock = threading.Lock()
+
+
+@lru_cache(maxsize=1)
+def get_trace_file():
+    """
+    Get the path of the file the spans are exported to.
+
+    Returns:
+        str: The path, or None if spans are not written to a file
+    """
+    if TRACE_FILE is not None:
+        return TRACE_FILE or None
+    extension = "otlp.jsonl" if TRACE_FORMAT == 'otlp' else "jsonl"
+    return os.path.join(get_cache_dir("traces"), f"spans.{extension}")
+
+
+def _otlp_id(value, length):
+    # OTLP IDs are fixed-size hex strings, other IDs such as job IDs are hashed
+    if len(value) == length and all(char in "0123456789abcdef" for char in value):
+        return value
+    return hashlib.md5(value.encode('utf-8')).hexdigest()[:length]
+
+
+def _otlp_value(value):
+    if isinstance(value, bool):
+        return {'boolValue': value}
+    if isinstance(value, int):
+        return {'intValue': str(value)}
+    if isinstance(value, float):
+        return {'doubleValue': value}
+    return {'stringValue': str(value)}
+
+
+def to_otlp(span):
+    """
+    Convert a span to an OTLP/JSON trace export request, as written by the
+    OpenTelemetry collector file exporter.
+
+    Args:
+        span: The finished span
+
+    Returns:
+        dict: The export request holding the span
+    """
+    start_ns = int(span.start_time * 1e9)
+    otlp_span = {
+        'traceId': _otlp_id(span.trace_id, 32),
+        'spanId': _otlp_id(span.span_id, 16),
+        'name': span.name,
+        'kind': 1,
+        'startTimeUnixNano': str(start_ns),
+        'endTimeUnixNano': str(start_ns + int(span.duration * 1e9)),
+        'attributes': [{'key': key, 'value': _otlp_value(value)} for key, value in span.attributes.items()],
+        # 1 is OK and 2 is ERROR in the OTLP status codes
+        'status': {'code': 2, 'message': span.error} if span.status == 'error' else {'code': 1},
+    }
+    if span.parent_id:
+        otlp_span['parentSpanId'] = _otlp_id(span.parent_id, 16)
+    return {'resourceSpans': [{
+        'resource': {'attributes': [{'key': 'service.name', 'value': {'stringValue': SERVICE_NAME}}]},
+        'scopeSpans': [{'scope': {'name': 'tracing'}, 'spans': [otlp_span]}],
+    }]}
+
+
+def export_span(span):
+    """
+    Append a finished span to the trace file.
+
+    Args:
+        span: The finished span
+    """
+    path = get_trace_file()
+    if path is None:
+        return
+    record = to_otlp(span) if TRACE_FORMAT == 'otlp' else span.to_dict()
+    line = json.dumps(record, ensure_ascii=False, default=str) + "\n"
+    try:
+        with _write_lock:
+            with open(path, 'a', encoding='utf-8') as file:
+                file.write(line)
+    except OSError as e:
+        # Tracing never breaks the traced work
+        print(f"Error exporting span: {e}")
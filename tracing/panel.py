@@ -0,0 +1,44 @@
+import streamlit as st
+
+from tracing.spans import get_finished_spans, get_trace_labels, summarize_spans
+
+# Columns of the stage table: summary key -> header
+SUMMARY_COLUMNS = {
+    'name': "Étape",
+    'count': "Appels",
+    'total_ms': "Total (ms)",
+    'max_ms': "Max (ms)",
+    'rows': "Lignes",
+    'bytes_read': "Octets lus",
+    'prompt_tokens': "Tokens prompt",
+    'completion_tokens': "Tokens réponse",
+    'cache_hits': "Cache",
+    'errors': "Erreurs",
+}
+
+
+def display_trace_panel():
+    """
+    Display the time spent in each stage, for all the work of the process or
+    for one cataloging job, from the spans kept in memory.
+    """
+    with st.expander("Performance"):
+        spans = get_finished_spans()
+        if not spans:
+            st.caption("Aucune mesure pour le moment.")
+            return
+
+        # Jobs with at least one finished span, most recent first
+        labels = get_trace_labels()
+        traces = [trace_id for trace_id in reversed(labels) if any(span.trace_id == trace_id for span in spans)]
+        choice = st.selectbox("Traitement", [None] + traces,
+                              format_func=lambda trace_id: "Tous" if trace_id is None else labels[trace_id])
+        if choice is not None:
+            spans = [span for span in spans if span.trace_id == choice]
+
+        rows = []
+        for stage in summarize_spans(spans):
+            row = {header: stage.get(key) for key, header in SUMMARY_COLUMNS.items()}
+            row["Total (ms)"], row["Max (ms)"] = round(stage['total_ms'], 1), round(stage['max_ms'], 1)
+            rows.append(row)
+        st.dataframe(rows, hide_index=True)
@@ -0,0 +1,288 @@
+import contextvars
+import functools
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Set DUKE_TRACING=0 to record no span at all
+TRACING_ENABLED = os.getenv("DUKE_TRACING", "1") != "0"
+
+# Number of finished spans kept in memory for the UI
+TRACE_BUFFER_SIZE = int(os.getenv("DUKE_TRACE_BUFFER", "5000"))
+
+# Span of the current thread or asyncio task, parent of the spans it opens
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+# Trace of the current thread or asyncio task, such as the background job running in it
+_current_trace = contextvars.ContextVar("current_trace", default=None)
+
+_finished = deque(maxlen=TRACE_BUFFER_SIZE)
+_finished_lock = threading.Lock()
+
+# Readable names of the traces, such as the file of a job
+_trace_labels = {}
+
+
+class Span:
+    """
+    A timed stage of the work, with attributes such as rows, bytes read,
+    tokens and cache hits. Spans opened while another one is current become
+    its children, and every span of a background job shares the job trace.
+    """
+
+    def __init__(self, name, trace_id=None, parent_id=None, attributes=None):
+        self.name = name
+        self.trace_id = trace_id or uuid.uuid4().hex
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.attributes = dict(attributes or {})
+        self.start_time = time.time()
+        self.duration = None
+        self.status = 'ok'
+        self.error = None
+        self._started = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def set(self, **attributes):
+        """
+        Set attributes of the span, None values are ignored.
+        """
+        with self._lock:
+            self.attributes.update({key: value for key, value in attributes.items() if value is not None})
+
+    def add(self, **counts):
+        """
+        Add to numeric attributes of the span, such as cache_hits=1.
+        """
+        with self._lock:
+            for key, value in counts.items():
+                self.attributes[key] = self.attributes.get(key, 0) + value
+
+    def end(self, error=None):
+        """
+        Finish the span and hand it to the exporters. Only the first call counts.
+
+        Args:
+            error: The exception that ended the span, if any
+        """
+        if self.duration is not None:
+            return
+        self.duration = time.perf_counter() - self._started
+        if error is not None:
+            self.status = 'error'
+            self.error = f"{type(error).__name__}: {error}"
+        _record(self)
+
+    def to_dict(self):
+        """
+        Returns:
+            dict: The span as a JSON-serializable dict
+        """
+        return {
+            'name': self.name,
+            'trace_id': self.trace_id,
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'start_time': self.start_time,
+            'duration_ms': round(self.duration * 1000, 3) if self.duration is not None else None,
+            'status': self.status,
+            'error': self.error,
+            'attributes': self.attributes,
+        }
+
+
+class _NoopSpan:
+    # Stand-in when tracing is disabled
+    def set(self, **attributes):
+        pass
+
+    def add(self, **counts):
+        pass
+
+    def end(self, error=None):
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+def _record(span):
+    from tracing.export import export_span
+
+    with _finished_lock:
+        _finished.append(span)
+    export_span(span)
+
+
+def start_span(name, **attributes):
+    """
+    Start a span that is not made current, for work spread over several calls
+    such as a generator. It must be finished with its end method.
+
+    Args:
+        name: The name of the stage
+        **attributes: The attributes of the span
+
+    Returns:
+        Span: The span
+    """
+    if not TRACING_ENABLED:
+        return _NOOP_SPAN
+    parent = _current_span.get()
+    return Span(name, trace_id=parent.trace_id if parent else _current_trace.get(),
+                parent_id=parent.span_id if parent else None, attributes=attributes)
+
+
+@contextmanager
+def span(name, **attributes):
+    """
+    Time the body of a with block as a span, made current while it runs.
+
+    Args:
+        name: The name of the stage
+        **attributes: The attributes of the span
+
+    Returns:
+        context manager: Gives the span, to set more attributes on it
+    """
+    current = start_span(name, **attributes)
+    if current is _NOOP_SPAN:
+        yield current
+        return
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.end(error=e)
+        raise
+    finally:
+        _current_span.reset(token)
+        current.end()
+
+
+def traced(name=None, **attributes):
+    """
+    Decorator timing every call of a function as a span.
+
+    Args:
+        name: The name of the stage, defaults to the qualified name of the function
+        **attributes: The attributes of the span
+
+    Returns:
+        callable: The decorator
+    """
+    def decorator(func):
+        span_name = name or f"{func.__module__}.{func.__qualname__}"
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(span_name, **attributes):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def current_span():
+    """
+    Get the span of the current thread or asyncio task.
+
+    Returns:
+        Span: The current span, or a span ignoring every call when there is none
+    """
+    return _current_span.get() or _NOOP_SPAN
+
+
+def set_trace(trace_id, label=None):
+    """
+    Make the spans opened from now on in the current thread part of a trace,
+    such as a background job. Nested spans keep the trace of their parent.
+
+    Args:
+        trace_id: The trace ID, or None to start a new trace per root span
+        label: A readable name of the trace, shown in the UI
+
+    Returns:
+        contextvars.Token: The token to give to reset_trace
+    """
+    if label is not None:
+        with _finished_lock:
+            _trace_labels[trace_id] = label
+            # Keep the labels of the most recent traces only
+            while len(_trace_labels) > TRACE_BUFFER_SIZE:
+                _trace_labels.pop(next(iter(_trace_labels)))
+    return _current_trace.set(trace_id)
+
+
+def get_trace_labels():
+    """
+    Get the readable names of the traces.
+
+    Returns:
+        dict: The labels keyed by trace ID, oldest first
+    """
+    with _finished_lock:
+        return dict(_trace_labels)
+
+
+def reset_trace(token):
+    """
+    Restore the trace that was current before set_trace.
+
+    Args:
+        token: The token returned by set_trace
+    """
+    _current_trace.reset(token)
+
+
+def get_finished_spans(trace_id=None):
+    """
+    Get the finished spans kept in memory, oldest first.
+
+    Args:
+        trace_id: Only keep the spans of this trace
+
+    Returns:
+        list: The spans
+    """
+    with _finished_lock:
+        spans = list(_finished)
+    if trace_id is not None:
+        spans = [finished for finished in spans if finished.trace_id == trace_id]
+    return spans
+
+
+def summarize_spans(spans):
+    """
+    Aggregate spans by name, the stages taking the most time first.
+
+    Args:
+        spans: The spans
+
+    Returns:
+        list: One dict per span name with count, total_ms, mean_ms, max_ms, errors
+        and the sums of the numeric attributes
+    """
+    stages = {}
+    for finished in spans:
+        stage = stages.setdefault(finished.name, {'name': finished.name, 'count': 0, 'total_ms': 0.0,
+                                                  'max_ms': 0.0, 'errors': 0})
+        duration_ms = finished.duration * 1000
+        stage['count'] += 1
+        stage['total_ms'] += duration_ms
+        stage['max_ms'] = max(stage['max_ms'], duration_ms)
+        stage['errors'] += finished.status == 'error'
+        for key, value in finished.attributes.items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                stage[key] = stage.get(key, 0) + value
+    for stage in stages.values():
+        stage['mean_ms'] = stage['total_ms'] / stage['count']
+    return sorted(stages.values(), key=lambda stage: -stage['total_ms'])